@@ -1,21 +1,56 @@
+from flask_admin import Admin
 from flask_admin.contrib.sqla import ModelView
-from flask_login import current_user
-from flask import redirect, url_for, request
-from extensions import admin, db
+from flask import Flask, redirect, url_for, request
+from wtforms import FileField
+from wtforms.validators import ValidationError
+import file_storage
+from extensions import db, login_manager
+from instrumentation import instrument
+from startup import StartupTimer, init_bytecode_cache, share_engines
 from models import User, News, Document, Event, Deputy, FAQ
+from user_cache import is_admin_verified
 
 class SecureModelView(ModelView):
     can_view_details = True
     column_display_pk = True
+    # Служебные поля заполняются автоматически при сохранении
+    form_excluded_columns = ('excerpt', 'updated_at', 'auth_version')
 
     def is_accessible(self):
-        return current_user.is_authenticated and current_user.is_admin
+        return is_admin_verified()
 
     def inaccessible_callback(self, name, **kwargs):
         return redirect(url_for('auth.login', next=request.url))
 
+class EventView(SecureModelView):
+    column_descriptions = {
+        'recurrence': 'Повторение в формате RRULE, например FREQ=WEEKLY;BYDAY=TU;UNTIL=20271231. '
+                      'Поддерживаются FREQ=DAILY/WEEKLY/MONTHLY, INTERVAL, COUNT, UNTIL, BYDAY.',
+    }
+
+def _allowed_document(form, field):
+    if field.data and field.data.filename and not file_storage.allowed_file(field.data.filename):
+        raise ValidationError('Недопустимый тип файла')
+
+class DocumentView(SecureModelView):
+    form_excluded_columns = SecureModelView.form_excluded_columns + ('file_hash', 'file_name', 'file_size', 'file_mime')
+    column_exclude_list = ('summary', 'excerpt', 'file_hash', 'file_mime')
+    form_extra_fields = {
+        'upload': FileField('Файл', validators=[_allowed_document],
+                            description='Заменяет текущий файл документа. Одинаковые файлы хранятся один раз.'),
+    }
+
+    def on_model_change(self, form, model, is_created):
+        upload = form.upload.data
+        if upload and upload.filename:
+            model.file_hash, model.file_size = file_storage.save(upload.stream)
+            model.file_name = file_storage.clean_filename(upload.filename)
+            model.file_mime = file_storage.guess_mimetype(model.file_name)
+            model.file_url = None
+
 def init_admin(app):
-    admin.init_app(app)
+    # Свой экземпляр на приложение: фабрику можно вызывать несколько раз
+    admin = Admin(app, name="Админ-панель", template_mode="bootstrap4")
 
     admin.add_view(SecureModelView(
         User, db.session,
@@ -29,13 +64,13 @@ def init_admin(app):
         endpoint="admin_news",      # <— уникально (не 'news')
         name="Новости"
     ))
-    admin.add_view(SecureModelView(
+    admin.add_view(DocumentView(
         Document, db.session,
         category="Контент",
         endpoint="admin_documents", # <— уникально
         name="Документы"
     ))
-    admin.add_view(SecureModelView(
+    admin.add_view(EventView(
         Event, db.session,
         category="Контент",
         endpoint="admin_events",    # <— уникально
@@ -53,3 +88,45 @@ def init_admin(app):
         endpoint="admin_faq",       # <— уникально
         name="FAQ"
     ))
+
+
+def _remove_session(exc):
+    db.session.remove()
+
+def _parent_url(parent):
+    """url_for на эндпоинты основного приложения (auth.login и др.) из админки."""
+    def build(error, endpoint, values):
+        anchor = values.pop('_anchor', None)
+        method = values.pop('_method', None)
+        scheme = values.pop('_scheme', None)
+        external = values.pop('_external', None)
+        values = {key: value for key, value in values.items() if value is not None}
+        url = parent.create_url_adapter(request).build(
+            endpoint, values, method=method, url_scheme=scheme, force_external=bool(external))
+        return url + (f'#{anchor}' if anchor else '')
+    return build
+
+def create_admin_app(parent):
+    """Приложение только с Flask-Admin для ADMIN_LAZY (см. startup.py).
+
+    Конфиг, движки БД, кэш ответов, очередь задач и метрики — те же, что у
+    parent: копируется только то, без чего не обработать запрос к /admin.
+    """
+    timer = StartupTimer()
+    app = Flask(parent.import_name, root_path=parent.root_path,
+                instance_path=parent.instance_path, static_folder=None)
+    app.config = parent.config
+    app.extensions.update(parent.extensions)
+    app.extensions['startup'] = timer
+    app.extensions['admin_parent'] = parent
+    init_bytecode_cache(app)
+    # Свои движки админки означали бы второй пул соединений на воркер
+    share_engines(app, parent)
+    app.teardown_appcontext(_remove_session)
+    login_manager.init_app(app)
+    app.url_build_error_handlers.append(_parent_url(parent))
+    if app.config['METRICS_ENABLED']:
+        instrument(app)
+    init_admin(app)
+    timer.mark('admin')
+    return app
@@ -1,8 +1,26 @@
+import os
+import time
+_started = time.perf_counter()
+
 from flask import Flask
-from config import DevConfig
+from config import DevConfig, ProdConfig
 from extensions import db, migrate, login_manager
+from db_engine import init_db_engine
 from models import User
-from admin import init_admin
+from user_cache import init_user_cache
+from search_index import init_search
+from suggest_index import init_suggest
+from importer import init_import
+from datagen import init_datagen
+from db_audit import init_db_audit
+from file_storage import init_storage
+from assets import init_assets
+from freeze import init_freeze
+from tasks import init_tasks
+from response_cache import init_cache
+from conditional import init_conditional
+from instrumentation import init_instrumentation
+from startup import StartupTimer, init_bytecode_cache, init_lazy_admin, init_startup, prewarm
 
 # Blueprints
 from blueprints.main.routes import bp as main_bp
@@ -13,18 +31,31 @@ from blueprints.events.routes import bp as events_bp
 from blueprints.deputies.routes import bp as deps_bp
 from blueprints.faq.routes import bp as faq_bp
 from blueprints.search.routes import bp as search_bp
+from blueprints.api.routes import bp as api_bp
+
+_imports = time.perf_counter() - _started
 
-def create_app(config_object=DevConfig):
+def create_app(config_object=None):
+    # Фабрику можно вызывать несколько раз: глобального состояния приложения нет
+    timer = StartupTimer(imports=_imports)
+    if config_object is None:
+        config_object = ProdConfig if os.getenv("FLASK_ENV") == "production" else DevConfig
     app = Flask(__name__)
     app.config.from_object(config_object)
+    # До первого обращения к app.jinja_env
+    init_bytecode_cache(app)
+    timer.mark("config")
 
     # Init extensions
     db.init_app(app)
+    init_db_engine(app)
     migrate.init_app(app, db)
 
     login_manager.init_app(app)
     login_manager.login_view = "auth.login"
     login_manager.login_message = "Требуется авторизация для доступа к этой странице."
+    init_user_cache(app)
+    timer.mark("extensions")
 
     # Blueprints
     app.register_blueprint(main_bp)
@@ -35,9 +66,48 @@ def create_app(config_object=DevConfig):
     app.register_blueprint(deps_bp)
     app.register_blueprint(faq_bp)
     app.register_blueprint(search_bp)
+    app.register_blueprint(api_bp)
+    timer.mark("blueprints")
+
+    # Admin: здесь же или приложением только с админкой при первом запросе к /admin
+    if app.config["ADMIN_LAZY"]:
+        init_lazy_admin(app)
+    else:
+        from admin import init_admin  # импорт Flask-Admin заметно удлиняет старт
+        init_admin(app)
+    timer.mark("admin")
+
+    # Полнотекстовый поиск
+    init_search(app)
+    init_suggest(app)
+    timer.mark("search")
+
+    # CLI: flask import ..., flask datagen, flask db-audit, flask storage ...
+    init_import(app)
+    init_datagen(app)
+    init_db_audit(app)
+    init_storage(app)
+    init_startup(app, timer)
+    timer.mark("cli")
+
+    # Статика с отпечатками и предсжатием: flask assets build
+    init_assets(app)
+    timer.mark("assets")
+
+    # Фоновая очередь: flask worker, flask jobs ...
+    init_tasks(app)
+
+    # Статический экспорт: flask freeze, пересборка страниц задачей freeze.pages
+    init_freeze(app)
+    timer.mark("tasks")
+
+    # Метрики, /metrics и /healthz/db
+    init_instrumentation(app)
 
-    # Admin
-    init_admin(app)
+    # Кэш ответов и условные GET
+    init_cache(app)
+    init_conditional(app)
+    timer.mark("instrumentation")
 
     @app.context_processor
     def inject_globals():
@@ -52,6 +122,11 @@ def create_app(config_object=DevConfig):
     def healthz():
         return {"status": "ok"}
 
+    # gunicorn --preload: шаблоны и мапперы готовятся один раз в мастере
+    if app.config["STARTUP_PREWARM"]:
+        prewarm(app)
+        timer.mark("prewarm")
+    app.logger.info(timer.summary())
     return app
 
 if __name__ == "__main__":
@@ -0,0 +1,256 @@
+"""Сборка статики: имена с отпечатком содержимого и предсжатые варианты.
+
+``flask assets build`` копирует файлы из ``static/`` в ``ASSETS_BUILD_DIR``
+под именами с хэшем содержимого (``css/main.3f2a9c1b7e4d.css``), рядом кладёт
+``.br`` и ``.gz`` и пишет ``manifest.json``: исходное имя → имя с отпечатком.
+``url_for('static', filename=...)`` подставляет имя из манифеста, поэтому
+шаблоны не меняются. Файл с отпечатком никогда не меняет содержимого и
+отдаётся с ``Cache-Control: immutable`` на год, в варианте, выбранном по
+``Accept-Encoding``. Без манифеста статика отдаётся обычным обработчиком Flask.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import tempfile
+from collections import namedtuple
+
+import click
+from flask import current_app, request
+from flask.cli import AppGroup
+from werkzeug.security import safe_join
+from werkzeug.utils import send_file
+
+from compression import brotli, choose_encoding
+
+HASH_LENGTH = 12
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+MANIFEST_NAME = "manifest.json"
+# Расширение файла варианта для Content-Encoding; порядок — предпочтение сервера
+SUFFIXES = {"br": ".br", "gzip": ".gz"}
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".json", ".map", ".svg", ".txt", ".xml", ".html",
+                           ".ico", ".ttf", ".otf", ".eot"}
+# Вариант, сжатый хуже, чем до 90% исходного, не стоит лишнего запроса к диску
+MIN_GAIN = 0.9
+
+_CSS_URL_RE = re.compile(r"""url\(\s*(['"]?)([^'")\s]+)\1\s*\)""")
+_SOURCE_MAP_RE = re.compile(r"""(/\*|//)# sourceMappingURL=(\S+?)( \*/)?$""", re.M)
+
+Manifest = namedtuple("Manifest", "sources files version")
+_EMPTY = Manifest({}, {}, "")
+
+assets_cli = AppGroup("assets", help="Сборка статики.")
+
+
+def build_dir(app=None):
+    app = app or current_app
+    return app.config["ASSETS_BUILD_DIR"] or os.path.join(app.instance_path, "assets")
+
+
+def _fingerprinted(name, data):
+    stem, extension = posixpath.splitext(name)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{extension}"
+
+
+def write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _compressed(data):
+    """Варианты {encoding: байты}, которые заметно меньше исходника."""
+    variants = {}
+    if brotli is not None:
+        variants["br"] = brotli.compress(data, quality=11)
+    variants["gzip"] = gzip.compress(data, compresslevel=9, mtime=0)
+    return {encoding: body for encoding, body in variants.items() if len(body) < len(data) * MIN_GAIN}
+
+
+def _sources(static_folder):
+    for dirpath, dirnames, filenames in os.walk(static_folder):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+        for name in sorted(filenames):
+            if not name.startswith("."):
+                path = os.path.join(dirpath, name)
+                yield os.path.relpath(path, static_folder).replace(os.sep, "/"), path
+
+
+def _rewrite_references(name, text, sources):
+    """Ссылки url(...) и sourceMappingURL в CSS/JS указывают на имена с отпечатком."""
+    base = posixpath.dirname(name)
+
+    def resolve(reference):
+        if reference.startswith(("data:", "http:", "https:", "//", "/", "#")):
+            return None
+        path, rest = re.match(r"([^?#]*)(.*)", reference).groups()
+        target = posixpath.normpath(posixpath.join(base, path))
+        if target not in sources:
+            return None
+        return posixpath.relpath(sources[target], base or ".") + rest
+
+    def css_url(match):
+        new = resolve(match.group(2))
+        return f"url({match.group(1)}{new}{match.group(1)})" if new else match.group(0)
+
+    def source_map(match):
+        new = resolve(match.group(2))
+        # Карты рядом нет — комментарий только порождал бы 404 в инструментах разработчика
+        return f"{match.group(1)}# sourceMappingURL={new}{match.group(3) or ''}" if new else ""
+
+    if name.endswith(".css"):
+        text = _CSS_URL_RE.sub(css_url, text)
+    return _SOURCE_MAP_RE.sub(source_map, text)
+
+
+def build(static_folder, output):
+    """Собирает статику в output; возвращает (манифест, список (имя, размер, варианты))."""
+    entries, report = {}, []
+    # CSS и JS ссылаются на другие файлы (CSS — и на JS), поэтому их отпечаток
+    # считается последним, после замены ссылок
+    order = {".js": 1, ".css": 2}
+    files = sorted(_sources(static_folder), key=lambda item: order.get(posixpath.splitext(item[0])[1], 0))
+    sources = {}
+    for name, path in files:
+        with open(path, "rb") as f:
+            data = f.read()
+        if name.endswith((".css", ".js")):
+            data = _rewrite_references(name, data.decode("utf-8"), sources).encode("utf-8")
+        target = _fingerprinted(name, data)
+        sources[name] = target
+        target_path = os.path.join(output, target)
+        encodings = [encoding for encoding in SUFFIXES if os.path.exists(target_path + SUFFIXES[encoding])]
+        # Имя определяется содержимым: уже собранный файл пересобирать незачем
+        if not os.path.exists(target_path):
+            write_atomic(target_path, data)
+            encodings = []
+            if posixpath.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+                variants = _compressed(data)
+                for encoding in SUFFIXES:
+                    if encoding in variants:
+                        write_atomic(target_path + SUFFIXES[encoding], variants[encoding])
+                        encodings.append(encoding)
+        entries[name] = {"file": target, "encodings": encodings}
+        report.append((name, len(data), {e: os.path.getsize(target_path + SUFFIXES[e]) for e in encodings}))
+    return entries, report
+
+
+def _read_manifest(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _clean(output, keep):
+    """Удаляет собранные файлы, которых нет в keep (имена с отпечатком)."""
+    removed = 0
+    for name, path in list(_sources(output)):
+        if name == MANIFEST_NAME:
+            continue
+        base = name
+        for suffix in SUFFIXES.values():
+            if name.endswith(suffix):
+                base = name[:-len(suffix)]
+        if base not in keep:
+            os.unlink(path)
+            removed += 1
+    for dirpath, _, _ in sorted(os.walk(output), reverse=True):
+        if dirpath != output and not os.listdir(dirpath):
+            os.rmdir(dirpath)
+    return removed
+
+
+@assets_cli.command("build")
+@click.option("--clean", is_flag=True,
+              help="Удалить файлы, которых нет ни в новом, ни в предыдущем манифесте.")
+def build_command(clean):
+    """Собрать статику с отпечатками и предсжатыми вариантами."""
+    output = build_dir()
+    manifest_path = os.path.join(output, MANIFEST_NAME)
+    previous = _read_manifest(manifest_path)
+    entries, report = build(current_app.static_folder, output)
+    write_atomic(manifest_path, json.dumps(entries, ensure_ascii=False, indent=1, sort_keys=True).encode("utf-8"))
+    cache = current_app.extensions.get("response_cache")
+    if cache is not None and entries != previous:
+        # В закэшированных страницах — ссылки на файлы прошлой сборки
+        cache.clear()
+
+    total = sum(size for _, size, _ in report)
+    for name, size, variants in report:
+        sizes = ", ".join(f"{encoding} {variant_size}" for encoding, variant_size in variants.items())
+        click.echo(f"{entries[name]['file']}: {size}" + (f" ({sizes})" if sizes else ""))
+    click.echo(f"Файлов: {len(report)}, {total} байт; манифест: {manifest_path}")
+    if brotli is None:
+        click.echo("Пакет Brotli не установлен: собраны только варианты .gz")
+    if clean:
+        # Файлы предыдущей сборки нужны воркерам, ещё не перезапущенным после деплоя
+        keep = {entry["file"] for entry in list(entries.values()) + list(previous.values())}
+        click.echo(f"Удалено устаревших файлов: {_clean(output, keep)}")
+
+
+def _load_manifest(app):
+    if not app.config["ASSETS_FINGERPRINT"]:
+        return _EMPTY
+    entries = _read_manifest(os.path.join(build_dir(app), MANIFEST_NAME))
+    if not entries:
+        return _EMPTY
+    return Manifest(
+        {name: entry["file"] for name, entry in entries.items()},
+        {entry["file"]: entry["encodings"] for entry in entries.values()},
+        hashlib.sha1(json.dumps(entries, sort_keys=True).encode("utf-8")).hexdigest()[:12],
+    )
+
+
+def manifest():
+    return current_app.extensions.get("assets", _EMPTY)
+
+
+def _fingerprint_url(endpoint, values):
+    """url_defaults: url_for('static', filename=...) получает имя с отпечатком."""
+    if endpoint == "static" and "filename" in values:
+        values["filename"] = manifest().sources.get(values["filename"], values["filename"])
+
+
+def serve_static(filename):
+    """Вместо стандартного static: собранный файл — в лучшем сжатии и навсегда, прочее — как обычно."""
+    encodings = manifest().files.get(filename)
+    if encodings is None:
+        return current_app.send_static_file(filename)
+    path = safe_join(build_dir(), filename)
+    encoding = choose_encoding(encodings)
+    response = send_file(
+        path + SUFFIXES[encoding] if encoding else path,
+        request.environ,
+        mimetype=mimetypes.guess_type(filename)[0] or "application/octet-stream",
+        conditional=True,
+        max_age=IMMUTABLE_MAX_AGE,
+        response_class=current_app.response_class,
+    )
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    if encodings:
+        response.vary.add("Accept-Encoding")
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def init_assets(app):
+    app.cli.add_command(assets_cli)
+    # Манифест читается один раз на процесс: после сборки воркеры перезапускаются
+    app.extensions["assets"] = _load_manifest(app)
+    if app.has_static_folder:
+        app.url_defaults(_fingerprint_url)
+        app.view_functions["static"] = serve_static
@@ -0,0 +1,245 @@
+"""Нагрузочный прогон публичных страниц через тестовый клиент Flask.
+
+Перед запуском заполните БД: ``flask datagen --scale small --reset``.
+
+    python benchmark.py --requests 200 --out bench-results
+
+Для каждого эндпоинта считаются перцентили задержки, число SQL-запросов на
+HTTP-запрос и пиковое выделение памяти (tracemalloc, отдельным проходом,
+чтобы не искажать время). Ответы с неожиданным статусом (ошибки, 404, 429,
+неудачный вход) в задержки не входят и считаются отдельно; если такие были,
+скрипт завершается с кодом 1. Результаты пишутся в JSON, а ``--compare``
+выводит разницу с предыдущим прогоном.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import namedtuple
+from datetime import datetime
+
+# Кэш ответов по умолчанию выключен: меряем работу приложения, а не SQLite-кэша
+os.environ.setdefault("RESPONSE_CACHE_ENABLED", "0")
+
+from sqlalchemy import event, func, select  # noqa: E402
+
+from app import create_app  # noqa: E402
+from datagen import BENCH_USER, WORDS  # noqa: E402
+from extensions import db  # noqa: E402
+from models import News  # noqa: E402
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(q / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Один замеряемый запрос; setup и teardown выполняются вне замера.
+# expect — ожидаемый статус (по умолчанию любой 2xx/3xx)
+Call = namedtuple("Call", "method url data setup teardown expect", defaults=(None, None, None, None))
+
+# Столько id опубликованных новостей берётся для news.detail
+DETAIL_SAMPLE = 1000
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args):
+        self.count += 1
+
+
+def _scenarios(app, rng):
+    with app.app_context():
+        news_ids = db.session.execute(
+            select(News.id).where(News.is_published.is_(True)).order_by(func.random()).limit(DETAIL_SAMPLE)
+        ).scalars().all() or [1]
+
+    credentials = {"email": BENCH_USER[0], "password": BENCH_USER[1]}
+
+    def log_in(client):
+        client.post("/auth/login", data=credentials)
+
+    def log_out(client):
+        client.get("/auth/logout")
+
+    def news_detail():
+        return Call("GET", f"/news/{rng.choice(news_ids)}")
+
+    def search():
+        return Call("GET", f"/search/?q={rng.choice(WORDS)}")
+
+    def login():
+        return Call("POST", "/auth/login", credentials, teardown=log_out, expect=302)
+
+    def logout():
+        return Call("GET", "/auth/logout", setup=log_in, expect=302)
+
+    def fixed(url):
+        return lambda: Call("GET", url)
+
+    return {
+        "index": fixed("/"),
+        "news.list": fixed("/news/"),
+        "news.detail": news_detail,
+        "documents.list": fixed("/documents/"),
+        "events.list": fixed("/events/"),
+        "deputies.list": fixed("/deputies/"),
+        "faq.list": fixed("/faq/"),
+        "search": search,
+        "auth.login": login,
+        "auth.logout": logout,
+    }
+
+
+def _request(client, call, counter=None):
+    """Выполняет call; возвращает (статус, задержка в мс, SQL-запросов, ожидаемый ли статус).
+
+    Время и SQL-запросы считаются только для самого call, без setup/teardown.
+    """
+    if call.setup:
+        call.setup(client)
+    before = counter.count if counter else 0
+    started = time.perf_counter()
+    if call.method == "POST":
+        response = client.post(call.url, data=call.data)
+    else:
+        response = client.get(call.url)
+    elapsed = (time.perf_counter() - started) * 1000
+    queries = counter.count - before if counter else None
+    if call.teardown:
+        call.teardown(client)
+    status = response.status_code
+    ok = status == call.expect if call.expect else 200 <= status < 400
+    return status, elapsed, queries, ok
+
+
+def run(requests, warmup, memory_requests, seed):
+    app = create_app()
+    app.config["WTF_CSRF_ENABLED"] = False
+    rng = random.Random(seed)
+    counter = QueryCounter()
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", counter)
+
+    results = {}
+    for name, make in _scenarios(app, rng).items():
+        client = app.test_client()
+        for _ in range(warmup):
+            _request(client, make())
+
+        latencies, queries, statuses, errors = [], [], {}, 0
+        for _ in range(requests):
+            status, elapsed, count, ok = _request(client, make(), counter)
+            statuses[status] = statuses.get(status, 0) + 1
+            if not ok:
+                errors += 1
+                continue
+            latencies.append(elapsed)
+            queries.append(count)
+
+        tracemalloc.start()
+        peak = 0
+        for _ in range(memory_requests):
+            call = make()
+            if call.setup:
+                call.setup(client)
+            tracemalloc.reset_peak()
+            _request(client, call._replace(setup=None, teardown=None))
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            if call.teardown:
+                call.teardown(client)
+        tracemalloc.stop()
+
+        latencies.sort()
+        results[name] = {
+            "requests": requests,
+            "statuses": {str(k): v for k, v in sorted(statuses.items())},
+            "errors": errors,
+            "latency_ms": {
+                "p50": _percentile(latencies, 50),
+                "p90": _percentile(latencies, 90),
+                "p99": _percentile(latencies, 99),
+                "max": latencies[-1],
+                "mean": sum(latencies) / len(latencies),
+            } if latencies else None,
+            "queries_per_request": sum(queries) / len(queries) if queries else None,
+            "peak_memory_kib": peak / 1024,
+        }
+        if latencies:
+            print("{:<16} p50 {:7.2f} ms  p90 {:7.2f} ms  p99 {:7.2f} ms  {:5.1f} SQL/req  {:8.0f} KiB".format(
+                name, results[name]["latency_ms"]["p50"], results[name]["latency_ms"]["p90"],
+                results[name]["latency_ms"]["p99"], results[name]["queries_per_request"],
+                results[name]["peak_memory_kib"]))
+        if errors:
+            print(f"{name:<16} неожиданный статус у {errors} из {requests} запросов: {results[name]['statuses']}")
+
+    return {
+        "started_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "database": app.config["SQLALCHEMY_DATABASE_URI"].split("@")[-1],
+        "response_cache": app.config["RESPONSE_CACHE_ENABLED"],
+        "endpoints": results,
+    }
+
+
+def _compare(current, previous_path):
+    with open(previous_path, encoding="utf-8") as f:
+        previous = json.load(f)
+    print(f"\nСравнение с {previous_path} ({previous.get('git_revision')}):")
+    for name, stats in current["endpoints"].items():
+        old = previous["endpoints"].get(name)
+        if not old or not old["latency_ms"] or not stats["latency_ms"]:
+            continue
+        delta = (stats["latency_ms"]["p50"] / old["latency_ms"]["p50"] - 1) * 100
+        print("{:<16} p50 {:7.2f} → {:7.2f} ms ({:+.0f}%)  SQL/req {:.1f} → {:.1f}".format(
+            name, old["latency_ms"]["p50"], stats["latency_ms"]["p50"], delta,
+            old["queries_per_request"], stats["queries_per_request"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=100, help="Запросов на эндпоинт.")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--memory-requests", type=int, default=5,
+                        help="Запросов на эндпоинт в проходе с tracemalloc.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="bench-results", help="Каталог для JSON с результатами.")
+    parser.add_argument("--compare", help="JSON предыдущего прогона для сравнения.")
+    args = parser.parse_args()
+
+    result = run(args.requests, args.warmup, args.memory_requests, args.seed)
+
+    os.makedirs(args.out, exist_ok=True)
+    name = "{}-{}.json".format(datetime.utcnow().strftime("%Y%m%dT%H%M%S"), result["git_revision"] or "local")
+    path = os.path.join(args.out, name)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"\nРезультаты: {path}")
+
+    if args.compare:
+        _compare(result, args.compare)
+
+    if any(stats["errors"] for stats in result["endpoints"].values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
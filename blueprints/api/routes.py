@@ -0,0 +1,184 @@
+import json
+from collections import namedtuple
+from datetime import datetime, timezone
+from functools import partial
+from flask import Blueprint, Response, abort, current_app, jsonify, request, stream_with_context, url_for
+from sqlalchemy.orm import load_only
+from werkzeug.exceptions import HTTPException
+from models import News, Document, Event, Deputy, FAQ
+from pagination import paginate
+from conditional import conditional
+from compression import compress_response
+
+bp = Blueprint('api', __name__, url_prefix='/api/v1')
+bp.after_request(compress_response)
+
+# fields — все поля ресурса, default_fields — без тяжёлых текстов (body, bio ...),
+# computed — вычисляемые поля: имя -> (нужные колонки, функция от объекта)
+Resource = namedtuple('Resource', 'model fields default_fields computed visible order')
+
+def _document_url(d):
+    if d.file_hash:
+        return url_for('documents.download', file_hash=d.file_hash, filename=d.file_name, _external=True)
+    return d.file_url or None
+
+RESOURCES = {
+    'news': Resource(
+        News,
+        ('id', 'title', 'excerpt', 'body', 'published_at', 'updated_at'),
+        ('id', 'title', 'excerpt', 'published_at', 'updated_at'),
+        {}, {'is_published': True},
+        ((News.published_at, True), (News.id, True)),
+    ),
+    'documents': Resource(
+        Document,
+        ('id', 'title', 'doc_type', 'excerpt', 'summary', 'file_name', 'file_size', 'file_mime',
+         'published_at', 'updated_at'),
+        ('id', 'title', 'doc_type', 'excerpt', 'file_name', 'file_size', 'published_at', 'updated_at', 'file'),
+        {'file': (('file_hash', 'file_name', 'file_url'), _document_url)},
+        {'is_published': True},
+        ((Document.published_at, True), (Document.id, True)),
+    ),
+    'events': Resource(
+        Event,
+        ('id', 'title', 'description', 'start_time', 'end_time', 'location', 'recurrence', 'updated_at'),
+        ('id', 'title', 'start_time', 'end_time', 'location', 'recurrence', 'updated_at'),
+        {}, {'is_public': True},
+        ((Event.start_time, False), (Event.id, False)),
+    ),
+    'deputies': Resource(
+        Deputy,
+        ('id', 'full_name', 'faction', 'district', 'email', 'phone', 'photo_url', 'excerpt', 'bio', 'updated_at'),
+        ('id', 'full_name', 'faction', 'district', 'email', 'phone', 'photo_url', 'excerpt', 'updated_at'),
+        {}, {},
+        ((Deputy.full_name, False), (Deputy.id, False)),
+    ),
+    'faq': Resource(
+        FAQ,
+        ('id', 'question', 'answer', 'updated_at'),
+        ('id', 'question', 'updated_at'),
+        {}, {'is_published': True},
+        ((FAQ.id, False),),
+    ),
+}
+
+# Сколько объектов кодировать в JSON за один фрагмент потока
+_STREAM_BATCH = 50
+
+@bp.errorhandler(HTTPException)
+def api_error(exc):
+    return jsonify(error=exc.description, status=exc.code), exc.code
+
+def _fields(resource, detail=False):
+    raw = request.args.get('fields')
+    if not raw:
+        return resource.fields + tuple(resource.computed) if detail else resource.default_fields
+    names = tuple(dict.fromkeys(f.strip() for f in raw.split(',') if f.strip()))
+    unknown = [n for n in names if n not in resource.fields and n not in resource.computed]
+    if unknown:
+        abort(400, description=f"Неизвестные поля: {', '.join(unknown)}")
+    return names
+
+def _columns(resource, fields, keys=(), extra=()):
+    """Колонки для load_only: запрошенные поля, зависимости вычисляемых и ключи сортировки."""
+    names = {'id', *extra}
+    for name in fields:
+        names.update(resource.computed[name][0] if name in resource.computed else (name,))
+    names.update(column.key for column, _ in keys)
+    return [getattr(resource.model, name) for name in sorted(names)]
+
+def _value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def _serialize(resource, obj, fields):
+    return {
+        name: resource.computed[name][1](obj) if name in resource.computed else _value(getattr(obj, name))
+        for name in fields
+    }
+
+def _sync_item(resource, obj, fields):
+    """Запись для синхронизации с флагом видимости; скрытая — «надгробие» без содержимого."""
+    flags = {name: getattr(obj, name) for name in resource.visible}
+    if all(flags[name] == value for name, value in resource.visible.items()):
+        return {**_serialize(resource, obj, fields), **flags}
+    return {'id': obj.id, 'updated_at': _value(obj.updated_at), **flags}
+
+def _stream(items, serialize, meta):
+    yield '{"data":['
+    for start in range(0, len(items), _STREAM_BATCH):
+        chunk = ','.join(json.dumps(serialize(obj), ensure_ascii=False)
+                         for obj in items[start:start + _STREAM_BATCH])
+        yield (',' if start else '') + chunk
+    yield '],' + json.dumps(meta, ensure_ascii=False)[1:]
+
+def _parse_since(value):
+    try:
+        since = datetime.fromisoformat(value)
+    except ValueError:
+        abort(400, description='updated_since: ожидалась дата ISO 8601, например 2025-01-31T12:00:00')
+    # Время в БД хранится в UTC без часового пояса
+    if since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    return since
+
+def _make_views(name, resource):
+    model = resource.model
+    table = model.__tablename__
+
+    @conditional(table)
+    def list_view():
+        fields = _fields(resource)
+        since = request.args.get('updated_since')
+        if since:
+            # Инкрементальная синхронизация: порядок по времени изменения. Снятые
+            # с публикации записи тоже отдаются — клиент должен узнать, что их
+            # больше не показывать
+            query = model.query.filter(model.updated_at >= _parse_since(since))
+            keys = [(model.updated_at, False), (model.id, False)]
+            extra = ('updated_at', *resource.visible)
+            serialize = partial(_sync_item, resource, fields=fields)
+        else:
+            query = model.query.filter_by(**resource.visible)
+            keys = list(resource.order)
+            extra = ()
+            serialize = partial(_serialize, resource, fields=fields)
+        query = query.options(load_only(*_columns(resource, fields, keys, extra)))
+        page = paginate(query, keys, max_per_page=current_app.config['API_PAGE_SIZE_MAX'])
+        meta = {
+            'next_cursor': page.next_cursor,
+            'prev_cursor': page.prev_cursor,
+            'links': {'next': page.next_url(), 'prev': page.prev_url()},
+        }
+        body = _stream(page.items, serialize, meta)
+        return Response(stream_with_context(body), mimetype='application/json')
+
+    @conditional(table)
+    def detail_view(item_id):
+        fields = _fields(resource, detail=True)
+        item = (model.query.filter_by(id=item_id, **resource.visible)
+                .options(load_only(*_columns(resource, fields))).first())
+        if item is None:
+            abort(404, description='Не найдено')
+        return jsonify(data=_serialize(resource, item, fields))
+
+    bp.add_url_rule(f'/{name}', endpoint=f'{name}_list', view_func=list_view)
+    bp.add_url_rule(f'/{name}/<int:item_id>', endpoint=f'{name}_detail', view_func=detail_view)
+
+for _name, _resource in RESOURCES.items():
+    _make_views(_name, _resource)
+
+@bp.route('/')
+def index():
+    return jsonify(sync={
+        'updated_since': 'Записи, изменённые с этого момента (UTC), включая снятые с публикации: '
+                         'у них флаг видимости false и только id и updated_at.',
+        'deletions': 'Удаления не передаются. Чтобы найти удалённые записи, сверяйте '
+                     'полный список id (?fields=id).',
+    }, resources={
+        name: {
+            'url': url_for(f'api.{name}_list', _external=True),
+            'fields': list(resource.fields + tuple(resource.computed)),
+            'default_fields': list(resource.default_fields),
+        }
+        for name, resource in RESOURCES.items()
+    })
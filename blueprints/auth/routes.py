@@ -1,25 +1,59 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app
 from flask_login import login_user, logout_user, login_required, current_user
 from urllib.parse import urlparse
 from extensions import db
 from models import User
+from passwords import HashingBusy
+from security import login_limiter
 from .forms import LoginForm, RegisterForm
 
 bp = Blueprint('auth', __name__, url_prefix='/auth')
 
+def _throttled(template, form):
+    flash('Слишком много попыток. Попробуйте позже.', 'danger')
+    return render_template(template, form=form), 429
+
+def _busy(template, form):
+    flash('Сервер перегружен, попробуйте через минуту.', 'warning')
+    return render_template(template, form=form), 503, {'Retry-After': '30'}
+
 @bp.route('/login', methods=['GET', 'POST'])
 def login():
     if current_user.is_authenticated:
         return redirect(url_for('main.index'))
     form = LoginForm()
     if form.validate_on_submit():
+        cfg = current_app.config
+        ip_key = f"login-ip:{request.remote_addr}"
+        account_key = f"login-account:{form.email.data.lower()}"
+        # Лимиты проверяются до поиска пользователя и хэширования пароля
+        if login_limiter.exceeded(ip_key, cfg['LOGIN_IP_LIMIT'], cfg['LOGIN_IP_WINDOW']) or \
+                login_limiter.exceeded(account_key, cfg['LOGIN_ACCOUNT_LIMIT'], cfg['LOGIN_ACCOUNT_WINDOW']):
+            return _throttled('auth/login.html', form)
+
         user = User.query.filter_by(email=form.email.data).first()
-        if user and user.check_password(form.password.data) and user.is_active:
+        try:
+            valid = user is not None and user.check_password(form.password.data) and user.is_active
+        except HashingBusy:
+            return _busy('auth/login.html', form)
+        if valid and user.password_needs_rehash():
+            # Пересчёт хэша — по возможности: вход уже подтверждён
+            try:
+                user.set_password(form.password.data)
+                db.session.commit()
+            except HashingBusy:
+                pass
+        if valid:
+            login_limiter.reset(account_key)
             login_user(user, remember=True)
             next_page = request.args.get('next')
             if not next_page or urlparse(next_page).netloc != '':
                 next_page = url_for('main.index')
             return redirect(next_page)
+        # Считаются только неудачные попытки: успешные входы с одного адреса
+        # (офис за NAT) лимит не расходуют
+        login_limiter.hit(ip_key, cfg['LOGIN_IP_WINDOW'])
+        login_limiter.hit(account_key, cfg['LOGIN_ACCOUNT_WINDOW'])
         flash('Неверный email или пароль', 'danger')
     return render_template('auth/login.html', form=form)
 
@@ -29,11 +63,19 @@ def register():
         return redirect(url_for('main.index'))
     form = RegisterForm()
     if form.validate_on_submit():
+        cfg = current_app.config
+        ip_key = f"register-ip:{request.remote_addr}"
+        if login_limiter.exceeded(ip_key, cfg['REGISTER_IP_LIMIT'], cfg['REGISTER_IP_WINDOW']):
+            return _throttled('auth/register.html', form)
+        login_limiter.hit(ip_key, cfg['REGISTER_IP_WINDOW'])
         if User.query.filter_by(email=form.email.data).first():
             flash('Пользователь с таким email уже существует', 'warning')
         else:
             u = User(email=form.email.data, name=form.name.data, role='user')
-            u.set_password(form.password.data)
+            try:
+                u.set_password(form.password.data)
+            except HashingBusy:
+                return _busy('auth/register.html', form)
             db.session.add(u)
             db.session.commit()
             flash('Регистрация успешна. Теперь войдите.', 'success')
@@ -48,5 +90,5 @@ def logout():
 
 @bp.route('/healthz')
 def healthz():
-    # можно расширить проверкой БД позже
+    # проверка БД и пула соединений — /healthz/db
     return jsonify(status="ok"), 200
\ No newline at end of file
@@ -1,14 +1,22 @@
 from flask import Blueprint, render_template
+from sqlalchemy.orm import defer
 from models import Deputy
+from pagination import PAGE_ARGS, paginate
+from response_cache import cached
+from conditional import conditional
 
 bp = Blueprint('deputies', __name__, url_prefix='/deputies')
 
 @bp.route('/')
+@conditional('deputy')
+@cached('deputy', args=PAGE_ARGS)
 def list_deputies():
-    items = Deputy.query.order_by(Deputy.full_name.asc()).all()
-    return render_template('deputies/list.html', items=items)
+    page = paginate(Deputy.query.options(defer(Deputy.bio)), [(Deputy.full_name, False), (Deputy.id, False)])
+    return render_template('deputies/list.html', items=page.items, page=page)
 
 @bp.route('/<int:deputy_id>')
+@conditional('deputy')
+@cached('deputy:{deputy_id}')
 def detail(deputy_id):
     item = Deputy.query.get_or_404(deputy_id)
     return render_template('deputies/detail.html', item=item)
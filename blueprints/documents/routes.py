@@ -1,9 +1,31 @@
-from flask import Blueprint, render_template
+from flask import Blueprint, abort, render_template
+from sqlalchemy.orm import defer
 from models import Document
+from pagination import PAGE_ARGS, paginate
+from response_cache import cached
+from conditional import conditional
+from user_cache import is_admin_verified
+import file_storage
 
 bp = Blueprint('documents', __name__, url_prefix='/documents')
 
 @bp.route('/')
+@conditional('document')
+@cached('document', args=PAGE_ARGS)
 def list_documents():
-    items = Document.query.filter_by(is_published=True).order_by(Document.published_at.desc()).all()
-    return render_template('documents/list.html', items=items)
+    page = paginate(Document.query.options(defer(Document.summary)).filter_by(is_published=True),
+                    [(Document.published_at, True), (Document.id, True)])
+    return render_template('documents/list.html', items=page.items, page=page)
+
+@bp.route('/file/<file_hash>/<path:filename>')
+def download(file_hash, filename):
+    # Адрес определяется содержимым, имя в URL — только для удобства
+    if not file_storage.HASH_RE.fullmatch(file_hash):
+        abort(404)
+    document = Document.query.filter_by(file_hash=file_hash, is_published=True).first()
+    public = document is not None
+    if document is None and is_admin_verified():
+        document = Document.query.filter_by(file_hash=file_hash).first()
+    if document is None:
+        abort(404)
+    return file_storage.send(document, public=public)
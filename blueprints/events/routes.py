@@ -1,9 +1,62 @@
-from flask import Blueprint, render_template
-from models import Event
+from datetime import date, datetime, timedelta
+from flask import Blueprint, Response, abort, current_app, render_template, request, stream_with_context
+import event_calendar
+from pagination import PAGE_ARGS, paginate_with
+from response_cache import cached
+from conditional import conditional
 
 bp = Blueprint('events', __name__, url_prefix='/events')
 
 @bp.route('/')
+@conditional('event', period=600)
+@cached('event', period=600, args=PAGE_ARGS)
 def list_events():
-    items = Event.query.filter_by(is_public=True).order_by(Event.start_time.asc()).all()
-    return render_template('events/list.html', items=items)
+    days = current_app.config['CALENDAR_UPCOMING_DAYS']
+    now = datetime.utcnow()
+
+    def fetch(cursor, forward, inclusive, limit):
+        return event_calendar.upcoming(now, days, limit=limit, cursor=cursor, forward=forward, inclusive=inclusive)
+
+    page = paginate_with(fetch, event_calendar.KEYS, event_calendar.occurrence_key)
+    return render_template('events/list.html', items=page.items, page=page, days=days, today=now.date())
+
+@bp.route('/<int:year>/<int:month>')
+@conditional('event')
+@cached('event')
+def month(year, month):
+    if not (1 <= month <= 12 and 1900 < year < 3000):
+        abort(404)
+    weeks = event_calendar.month_grid(year, month)
+    limit = current_app.config['CALENDAR_MAX_OCCURRENCES']
+    start, end = event_calendar.window([weeks[0][0], weeks[-1][-1]])
+    items = event_calendar.occurrences(start, end, limit=limit + 1)
+    first = date(year, month, 1)
+    prev_month = first - timedelta(days=1)
+    next_month = first + timedelta(days=31)
+    return render_template('events/month.html', weeks=weeks, first=first,
+                           days=event_calendar.by_day(items[:limit], weeks[0][0], weeks[-1][-1]),
+                           truncated=len(items) > limit, prev_month=prev_month, next_month=next_month, today=datetime.utcnow().date())
+
+@bp.route('/week/<int:year>/<int:week>')
+@conditional('event')
+@cached('event')
+def week(year, week):
+    try:
+        days = event_calendar.week_days(year, week)
+    except ValueError:
+        abort(404)
+    limit = current_app.config['CALENDAR_MAX_OCCURRENCES']
+    items = event_calendar.occurrences(*event_calendar.window(days), limit=limit + 1)
+    prev_week = (days[0] - timedelta(days=7)).isocalendar()
+    next_week = (days[0] + timedelta(days=7)).isocalendar()
+    return render_template('events/week.html', week_days=days, year=year, week=week,
+                           days=event_calendar.by_day(items[:limit], days[0], days[-1]),
+                           truncated=len(items) > limit, prev_week=prev_week, next_week=next_week, today=datetime.utcnow().date())
+
+@bp.route('/calendar.ics')
+@conditional('event', period=86400)
+def feed():
+    since = datetime.utcnow() - timedelta(days=current_app.config['CALENDAR_FEED_PAST_DAYS'])
+    body = event_calendar.ical_feed(since, request.host.split(':')[0], 'Городская дума')
+    return Response(stream_with_context(body), mimetype='text/calendar',
+                    headers={'Content-Disposition': 'inline; filename="calendar.ics"'})
@@ -1,9 +1,20 @@
-from flask import Blueprint, render_template
+from flask import Blueprint, render_template, url_for
 from models import FAQ
+from pagination import PAGE_ARGS, encode_cursor, paginate
+from response_cache import cached
+from conditional import conditional
 
 bp = Blueprint('faq', __name__, url_prefix='/faq')
 
+KEYS = [(FAQ.id, False)]
+
+def item_url(faq_id):
+    """Страница списка, которая начинается с этого вопроса, с якорем на него."""
+    return url_for('faq.list_faq', at=encode_cursor([faq_id]), _anchor=f'h{faq_id}')
+
 @bp.route('/')
+@conditional('faq')
+@cached('faq', args=PAGE_ARGS)
 def list_faq():
-    items = FAQ.query.filter_by(is_published=True).all()
-    return render_template('faq/list.html', items=items)
+    page = paginate(FAQ.query.filter_by(is_published=True), KEYS)
+    return render_template('faq/list.html', items=page.items, page=page)
@@ -1,10 +1,17 @@
-from flask import Blueprint, render_template
-from models import News, Event
+from datetime import datetime
+from flask import Blueprint, current_app, render_template
+from sqlalchemy.orm import defer
+from models import News
+import event_calendar
+from response_cache import cached
+from conditional import conditional
 
 bp = Blueprint('main', __name__)
 
 @bp.route('/')
+@conditional('news', 'event', period=600)
+@cached('news', 'event', period=600)
 def index():
-    news = News.query.filter_by(is_published=True).order_by(News.published_at.desc()).limit(5).all()
-    events = Event.query.filter_by(is_public=True).order_by(Event.start_time.asc()).limit(5).all()
+    news = News.query.options(defer(News.body)).filter_by(is_published=True).order_by(News.published_at.desc()).limit(5).all()
+    events = event_calendar.upcoming(datetime.utcnow(), current_app.config['CALENDAR_UPCOMING_DAYS'], limit=5)
     return render_template('index.html', news=news, events=events)
@@ -1,14 +1,23 @@
 from flask import Blueprint, render_template, abort
+from sqlalchemy.orm import defer
 from models import News
+from pagination import PAGE_ARGS, paginate
+from response_cache import cached
+from conditional import conditional
 
 bp = Blueprint('news', __name__, url_prefix='/news')
 
 @bp.route('/')
+@conditional('news')
+@cached('news', args=PAGE_ARGS)
 def list_news():
-    items = News.query.filter_by(is_published=True).order_by(News.published_at.desc()).all()
-    return render_template('news/list.html', items=items)
+    page = paginate(News.query.options(defer(News.body)).filter_by(is_published=True),
+                    [(News.published_at, True), (News.id, True)])
+    return render_template('news/list.html', items=page.items, page=page)
 
 @bp.route('/<int:news_id>')
+@conditional('news')
+@cached('news:{news_id}')
 def detail(news_id):
     item = News.query.get_or_404(news_id)
     if not item.is_published:
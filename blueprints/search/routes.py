@@ -1,24 +1,45 @@
-from flask import Blueprint, render_template, request
-from models import News, Document, Deputy, FAQ
-from sqlalchemy import or_
+from flask import Blueprint, render_template, request, current_app, jsonify, url_for
+import search_index
+import suggest_index
+from conditional import conditional
+from blueprints.faq.routes import item_url as faq_url
 
 bp = Blueprint('search', __name__, url_prefix='/search')
 
 @bp.route('/')
+@conditional('news', 'document', 'deputy', 'faq', 'search_index')
 def search():
     q = request.args.get('q', '').strip()
-    news = docs = deputies = faqs = []
-    if q:
-        news = News.query.filter(
-            or_(News.title.ilike(f'%{q}%'), News.body.ilike(f'%{q}%'))
-        ).all()
-        docs = Document.query.filter(
-            or_(Document.title.ilike(f'%{q}%'), Document.summary.ilike(f'%{q}%'))
-        ).all()
-        deputies = Deputy.query.filter(
-            or_(Deputy.full_name.ilike(f'%{q}%'), Deputy.bio.ilike(f'%{q}%'))
-        ).all()
-        faqs = FAQ.query.filter(
-            or_(FAQ.question.ilike(f'%{q}%'), FAQ.answer.ilike(f'%{q}%'))
-        ).all()
-    return render_template('search/results.html', q=q, news=news, docs=docs, deputies=deputies, faqs=faqs)
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = current_app.config['SEARCH_PER_PAGE']
+    max_results = current_app.config['SEARCH_MAX_RESULTS']
+    results, has_next = [], False
+    offset = (page - 1) * per_page
+    if q and offset < max_results:
+        limit = min(per_page, max_results - offset)
+        # +1 запись, чтобы понять, есть ли следующая страница, без COUNT(*)
+        hits = search_index.search(q, limit=limit + 1, offset=offset)
+        has_next = len(hits) > limit and offset + limit < max_results
+        results = search_index.load_hits(hits[:limit])
+    return render_template('search/results.html', q=q, results=results, page=page, has_next=has_next,
+                           faq_url=faq_url)
+
+def _suggestion_url(item):
+    if item.kind == 'news':
+        return url_for('news.detail', news_id=item.ref_id)
+    if item.kind == 'deputy':
+        return url_for('deputies.detail', deputy_id=item.ref_id)
+    # У документов и вопросов FAQ нет своих страниц
+    return url_for('search.search', q=item.title)
+
+@bp.route('/suggest')
+def suggest():
+    q = request.args.get('q', '')[:200]
+    items = suggest_index.suggest(q, current_app.config['SUGGEST_LIMIT'])
+    response = jsonify(q=q, items=[
+        {'kind': item.kind, 'title': item.title, 'url': _suggestion_url(item)} for item in items
+    ])
+    # Ответ не зависит от пользователя: браузер и прокси могут переиспользовать его
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config['SUGGEST_MAX_AGE']
+    return response
@@ -0,0 +1,88 @@
+"""Сжатие динамических ответов gzip/brotli по заголовку Accept-Encoding.
+
+Потоковые ответы сжимаются на лету, не собираясь в памяти. Сжатое и
+несжатое представления отличаются побайтно, поэтому ETag становится слабым
+(``W/"…"``): для условных GET это не мешает, сравнение там слабое.
+Пакет Brotli необязателен — без него используется только gzip.
+"""
+import zlib
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - зависит от окружения
+    brotli = None
+
+from flask import request
+
+MIN_SIZE = 500
+COMPRESSIBLE_TYPES = ("application/json", "application/javascript", "application/xml",
+                      "image/svg+xml", "text/")
+GZIP_LEVEL = 6
+# Для динамических ответов: заметно лучше gzip и ещё быстро
+BROTLI_QUALITY = 5
+
+
+def available_encodings():
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def choose_encoding(encodings=None):
+    """Лучшее из encodings (по умолчанию — доступных сжатий), принимаемое клиентом, или None."""
+    encodings = available_encodings() if encodings is None else encodings
+    if not encodings:
+        return None
+    encoding = request.accept_encodings.best_match(encodings)
+    return encoding if encoding and request.accept_encodings[encoding] > 0 else None
+
+
+def _compressor(encoding):
+    if encoding == "br":
+        return brotli.Compressor(quality=BROTLI_QUALITY)
+    return zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+
+def _compress(data, encoding):
+    compressor = _compressor(encoding)
+    if encoding == "br":
+        return compressor.process(data) + compressor.finish()
+    return compressor.compress(data) + compressor.flush()
+
+
+def _compress_stream(chunks, encoding):
+    compressor = _compressor(encoding)
+    compress = compressor.process if encoding == "br" else compressor.compress
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        data = compress(chunk)
+        if data:
+            yield data
+    yield compressor.finish() if encoding == "br" else compressor.flush()
+
+
+def compress_response(response):
+    """after_request-обработчик: сжимает подходящий ответ, если клиент это поддерживает."""
+    if (response.status_code != 200
+            or response.direct_passthrough
+            or "Content-Encoding" in response.headers
+            or not (response.mimetype or "").startswith(COMPRESSIBLE_TYPES)):
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = choose_encoding()
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = _compress_stream(response.response, encoding)
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < MIN_SIZE:
+            return response
+        response.set_data(_compress(data, encoding))
+    response.headers["Content-Encoding"] = encoding
+
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
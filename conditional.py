@@ -0,0 +1,139 @@
+"""Условные GET-запросы (ETag / Last-Modified) для публичных страниц.
+
+Для каждой контентной таблицы в ``table_version`` хранится счётчик изменений и
+время последней правки; оба обновляются в той же транзакции, что и сами
+данные. Декоратор ``@conditional`` читает эти строки одним маленьким
+запросом, строит из них ETag и Last-Modified и отвечает 304, не вызывая
+вьюху и не загружая модели.
+"""
+import hashlib
+import os
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import current_app, make_response, request, session
+from flask_login import current_user
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models import News, Document, Event, Deputy, FAQ, TableVersion
+
+VERSIONED_MODELS = (News, Document, Event, Deputy, FAQ)
+
+
+def bump(connection, tables, now=None):
+    """Увеличивает версии перечисленных таблиц (используется и массовыми операциями)."""
+    now = now or datetime.utcnow()
+    t = TableVersion.__table__
+    for name in sorted(tables):
+        result = connection.execute(
+            t.update().where(t.c.table_name == name).values(version=t.c.version + 1, updated_at=now)
+        )
+        if result.rowcount == 0:
+            connection.execute(t.insert().values(table_name=name, version=1, updated_at=now))
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_changed_tables(session, flush_context):
+    tables = set()
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, VERSIONED_MODELS):
+            tables.add(obj.__tablename__)
+    for obj in session.dirty:
+        if isinstance(obj, VERSIONED_MODELS) and session.is_modified(obj, include_collections=False):
+            tables.add(obj.__tablename__)
+    if tables:
+        bump(session.connection(), tables)
+
+
+def _versions(tables):
+    t = TableVersion.__table__
+    rows = db.session.execute(
+        select(t.c.table_name, t.c.version, t.c.updated_at).where(t.c.table_name.in_(tables))
+    ).all()
+    return sorted(rows)
+
+
+def _template_fingerprint(app):
+    """Хэш шаблонов: после выкладки новых шаблонов старые ETag становятся недействительными."""
+    digest = hashlib.sha1()
+    root = os.path.join(app.root_path, app.template_folder)
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            path = os.path.join(dirpath, name)
+            digest.update(os.path.relpath(path, root).encode("utf-8"))
+            with open(path, "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+def _set_validators(response, etag, last_modified):
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # Страница зависит от того, вошёл ли пользователь, поэтому кэши должны
+    # различать ответы по cookie и каждый раз переспрашивать сервер.
+    response.cache_control.no_cache = True
+    response.vary.add("Cookie")
+
+
+def _not_modified(etag, last_modified):
+    if request.if_none_match:
+        # Слабое сравнение (RFC 9110): сжатый ответ несёт W/"…" с тем же значением
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified is not None:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def conditional(*tables, period=None):
+    """Добавляет ETag/Last-Modified по версиям таблиц и отвечает 304 до выполнения вьюхи.
+
+    period (секунды) — для страниц, зависящих от текущего времени (ближайшие
+    события): ETag меняется раз в period, даже если данные не менялись, а
+    Last-Modified не раньше начала текущего периода.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method not in ("GET", "HEAD") or "_flashes" in session:
+                return view(*args, **kwargs)
+
+            versions = _versions(tables)
+            seed = "|".join([
+                current_app.extensions["conditional_fingerprint"],
+                request.full_path,
+                current_user.get_id() or "",
+                *(f"{name}:{version}" for name, version, _ in versions),
+                str(int(time.time() // period)) if period else "",
+            ])
+            etag = hashlib.sha1(seed.encode("utf-8")).hexdigest()
+            last_modified = max((u for _, _, u in versions), default=None)
+            if last_modified is not None:
+                last_modified = last_modified.replace(tzinfo=timezone.utc)
+                if period:
+                    # Страница меняется и со временем: иначе клиент с
+                    # If-Modified-Since получал бы 304, пока не изменятся данные
+                    period_start = datetime.fromtimestamp(int(time.time() // period) * period, tz=timezone.utc)
+                    last_modified = max(last_modified, period_start)
+
+            if _not_modified(etag, last_modified):
+                response = current_app.response_class(status=304)
+                _set_validators(response, etag, last_modified)
+                return response
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                _set_validators(response, etag, last_modified)
+            return response
+        return wrapper
+    return decorator
+
+
+def init_conditional(app):
+    # Страницы ссылаются на статику по именам из манифеста сборки (assets.py)
+    assets = app.extensions.get("assets")
+    app.extensions["conditional_fingerprint"] = _template_fingerprint(app) + (assets.version if assets else "")
@@ -1,12 +1,136 @@
 import os
 
+def _engine_options(uri):
+    """Параметры пула. Для SQLite важнее PRAGMA (см. SQLITE_PRAGMAS), для Postgres — размер пула."""
+    if uri.startswith("sqlite"):
+        return {"connect_args": {"timeout": 30}}
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", "10")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": True,
+    }
+
+def _replica_binds():
+    uris = [u.strip() for u in os.getenv("SQLALCHEMY_REPLICA_URIS", "").split(",") if u.strip()]
+    return {f"replica{i}": uri for i, uri in enumerate(uris)}
+
 class Config:
     SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-change-me")
     SQLALCHEMY_DATABASE_URI = os.getenv("SQLALCHEMY_DATABASE_URI", "sqlite:///city_council.db")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLITE_PRAGMAS = {}
+    # Разделы, чьи GET-запросы читают с реплики (если реплики заданы)
+    READ_REPLICA_BLUEPRINTS = ("main", "news", "documents", "events", "deputies", "faq", "search")
+
+    # Пагинация публичных списков
+    PAGE_SIZE = int(os.getenv("PAGE_SIZE", "20"))
+    PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", "100"))
+
+    # Кэш ответов для анонимных посетителей (общий SQLite-файл для всех воркеров)
+    RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "1") == "1"
+    RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH")  # по умолчанию instance/response_cache.sqlite
+    RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    RESPONSE_CACHE_MAX_ENTRY_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRY_BYTES", str(1024 * 1024)))
+    RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+
+    # Метрики и диагностика
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")  # если задан, /metrics требует Authorization: Bearer <token>
+    METRICS_REQUIRE_TOKEN = os.getenv("METRICS_REQUIRE_TOKEN", "0") == "1"  # без токена /metrics закрыт
+    SLOW_QUERY_MS = int(os.getenv("SLOW_QUERY_MS", "200"))
+    PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"
+    PROFILE_DIR = os.getenv("PROFILE_DIR")  # по умолчанию instance/profiles
+
+    # Пароли: параметры KDF в полной записи Werkzeug; одновременных KDF на весь
+    # сервер — не больше PASSWORD_HASH_SLOTS (меньше числа воркеров gunicorn, 0 — без ограничения)
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    PASSWORD_HASH_SLOTS = int(os.getenv("PASSWORD_HASH_SLOTS", "1"))
+    PASSWORD_HASH_WAIT = float(os.getenv("PASSWORD_HASH_WAIT", "1"))  # секунд ожидания слота до 503
+    PASSWORD_HASH_LOCK_DIR = os.getenv("PASSWORD_HASH_LOCK_DIR")  # по умолчанию instance/hash_slots
+
+    # Текущий пользователь: кэш процесса и снимок в сессии (секунды до перепроверки по БД)
+    USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "60"))
+    USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "1024"))
+    USER_SESSION_SNAPSHOT = os.getenv("USER_SESSION_SNAPSHOT", "1") == "1"
+
+    # Ограничение попыток входа (неудачных) и регистрации (попыток за окно в секундах)
+    LOGIN_IP_LIMIT = int(os.getenv("LOGIN_IP_LIMIT", "30"))
+    LOGIN_IP_WINDOW = int(os.getenv("LOGIN_IP_WINDOW", "300"))
+    LOGIN_ACCOUNT_LIMIT = int(os.getenv("LOGIN_ACCOUNT_LIMIT", "5"))
+    LOGIN_ACCOUNT_WINDOW = int(os.getenv("LOGIN_ACCOUNT_WINDOW", "900"))
+    REGISTER_IP_LIMIT = int(os.getenv("REGISTER_IP_LIMIT", "10"))
+    REGISTER_IP_WINDOW = int(os.getenv("REGISTER_IP_WINDOW", "3600"))
+
+    # Файлы документов: хранилище по хэшу содержимого
+    DOCUMENT_STORAGE_DIR = os.getenv("DOCUMENT_STORAGE_DIR")  # по умолчанию instance/documents
+    DOCUMENT_EXTENSIONS = set(os.getenv("DOCUMENT_EXTENSIONS", "pdf,doc,docx,odt,rtf,xls,xlsx,ods,txt,zip").split(","))
+    DOCUMENT_SENDFILE = os.getenv("DOCUMENT_SENDFILE", "")  # "", "x-sendfile" или "x-accel"
+    DOCUMENT_ACCEL_PREFIX = os.getenv("DOCUMENT_ACCEL_PREFIX", "/_documents/")  # internal location в nginx
+    MAX_CONTENT_LENGTH = int(os.getenv("MAX_UPLOAD_BYTES", str(100 * 1024 * 1024)))
+
+    # Календарь: окно «ближайших» событий, предел вхождений на страницу, глубина ленты iCal
+    CALENDAR_UPCOMING_DAYS = int(os.getenv("CALENDAR_UPCOMING_DAYS", "30"))
+    CALENDAR_MAX_OCCURRENCES = int(os.getenv("CALENDAR_MAX_OCCURRENCES", "500"))
+    CALENDAR_FEED_PAST_DAYS = int(os.getenv("CALENDAR_FEED_PAST_DAYS", "90"))
+
+    # Фоновая очередь задач (tasks.py): по умолчанию таблица job в основной БД
+    TASK_QUEUE_URI = os.getenv("TASK_QUEUE_URI")  # например sqlite:///instance/tasks.sqlite
+    TASKS_EAGER = os.getenv("TASKS_EAGER", "0") == "1"  # выполнять сразу после коммита, без воркера
+    TASK_CONCURRENCY = os.getenv("TASK_CONCURRENCY", "")  # "search.index=1,другой.тип=4"
+    TASK_BACKOFF_BASE = int(os.getenv("TASK_BACKOFF_BASE", "5"))
+    TASK_BACKOFF_MAX = int(os.getenv("TASK_BACKOFF_MAX", "3600"))
+    TASK_LEASE_SECONDS = int(os.getenv("TASK_LEASE_SECONDS", "300"))
+    TASK_DONE_RETENTION_HOURS = int(os.getenv("TASK_DONE_RETENTION_HOURS", "24"))
+
+    # Статика: сборка с отпечатками (flask assets build), без манифеста — обычная раздача
+    ASSETS_BUILD_DIR = os.getenv("ASSETS_BUILD_DIR")  # по умолчанию instance/assets
+    ASSETS_FINGERPRINT = os.getenv("ASSETS_FINGERPRINT", "1") == "1"
+
+    # Статический экспорт (flask freeze): каталог для nginx, адрес сайта для ссылок и ленты
+    FREEZE_DIR = os.getenv("FREEZE_DIR")  # по умолчанию instance/frozen
+    FREEZE_BASE_URL = os.getenv("FREEZE_BASE_URL", "http://localhost")
+    FREEZE_CALENDAR_MONTHS = int(os.getenv("FREEZE_CALENDAR_MONTHS", "12"))  # окно сеток календаря, ± месяцев
+
+    # Старт воркера (startup.py): админка отдельным экземпляром при первом /admin,
+    # кэш байт-кода шаблонов на диске, прогрев до fork() для gunicorn --preload
+    ADMIN_LAZY = os.getenv("ADMIN_LAZY", "1") == "1"
+    JINJA_BYTECODE_CACHE = os.getenv("JINJA_BYTECODE_CACHE", "1") == "1"
+    JINJA_CACHE_DIR = os.getenv("JINJA_CACHE_DIR")  # по умолчанию instance/jinja_cache
+    STARTUP_PREWARM = os.getenv("STARTUP_PREWARM", "0") == "1"
+
+    # JSON API (/api/v1): предел per_page для потоковой выдачи
+    API_PAGE_SIZE_MAX = int(os.getenv("API_PAGE_SIZE_MAX", "1000"))
+
+    # Поиск
+    SEARCH_PER_PAGE = int(os.getenv("SEARCH_PER_PAGE", "20"))
+    SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "500"))
+    # Подсказки (/search/suggest): индекс в памяти каждого воркера
+    SUGGEST_MAX_KEYS = int(os.getenv("SUGGEST_MAX_KEYS", "200000"))  # ~170 байт на ключ, ~35 МиБ
+    SUGGEST_SYNC_SECONDS = int(os.getenv("SUGGEST_SYNC_SECONDS", "10"))
+    SUGGEST_LIMIT = int(os.getenv("SUGGEST_LIMIT", "8"))
+    SUGGEST_MAX_AGE = int(os.getenv("SUGGEST_MAX_AGE", "30"))
 
 class DevConfig(Config):
     DEBUG = True
+    # Локально воркер обычно не запущен
+    TASKS_EAGER = os.getenv("TASKS_EAGER", "1") == "1"
+    # Правки static/ видны сразу, без пересборки
+    ASSETS_FINGERPRINT = os.getenv("ASSETS_FINGERPRINT", "0") == "1"
 
 class ProdConfig(Config):
     DEBUG = False
+    # Метрики наружу — только с METRICS_TOKEN
+    METRICS_REQUIRE_TOKEN = os.getenv("METRICS_REQUIRE_TOKEN", "1") == "1"
+    SQLALCHEMY_ENGINE_OPTIONS = _engine_options(Config.SQLALCHEMY_DATABASE_URI)
+    # WAL позволяет читателям не ждать записи из админки
+    SQLITE_PRAGMAS = {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": int(os.getenv("SQLITE_CACHE_KIB", "65536")) * -1,  # отрицательное — в КиБ
+        "mmap_size": int(os.getenv("SQLITE_MMAP_BYTES", str(256 * 1024 * 1024))),
+        "temp_store": "MEMORY",
+        "busy_timeout": 30000,
+    }
+    SQLALCHEMY_BINDS = _replica_binds()
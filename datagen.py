@@ -0,0 +1,191 @@
+"""Генератор синтетических данных для нагрузочных тестов: ``flask datagen --scale small``.
+
+Строки строятся по схеме из models.py и вставляются пачками через Core, без
+ORM-объектов; excerpt считается при генерации, поисковый индекс и версии
+таблиц обновляются один раз в конце. Генерация детерминирована (``--seed``).
+"""
+import random
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+
+import click
+from flask import current_app
+
+import conditional
+import freeze
+import response_cache
+import search_index
+from extensions import db
+from models import User, News, Document, Event, Deputy, FAQ, make_excerpt
+
+SCALES = {
+    "tiny": {"news": 1_000, "document": 1_000, "event": 1_000, "deputy": 100, "faq": 100},
+    "small": {"news": 10_000, "document": 10_000, "event": 10_000, "deputy": 1_000, "faq": 1_000},
+    "medium": {"news": 100_000, "document": 100_000, "event": 100_000, "deputy": 2_000, "faq": 2_000},
+    "large": {"news": 1_000_000, "document": 1_000_000, "event": 1_000_000, "deputy": 5_000, "faq": 5_000},
+}
+
+BENCH_ADMIN = ("bench-admin@example.com", "bench12345")
+BENCH_USER = ("bench@example.com", "bench12345")
+
+WORDS = (
+    "бюджет городской думы постановление решение проект транспорт благоустройство двор "
+    "комиссия заседание депутат округ жители обращение программа развитие школа больница "
+    "дорога ремонт парк освещение экология отходы тариф жкх отопление водоснабжение "
+    "муниципальный закупка контракт отчёт исполнение инвестиции предприятие налог сбор "
+    "культура спорт молодёжь ветераны социальный поддержка семья детский сад остановка "
+    "автобус трамвай маршрут пешеходный переход светофор уборка снег зима лето публичные "
+    "слушания администрация мэр совет фракция голосование повестка вопрос поправка"
+).split()
+_SURNAMES = ("Иванов", "Петров", "Сидоров", "Смирнов", "Кузнецов", "Попов", "Васильев",
+             "Соколов", "Михайлов", "Новиков", "Фёдоров", "Морозов", "Волков", "Алексеев")
+_NAMES = ("Иван", "Пётр", "Алексей", "Сергей", "Андрей", "Дмитрий", "Михаил", "Николай")
+_PATRONYMICS = ("Иванович", "Петрович", "Сергеевич", "Андреевич", "Николаевич", "Олегович")
+_FACTIONS = ("Единство", "Развитие", "Город", "Независимые")
+_DOC_TYPES = ("постановление", "проект", "решение")
+_LOCATIONS = ("Зал заседаний №1", "Зал заседаний №2", "Малый зал", "Онлайн")
+
+
+def _sentence(rng, words):
+    text = " ".join(rng.choice(WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+
+def _paragraphs(rng, sentences):
+    return " ".join(_sentence(rng, rng.randint(6, 16)) for _ in range(sentences))
+
+
+def _news(rng, now, author_id):
+    while True:
+        body = _paragraphs(rng, rng.randint(5, 40))
+        yield {
+            "title": _sentence(rng, rng.randint(4, 10))[:200],
+            "body": body,
+            "excerpt": make_excerpt(body),
+            "published_at": now - timedelta(minutes=rng.randint(0, 60 * 24 * 365 * 10)),
+            "is_published": rng.random() > 0.05,
+            "created_by_id": author_id,
+            "updated_at": now,
+        }
+
+
+def _documents(rng, now):
+    while True:
+        summary = _paragraphs(rng, rng.randint(1, 6))
+        yield {
+            "title": _sentence(rng, rng.randint(3, 9))[:200],
+            "summary": summary,
+            "excerpt": make_excerpt(summary),
+            "doc_type": rng.choice(_DOC_TYPES),
+            "file_url": "#",
+            "published_at": now - timedelta(minutes=rng.randint(0, 60 * 24 * 365 * 10)),
+            "is_published": rng.random() > 0.05,
+            "updated_at": now,
+        }
+
+
+def _events(rng, now):
+    while True:
+        start = now + timedelta(hours=rng.randint(-24 * 365 * 5, 24 * 365))
+        yield {
+            "title": "Заседание: " + _sentence(rng, rng.randint(2, 6))[:180],
+            "description": _paragraphs(rng, rng.randint(1, 4)),
+            "start_time": start,
+            "end_time": start + timedelta(hours=rng.randint(1, 4)),
+            "location": rng.choice(_LOCATIONS),
+            "is_public": rng.random() > 0.05,
+            "updated_at": now,
+        }
+
+
+def _deputies(rng, now):
+    number = 0
+    while True:
+        number += 1
+        bio = _paragraphs(rng, rng.randint(3, 20))
+        yield {
+            "full_name": f"{rng.choice(_SURNAMES)} {rng.choice(_NAMES)} {rng.choice(_PATRONYMICS)}",
+            "faction": rng.choice(_FACTIONS),
+            "district": f"Округ №{rng.randint(1, 50)}",
+            "email": f"deputy{number}@example.com",
+            "phone": f"+7 900 {rng.randint(100, 999)}-{rng.randint(10, 99)}-{rng.randint(10, 99)}",
+            "bio": bio,
+            "excerpt": make_excerpt(bio),
+            "updated_at": now,
+        }
+
+
+def _faqs(rng, now):
+    while True:
+        yield {
+            "question": (_sentence(rng, rng.randint(5, 12))[:-1] + "?")[:300],
+            "answer": _paragraphs(rng, rng.randint(1, 5)),
+            "is_published": rng.random() > 0.05,
+            "updated_at": now,
+        }
+
+
+def _insert(model, rows, count, chunk_size):
+    table = model.__table__
+    started = time.perf_counter()
+    done = 0
+    while done < count:
+        batch = list(islice(rows, min(chunk_size, count - done)))
+        with db.engine.begin() as connection:
+            connection.execute(table.insert(), batch)
+        done += len(batch)
+        rate = done / (time.perf_counter() - started)
+        click.echo(f"\r{table.name}: {done}/{count} ({rate:.0f} строк/с)", nl=False)
+    click.echo()
+
+
+def _create_user(email, password, role):
+    user = User.query.filter_by(email=email).first()
+    if user is None:
+        user = User(email=email, name=email.split("@")[0], role=role)
+        user.set_password(password)
+        db.session.add(user)
+        db.session.commit()
+    return user
+
+
+def generate(scale, seed=0, chunk_size=5000):
+    counts = SCALES[scale]
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+
+    admin = _create_user(*BENCH_ADMIN, role="admin")
+    _create_user(*BENCH_USER, role="user")
+
+    _insert(News, _news(rng, now, admin.id), counts["news"], chunk_size)
+    _insert(Document, _documents(rng, now), counts["document"], chunk_size)
+    _insert(Event, _events(rng, now), counts["event"], chunk_size)
+    _insert(Deputy, _deputies(rng, now), counts["deputy"], chunk_size)
+    _insert(FAQ, _faqs(rng, now), counts["faq"], chunk_size)
+
+    click.echo("Поисковый индекс…")
+    with db.engine.begin() as connection:
+        search_index.rebuild(connection, batch_size=chunk_size)
+        conditional.bump(connection, set(counts))
+    response_cache.invalidate(set(counts))
+    freeze.schedule(set(counts))
+
+
+def init_datagen(app):
+    @app.cli.command("datagen")
+    @click.option("--scale", type=click.Choice(list(SCALES)), default="small", show_default=True)
+    @click.option("--seed", default=0, show_default=True, help="Зерно генератора случайных чисел.")
+    @click.option("--chunk-size", default=5000, show_default=True)
+    @click.option("--reset", is_flag=True, help="Пересоздать все таблицы перед генерацией.")
+    def datagen(scale, seed, chunk_size, reset):
+        """Заполнить БД синтетическими данными заданного масштаба."""
+        if reset:
+            db.drop_all()
+            db.create_all()
+            cache = current_app.extensions.get("response_cache")
+            if cache is not None:
+                cache.clear()
+        generate(scale, seed=seed, chunk_size=chunk_size)
+        click.echo(f"Готово. Пользователи: {BENCH_ADMIN[0]} (admin), {BENCH_USER[0]}; "
+                   f"пароль {BENCH_USER[1]}")
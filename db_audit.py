@@ -0,0 +1,393 @@
+"""Аудит планов SQL-запросов и подбор индексов: ``flask db-audit``.
+
+Команда прогоняет через тестовый клиент страницы из benchmark.py и списки
+админки, записывает каждый выполненный SQL-запрос и получает его план
+(SQLite — ``EXPLAIN QUERY PLAN``, PostgreSQL — ``EXPLAIN (FORMAT JSON)``).
+В отчёт попадают:
+
+- просмотр всей таблицы при условии на её колонки;
+- сортировка во временном B-дереве (SQLite) или узлом Sort (PostgreSQL);
+- N+1 — один и тот же запрос много раз за HTTP-запрос, в том числе ленивые
+  загрузки связей вроде ``News.created_by``.
+
+Для просмотров и сортировок предлагается составной индекс: сначала колонки
+из условий на равенство, затем колонки сортировки, затем одна колонка
+диапазона. С ``--migration`` предложения, которых ещё нет в БД, пишутся
+ревизией Alembic в ``migrations/versions``; индексы нужно перенести и в
+``__table_args__`` моделей. Запускать на БД, заполненной ``flask datagen``:
+на пустых таблицах планировщику незачем выбирать индексы.
+"""
+import random
+import re
+import threading
+from collections import Counter, namedtuple
+
+import click
+from flask import current_app, url_for
+from flask.cli import with_appcontext
+from sqlalchemy import Column, Table, event, func, inspect, select
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import operators, visitors
+from sqlalchemy.sql.elements import BinaryExpression, UnaryExpression
+from sqlalchemy.sql.selectable import Select
+
+from db_engine import FRESH_READ
+from extensions import db
+from startup import admin_app
+
+# Столько одинаковых запросов за один HTTP-запрос считается N+1
+N_PLUS_ONE = 3
+EQUALITY_OPERATORS = (operators.eq, operators.is_, operators.in_op)
+RANGE_OPERATORS = (operators.lt, operators.le, operators.gt, operators.ge, operators.between_op)
+MAX_INDEX_NAME = 63  # предел PostgreSQL
+
+_SQLITE_SCAN_RE = re.compile(r"^SCAN (\w+)(?: USING (?:COVERING )?INDEX (\w+))?")
+_SQLITE_SORT_RE = re.compile(r"USE TEMP B-TREE FOR (?:RIGHT PART OF |LAST \d+ TERMS OF )?(ORDER BY|GROUP BY|DISTINCT)")
+
+# Шаг плана: kind — "scan" или "sort", table — None, если таблица не названа
+Step = namedtuple("Step", "kind table detail")
+Proposal = namedtuple("Proposal", "table columns")
+
+
+class Recorder:
+    """Записывает SQL и ленивые загрузки связей, выполненные в этом потоке."""
+
+    def __init__(self):
+        self.thread = threading.get_ident()
+        self.url = None
+        self.statements = {}  # текст SQL → (параметры, выражение, Counter адресов)
+        self.per_request = Counter()
+        self.lazy_loads = Counter()
+        self.repeated = []  # (адрес, текст SQL, раз за запрос)
+        self.lazy = []  # (адрес, связь, раз за запрос)
+        self.lazy_statements = set()
+        self.pending = False
+
+    def start(self, url):
+        self.url = url
+        self.per_request = Counter()
+        self.lazy_loads = Counter()
+
+    def finish(self):
+        for statement, count in self.per_request.items():
+            # Ленивые загрузки показываются отдельно, с именем связи
+            if count >= N_PLUS_ONE and statement not in self.lazy_statements:
+                self.repeated.append((self.url, statement, count))
+        for relationship, count in self.lazy_loads.items():
+            if count >= N_PLUS_ONE:
+                self.lazy.append((self.url, relationship, count))
+        self.url = None
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self.url is None or threading.get_ident() != self.thread or executemany:
+            return
+        compiled = getattr(context, "compiled", None)
+        entry = self.statements.setdefault(
+            statement, (parameters, getattr(compiled, "statement", None), Counter()))
+        entry[2][self.url] += 1
+        self.per_request[statement] += 1
+        if self.pending:
+            self.lazy_statements.add(statement)
+            self.pending = False
+
+    def do_orm_execute(self, state):
+        if self.url is not None and state.is_relationship_load and state.lazy_loaded_from is not None:
+            self.lazy_loads[str(state.loader_strategy_path[-1])] += 1
+            self.pending = True
+
+
+# --- Сценарии -----------------------------------------------------------------
+
+def _pages(app, rng, repeat):
+    """Адреса для прогона: публичные страницы benchmark.py, затем списки админки."""
+    # Импорт здесь: benchmark.py импортирует app, а app — этот модуль. Кэш ответов
+    # прогону не мешает: запросы идут с FRESH_READ (см. _request), мимо кэша
+    from benchmark import Call, _scenarios
+
+    for name, make in _scenarios(app, rng).items():
+        for _ in range(repeat):
+            yield None, make()
+    # При ADMIN_LAZY админку обслуживает отдельное приложение
+    admin = admin_app(app)
+    # Списки моделей — правила index_view представлений Flask-Admin (главная админки — admin.index)
+    endpoints = sorted(rule.endpoint for rule in admin.url_map.iter_rules()
+                       if rule.endpoint.endswith(".index_view"))
+    with admin.test_request_context():
+        views = [url_for(endpoint) for endpoint in endpoints]
+    for url in views:
+        yield "admin", Call("GET", url)
+
+
+def _run(app, recorder, repeat, seed):
+    from datagen import BENCH_ADMIN
+
+    rng = random.Random(seed)
+    clients = {None: app.test_client(), "admin": app.test_client()}
+    csrf = app.config.get("WTF_CSRF_ENABLED", True)
+    app.config["WTF_CSRF_ENABLED"] = False
+    try:
+        # Каждый запрос — в своём контексте приложения (свои g и сессия БД), как на сервере:
+        # иначе запросы наследуют контекст команды и пользователя из g
+        with app.app_context():
+            response = clients["admin"].post("/auth/login", data={"email": BENCH_ADMIN[0], "password": BENCH_ADMIN[1]})
+        if response.status_code != 302:
+            click.echo(f"Не удалось войти как {BENCH_ADMIN[0]} (flask datagen): списки админки пропущены")
+            clients.pop("admin")
+        for who, call in _pages(app, rng, repeat):
+            client = clients.get(who)
+            if client is None:
+                continue
+            with app.app_context():
+                if call.setup:
+                    call.setup(client)
+            recorder.start(call.url)
+            try:
+                with app.app_context():
+                    _request(client, call)
+            finally:
+                recorder.finish()
+            with app.app_context():
+                if call.teardown:
+                    call.teardown(client)
+    finally:
+        app.config["WTF_CSRF_ENABLED"] = csrf
+
+
+def _request(client, call):
+    # Свежее чтение — мимо кэша ответов и реплик
+    if call.method == "POST":
+        client.post(call.url, data=call.data, environ_base={FRESH_READ: True})
+    else:
+        client.get(call.url, environ_base={FRESH_READ: True})
+
+
+# --- Планы --------------------------------------------------------------------
+
+def _plan_nodes(node):
+    yield node
+    for child in node.get("Plans", ()):
+        yield from _plan_nodes(child)
+
+
+def _relation(node):
+    for child in _plan_nodes(node):
+        if "Relation Name" in child:
+            return child["Relation Name"]
+    return None
+
+
+def explain(connection, statement, parameters):
+    """Шаги плана, требующие внимания: list[Step]."""
+    steps = []
+    if connection.dialect.name == "sqlite":
+        for row in connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters):
+            detail = row[-1]
+            scan = _SQLITE_SCAN_RE.match(detail)
+            if scan and "VIRTUAL TABLE" not in detail:
+                steps.append(Step("scan", scan.group(1), detail))
+            elif _SQLITE_SORT_RE.search(detail):
+                steps.append(Step("sort", None, detail))
+    elif connection.dialect.name == "postgresql":
+        plan = connection.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar()
+        for node in _plan_nodes(plan[0]["Plan"]):
+            kind = node["Node Type"]
+            if kind in ("Seq Scan", "Index Scan", "Index Only Scan") and "Filter" in node:
+                steps.append(Step("scan", node["Relation Name"], f"{kind} on {node['Relation Name']}: {node['Filter']}"))
+            elif kind in ("Sort", "Incremental Sort"):
+                steps.append(Step("sort", _relation(node), f"{kind}: {', '.join(node.get('Sort Key', ()))}"))
+    return steps
+
+
+# --- Предложения индексов -------------------------------------------------------
+
+def _table_column(element, table_name):
+    if isinstance(element, UnaryExpression):
+        element = element.element
+    table = getattr(element, "table", None)
+    if isinstance(element, Column) and isinstance(table, Table) and table.name == table_name:
+        return element.name
+    return None
+
+
+def _add(columns, name):
+    if name is not None and name not in columns:
+        columns.append(name)
+
+
+def _predicates(statement, table_name):
+    """Колонки table_name из условий на равенство, сортировки и диапазонов statement."""
+    equality, order, ranges = [], [], []
+    for element in visitors.iterate(statement):
+        # Колонка = колонка — условие соединения, его покрывают первичный и внешние ключи
+        if isinstance(element, BinaryExpression) and not isinstance(element.right, Column):
+            name = _table_column(element.left, table_name)
+            if element.operator in EQUALITY_OPERATORS:
+                _add(equality, name)
+            elif element.operator in RANGE_OPERATORS:
+                _add(ranges, name)
+        elif isinstance(element, Select):
+            for clause in element._order_by_clauses:
+                _add(order, _table_column(clause, table_name))
+    return equality, order, ranges
+
+
+def propose(statement, table_name, kind):
+    """(составной индекс, число колонок равенства) для шага плана kind или None, если индекс не поможет."""
+    equality, order, ranges = _predicates(statement, table_name)
+    if kind == "scan" and not (equality or ranges) or kind == "sort" and not order:
+        return None
+    columns = list(equality)
+    for name in order + ranges[:1]:
+        _add(columns, name)
+    return Proposal(table_name, tuple(columns)), len(equality)
+
+
+def _covered(proposal, equality_count, indexes):
+    """Есть ли индекс с теми же ведущими колонками (условия на равенство — в любом порядке)."""
+    columns = proposal.columns
+    for existing in indexes:
+        head = existing[:len(columns)]
+        if (len(head) == len(columns) and set(head[:equality_count]) == set(columns[:equality_count])
+                and head[equality_count:] == columns[equality_count:]):
+            return True
+    return False
+
+
+def _merge(proposals):
+    """Индекс, колонки которого — начало другого предложенного, поглощается более длинным."""
+    merged = {}
+    for proposal in sorted(proposals, key=lambda p: -len(p.columns)):
+        longer = next((other for other in merged if other.table == proposal.table
+                       and other.columns[:len(proposal.columns)] == proposal.columns), None)
+        merged.setdefault(longer or proposal, set()).update(proposals[proposal])
+    return merged
+
+
+def _indexes(inspector, table_name):
+    indexes = [tuple(index["column_names"]) for index in inspector.get_indexes(table_name)]
+    primary = inspector.get_pk_constraint(table_name)["constrained_columns"]
+    return indexes + [tuple(primary)] if primary else indexes
+
+
+def index_name(proposal):
+    return f"ix_{proposal.table}_{'_'.join(proposal.columns)}"[:MAX_INDEX_NAME]
+
+
+# --- Отчёт и миграция ------------------------------------------------------------
+
+def audit(app, repeat=2, seed=0, min_rows=1000):
+    """Прогоняет страницы; возвращает (находки, предложения, N+1 по SQL, ленивые загрузки)."""
+    recorder = Recorder()
+    # Приложение админки пользуется теми же движками
+    event.listen(db.engine, "before_cursor_execute", recorder.before_cursor_execute)
+    event.listen(Session, "do_orm_execute", recorder.do_orm_execute)
+    try:
+        _run(app, recorder, repeat, seed)
+    finally:
+        event.remove(db.engine, "before_cursor_execute", recorder.before_cursor_execute)
+        event.remove(Session, "do_orm_execute", recorder.do_orm_execute)
+
+    findings, proposals = [], {}
+    with db.engine.connect() as connection:
+        inspector = inspect(connection)
+        tables = db.metadata.tables
+        rows = {}
+
+        def large(name):
+            if name not in tables:
+                return False  # псевдоним, подзапрос или служебная таблица вне моделей
+            if name not in rows:
+                rows[name] = connection.execute(select(func.count()).select_from(tables[name])).scalar()
+            return rows[name] >= min_rows
+
+        for text, (parameters, statement, urls) in recorder.statements.items():
+            if statement is None or not text.lstrip().upper().startswith("SELECT"):
+                continue
+            for step in explain(connection, text, parameters):
+                candidates = [name for name in ([step.table] if step.table else tables) if large(name)]
+                if not candidates:
+                    continue
+                proposal = None
+                for name in candidates:
+                    found = propose(statement, name, step.kind)
+                    if found is not None:
+                        proposal, equality_count = found
+                        break
+                # Без условий и сортировки по колонкам таблицы (полнотекстовый поиск, count(*)
+                # всей таблицы) индекс не поможет; если подходящий индекс уже есть —
+                # планировщик счёл просмотр дешевле
+                if proposal is None or _covered(proposal, equality_count, _indexes(inspector, proposal.table)):
+                    continue
+                proposals.setdefault(proposal, set()).update(urls)
+                findings.append((step, text, sorted(urls), proposal))
+    return findings, _merge(proposals), recorder.repeated, recorder.lazy
+
+
+def _short(text, length=300):
+    text = " ".join(text.split())
+    return text if len(text) <= length else text[:length - 1] + "…"
+
+
+def migration_ops(proposals):
+    """Тексты upgrade() и downgrade() в стиле автогенерации Alembic."""
+    by_table = {}
+    for proposal in sorted(proposals):
+        by_table.setdefault(proposal.table, []).append(proposal)
+    upgrades, downgrades = [], []
+    for table, items in sorted(by_table.items()):
+        lines = [f"with op.batch_alter_table({table!r}, schema=None) as batch_op:"]
+        lines += [f"    batch_op.create_index({index_name(p)!r}, {list(p.columns)!r}, unique=False)" for p in items]
+        upgrades.append("\n    ".join(lines))
+    for table, items in sorted(by_table.items(), reverse=True):
+        lines = [f"with op.batch_alter_table({table!r}, schema=None) as batch_op:"]
+        lines += [f"    batch_op.drop_index({index_name(p)!r})" for p in reversed(items)]
+        downgrades.append("\n    ".join(lines))
+    return "\n\n    ".join(upgrades), "\n\n    ".join(downgrades)
+
+
+def write_migration(proposals, message):
+    from alembic.script import ScriptDirectory
+    from alembic.util import rev_id
+
+    config = current_app.extensions["migrate"].migrate.get_config()
+    upgrades, downgrades = migration_ops(proposals)
+    script = ScriptDirectory.from_config(config).generate_revision(
+        rev_id(), message, head="head", upgrades=upgrades, downgrades=downgrades)
+    return script.path
+
+
+@click.command("db-audit")
+@with_appcontext
+@click.option("--requests", "repeat", default=2, show_default=True, help="Прогонов каждой публичной страницы.")
+@click.option("--seed", default=0, show_default=True)
+@click.option("--min-rows", default=1000, show_default=True,
+              help="Таблицы меньшего размера не проверяются: на них просмотр дешевле индекса.")
+@click.option("--migration", is_flag=True, help="Записать предложенные индексы ревизией Alembic.")
+@click.option("--message", "-m", default="proposed indexes", show_default=True, help="Заголовок ревизии.")
+def audit_command(repeat, seed, min_rows, migration, message):
+    """Проверить планы SQL-запросов страниц и предложить индексы."""
+    findings, proposals, repeated, lazy = audit(current_app._get_current_object(), repeat, seed, min_rows)
+
+    for title, kind in (("Просмотр таблицы с фильтром", "scan"), ("Сортировка без индекса", "sort")):
+        items = [f for f in findings if f[0].kind == kind]
+        click.echo(f"\n{title}: {len(items)}")
+        for step, text, urls, proposal in items:
+            click.echo(f"- {step.detail}\n  {_short(text)}\n  страницы: {', '.join(urls[:5])}"
+                       + (f"\n  индекс: {proposal.table}({', '.join(proposal.columns)})" if proposal else ""))
+
+    click.echo(f"\nN+1 (от {N_PLUS_ONE} одинаковых запросов за запрос): {len(repeated) + len(lazy)}")
+    for url, relationship, count in sorted(set(lazy)):
+        click.echo(f"- {url}: ленивая загрузка {relationship} ×{count} — нужен selectinload/joinedload")
+    for url, text, count in sorted(set(repeated)):
+        click.echo(f"- {url}: ×{count} {_short(text, 200)}")
+
+    click.echo(f"\nПредлагаемые индексы: {len(proposals)}")
+    for proposal, urls in sorted(proposals.items()):
+        click.echo(f"- {index_name(proposal)}: {proposal.table}({', '.join(proposal.columns)}) — {len(urls)} стр.")
+    if migration and proposals:
+        path = write_migration(proposals, message)
+        click.echo(f"\nМиграция: {path}\nДобавьте те же индексы в __table_args__ моделей (models.py).")
+
+
+def init_db_audit(app):
+    app.cli.add_command(audit_command)
@@ -0,0 +1,72 @@
+"""Профиль подключения к БД: PRAGMA для SQLite и маршрутизация чтения на реплики.
+
+Публичные разделы только читают данные, поэтому их SELECT-запросы можно
+отправлять на реплику (bind ``replica0``, ``replica1``, …, см.
+``SQLALCHEMY_REPLICA_URIS``). Запись, flush и всё, что идёт из админки и
+авторизации, по-прежнему выполняется на основной БД.
+"""
+import random
+
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session as BaseSession
+from sqlalchemy import event
+from sqlalchemy.sql import Select
+
+REPLICA_PREFIX = "replica"
+# Ключ WSGI environ для внутренних запросов, которым нужны только что
+# закоммиченные данные (статический экспорт): основная БД и без кэша ответов.
+# Клиент его выставить не может — заголовки попадают в environ с префиксом HTTP_.
+FRESH_READ = "city_council.fresh_read"
+
+
+def _replica_engine():
+    if not has_request_context():
+        return None
+    key = g.get("db_replica")
+    if key is None:
+        return None
+    return current_app.extensions["sqlalchemy"].engines.get(key)
+
+
+class RoutingSession(BaseSession):
+    """Сессия, отправляющая чтение публичных страниц на реплику."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        # clause=None — это session.connection(), его используют только для чтения
+        # (поиск); записи из хуков after_flush идут при _flushing=True.
+        if bind is None and not self._flushing and (clause is None or isinstance(clause, Select)):
+            engine = _replica_engine()
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _sqlite_pragmas(pragmas):
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+    return set_pragmas
+
+
+def init_db_engine(app):
+    """Вызывается сразу после db.init_app(app), до первого соединения."""
+    pragmas = app.config["SQLITE_PRAGMAS"]
+    with app.app_context():
+        engines = dict(app.extensions["sqlalchemy"].engines)
+    if pragmas:
+        for engine in engines.values():
+            if engine.dialect.name == "sqlite":
+                event.listen(engine, "connect", _sqlite_pragmas(pragmas))
+
+    replicas = [key for key in engines if key and key.startswith(REPLICA_PREFIX)]
+    if not replicas:
+        return
+    read_only = set(app.config["READ_REPLICA_BLUEPRINTS"])
+
+    @app.before_request
+    def choose_replica():
+        if request.method in ("GET", "HEAD") and request.blueprint in read_only \
+                and not request.environ.get(FRESH_READ):
+            g.db_replica = random.choice(replicas)
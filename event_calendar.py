@@ -0,0 +1,204 @@
+"""Календарь событий: выборка по окну дат и лента iCal.
+
+Обычные события выбираются только в пределах окна (месяц, неделя, ближайшие
+дни): начавшиеся в окне — по индексу ``(is_public, start_time)``, начавшиеся
+раньше и ещё идущие — по ``(is_public, end_time)``. Повторяющиеся заседания —
+это одна строка с правилом ``recurrence`` (см. recurrence.py); их немного,
+они читаются отдельным запросом и разворачиваются только для этого окна.
+Порядок — по (началу вхождения, id события); по этим же ключам окно
+листается курсором (``pagination.paginate_with``).
+
+Лента ``.ics`` пишется построчно из серверного курсора: события не
+загружаются в память целиком, а правило повторения передаётся как RRULE —
+календарные приложения разворачивают его сами. Время событий хранится без
+часового пояса и так же, «плавающим», отдаётся в ленту.
+"""
+import calendar
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import and_, or_, select
+
+from extensions import db
+from models import Event
+from pagination import seek
+from recurrence import expand, parse_rule
+
+Occurrence = namedtuple("Occurrence", "event start end")
+
+# Ключи сортировки вхождений для курсора страницы
+KEYS = [(Event.start_time, False), (Event.id, False)]
+
+# В сетке месяца показываются и дни соседних месяцев, поэтому окно шире месяца
+_month_calendar = calendar.Calendar(firstweekday=0)
+
+
+def occurrence_key(occurrence):
+    return [occurrence.start, occurrence.event.id]
+
+
+def _beyond(key, cursor, forward, inclusive):
+    if forward:
+        return key > cursor or (inclusive and key == cursor)
+    return key < cursor
+
+
+def occurrences(start, end, limit=None, cursor=None, forward=True, inclusive=False):
+    """Вхождения публичных событий, идущие в окне [start, end), по времени начала.
+
+    Сюда входят и события, начавшиеся до окна, но ещё не закончившиеся к его
+    началу. cursor — значения KEYS: выдаются вхождения после него (или перед
+    ним при forward=False, тогда от курсора к началу). limit ограничивает и
+    выборку обычных событий, и развёртку каждой серии, поэтому окно с
+    тысячами событий не загружается целиком.
+    """
+    single = (Event.query
+              .filter_by(is_public=True)
+              .filter(Event.recurrence.is_(None),
+                      or_(and_(Event.start_time >= start, Event.start_time < end),
+                          and_(Event.start_time < start, Event.end_time >= start))))
+    if cursor is not None:
+        single = single.filter(seek(KEYS, cursor, forward, inclusive))
+    order = (Event.start_time, Event.id) if forward else (Event.start_time.desc(), Event.id.desc())
+    single = single.order_by(*order)
+    if limit:
+        single = single.limit(limit)
+    items = [Occurrence(e, e.start_time, e.end_time) for e in single]
+
+    cursor_key = tuple(cursor) if cursor is not None else None
+    series = (Event.query
+              .filter_by(is_public=True)
+              .filter(Event.start_time < end, Event.recurrence.isnot(None)))
+    for event in series:
+        duration = event.end_time - event.start_time if event.end_time else None
+        # Вхождение, начавшееся за duration до окна, ещё идёт в его начале
+        lo, hi = (start - duration if duration else start), end
+        if cursor_key is not None:
+            if forward:
+                lo = max(lo, cursor_key[0])
+            else:
+                hi = min(hi, cursor_key[0] + timedelta(microseconds=1))
+        found = []
+        for occurrence_start in expand(event.start_time, parse_rule(event.recurrence), lo, hi):
+            if cursor_key is not None and not _beyond((occurrence_start, event.id), cursor_key, forward, inclusive):
+                continue
+            found.append(Occurrence(event, occurrence_start,
+                                    occurrence_start + duration if duration else None))
+            if forward and limit and len(found) >= limit:
+                break
+        items.extend(found if forward or not limit else found[-limit:])
+
+    items.sort(key=lambda o: (o.start, o.event.id), reverse=not forward)
+    return items[:limit] if limit else items
+
+
+def upcoming(now, days, **kwargs):
+    return occurrences(now, now + timedelta(days=days), **kwargs)
+
+
+def month_grid(year, month):
+    """Недели месяца (списки из 7 дат, с понедельника) для сетки календаря."""
+    return _month_calendar.monthdatescalendar(year, month)
+
+
+def window(days):
+    """Границы окна [начало первого дня, начало дня после последнего)."""
+    start = datetime.combine(days[0], datetime.min.time())
+    return start, datetime.combine(days[-1] + timedelta(days=1), datetime.min.time())
+
+
+def by_day(items, first, last):
+    """Вхождения по дням [first, last]; многодневное событие — в каждом своём дне."""
+    grouped = {}
+    for item in items:
+        end = item.end if item.end and item.end > item.start else item.start
+        last_day = end.date()
+        # Окончание ровно в полночь не занимает следующий день
+        if end > item.start and end.time() == datetime.min.time():
+            last_day -= timedelta(days=1)
+        day = max(item.start.date(), first)
+        while day <= min(last_day, last):
+            grouped.setdefault(day, []).append(item)
+            day += timedelta(days=1)
+    return grouped
+
+
+def week_days(year, week):
+    monday = date.fromisocalendar(year, week, 1)
+    return [monday + timedelta(days=i) for i in range(7)]
+
+
+# --- iCal (RFC 5545) ---------------------------------------------------------
+
+_FEED_COLUMNS = (Event.id, Event.title, Event.description, Event.start_time, Event.end_time,
+                 Event.location, Event.recurrence, Event.updated_at)
+
+
+def _escape(text):
+    return (text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+
+def _fold(line):
+    """Строки длиннее 75 октетов переносятся с пробелом в начале продолжения."""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line + "\r\n"
+    chunks, current, size, limit = [], [], 0, 75
+    for char in line:
+        width = len(char.encode("utf-8"))
+        if size + width > limit:
+            chunks.append("".join(current))
+            current, size, limit = [], 0, 74
+        current.append(char)
+        size += width
+    chunks.append("".join(current))
+    return "\r\n ".join(chunks) + "\r\n"
+
+
+def _local(dt):
+    return dt.strftime("%Y%m%dT%H%M%S")
+
+
+def _vevent(row, domain, now):
+    stamp = row.updated_at or now
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:event-{row.id}@{domain}",
+        f"DTSTAMP:{stamp.strftime('%Y%m%dT%H%M%SZ')}",
+        f"DTSTART:{_local(row.start_time)}",
+    ]
+    if row.end_time:
+        lines.append(f"DTEND:{_local(row.end_time)}")
+    if row.recurrence:
+        lines.append(f"RRULE:{row.recurrence}")
+    lines.append(f"SUMMARY:{_escape(row.title)}")
+    if row.location:
+        lines.append(f"LOCATION:{_escape(row.location)}")
+    if row.description:
+        lines.append(f"DESCRIPTION:{_escape(row.description)}")
+    lines.append("END:VEVENT")
+    return "".join(_fold(line) for line in lines)
+
+
+def ical_feed(since, domain, name, batch_size=500):
+    """Генератор текста .ics: события, идущие после since, и все серии."""
+    now = datetime.utcnow()
+    yield "".join(_fold(line) for line in (
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:-//{domain}//{name}//RU",
+        "CALSCALE:GREGORIAN",
+        f"X-WR-CALNAME:{_escape(name)}",
+    ))
+    single = (select(*_FEED_COLUMNS)
+              .where(Event.is_public, Event.recurrence.is_(None),
+                     or_(Event.start_time >= since, Event.end_time >= since))
+              .order_by(Event.start_time, Event.id))
+    series = select(*_FEED_COLUMNS).where(Event.is_public, Event.recurrence.isnot(None))
+    for statement in (single, series):
+        # yield_per включает серверный курсор (stream_results) там, где он есть
+        result = db.session.execute(statement, execution_options={"yield_per": batch_size})
+        for rows in result.partitions():
+            yield "".join(_vevent(row, domain, now) for row in rows)
+    yield "END:VCALENDAR\r\n"
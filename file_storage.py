@@ -0,0 +1,232 @@
+"""Хранилище файлов документов с адресацией по содержимому.
+
+Файл сохраняется под именем, равным SHA-256 его содержимого
+(``ab/cd/abcd…``), поэтому одинаковые файлы, загруженные к разным документам,
+лежат на диске один раз, а URL скачивания никогда не меняет смысл — ответ
+можно кэшировать навсегда (``immutable``). Запись идёт через временный файл
+и ``os.replace``, так что недописанный файл не виден под итоговым именем.
+
+Тип содержимого определяется по расширению из ``DOCUMENT_EXTENSIONS``, а не по
+заголовку браузера при загрузке. Открываются в браузере только PDF и
+растровые изображения, остальное отдаётся как вложение с ``nosniff``.
+
+Скачивание отдаётся потоком с поддержкой Range и условных запросов; при
+``DOCUMENT_SENDFILE`` саму передачу берёт на себя веб-сервер (X-Sendfile у
+Apache/lighttpd, X-Accel-Redirect у nginx).
+"""
+import hashlib
+import mimetypes
+import os
+import re
+import shutil
+import tempfile
+import time
+
+import click
+from flask import abort, current_app, request
+from flask.cli import AppGroup
+from sqlalchemy import func, select
+from werkzeug.utils import send_file
+
+from extensions import db
+from models import Document
+
+CHUNK_SIZE = 1024 * 1024
+HASH_RE = re.compile(r"[0-9a-f]{64}")
+# Год: содержимое по этому адресу не меняется никогда
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# Что можно показывать в браузере (inline); SVG сюда не входит — в нём бывают скрипты
+INLINE_MIMETYPES = {"application/pdf", "image/png", "image/jpeg", "image/gif", "image/webp"}
+
+storage_cli = AppGroup("storage", help="Хранилище файлов документов.")
+
+
+def storage_root():
+    return current_app.config["DOCUMENT_STORAGE_DIR"] or os.path.join(current_app.instance_path, "documents")
+
+
+def _relative_path(file_hash):
+    return os.path.join(file_hash[:2], file_hash[2:4], file_hash)
+
+
+def blob_path(file_hash):
+    return os.path.join(storage_root(), _relative_path(file_hash))
+
+
+def _extension(filename):
+    return filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+
+
+def allowed_file(filename):
+    return _extension(filename) in current_app.config["DOCUMENT_EXTENSIONS"]
+
+
+def guess_mimetype(filename):
+    """Тип по расширению; для расширений вне DOCUMENT_EXTENSIONS — application/octet-stream."""
+    if not filename or not allowed_file(filename):
+        return "application/octet-stream"
+    return mimetypes.guess_type("file." + _extension(filename))[0] or "application/octet-stream"
+
+
+def clean_filename(filename):
+    """Имя файла для Content-Disposition: без пути и управляющих символов, кириллица сохраняется."""
+    name = re.split(r"[\\/]", filename)[-1]
+    name = "".join(char for char in name if char.isprintable()).strip(" .")
+    if len(name) > 255:
+        stem, dot, extension = name.rpartition(".")
+        name = stem[:250 - len(extension)] + dot + extension if dot else name[:255]
+    return name or "document"
+
+
+def save(stream):
+    """Сохраняет поток в хранилище; возвращает (sha256, размер)."""
+    root = storage_root()
+    tmp_dir = os.path.join(root, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    with tempfile.NamedTemporaryFile(dir=tmp_dir, delete=False) as tmp:
+        try:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                tmp.write(chunk)
+                size += len(chunk)
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        except BaseException:
+            os.unlink(tmp.name)
+            raise
+
+    file_hash = digest.hexdigest()
+    path = blob_path(file_hash)
+    if os.path.exists(path):
+        os.unlink(tmp.name)
+        # Свежий mtime защищает файл от prune, пока документ не сохранён
+        os.utime(path)
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.chmod(tmp.name, 0o644)
+        os.replace(tmp.name, path)
+    return file_hash, size
+
+
+def send(document, public=True):
+    """Ответ со содержимым файла документа (Range, 304, offload на веб-сервер)."""
+    path = blob_path(document.file_hash)
+    if not os.path.isfile(path):
+        abort(404)
+    mode = current_app.config["DOCUMENT_SENDFILE"]
+    # Сохранённый file_mime мог прийти от браузера, поэтому тип считается заново
+    mimetype = guess_mimetype(document.file_name)
+    response = send_file(
+        path,
+        request.environ,
+        mimetype=mimetype,
+        as_attachment=mimetype not in INLINE_MIMETYPES,
+        download_name=document.file_name,
+        conditional=True,
+        etag=document.file_hash,
+        max_age=IMMUTABLE_MAX_AGE,
+        use_x_sendfile=bool(mode),
+        response_class=current_app.response_class,
+    )
+    if mode == "x-accel" and "X-Sendfile" in response.headers:
+        del response.headers["X-Sendfile"]
+        prefix = current_app.config["DOCUMENT_ACCEL_PREFIX"].rstrip("/")
+        response.headers["X-Accel-Redirect"] = f"{prefix}/{_relative_path(document.file_hash)}"
+    response.cache_control.immutable = True
+    response.headers["X-Content-Type-Options"] = "nosniff"
+    if not public:
+        response.cache_control.public = False
+        response.cache_control.private = True
+    return response
+
+
+def _blobs(root):
+    """(hash, размер, mtime) всех файлов хранилища, кроме временных."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        if dirpath == root and "tmp" in dirnames:
+            dirnames.remove("tmp")
+        for name in filenames:
+            if HASH_RE.fullmatch(name):
+                stat = os.stat(os.path.join(dirpath, name))
+                yield name, stat.st_size, stat.st_mtime
+
+
+def _referenced():
+    return set(db.session.execute(
+        select(Document.file_hash).where(Document.file_hash.isnot(None)).distinct()).scalars())
+
+
+@storage_cli.command("usage")
+def usage_command():
+    """Сколько места занимают файлы документов и сколько сэкономлено на дубликатах."""
+    root = storage_root()
+    referenced = _referenced()
+    blobs = orphans = 0
+    physical = orphan_bytes = 0
+    for file_hash, size, _ in _blobs(root):
+        blobs += 1
+        physical += size
+        if file_hash not in referenced:
+            orphans += 1
+            orphan_bytes += size
+    documents, logical = db.session.execute(
+        select(func.count(Document.id), func.coalesce(func.sum(Document.file_size), 0))
+        .where(Document.file_hash.isnot(None))).one()
+    click.echo(f"Каталог: {root}")
+    click.echo(f"Документов с файлами: {documents}, суммарно {_human(logical)}")
+    click.echo(f"На диске: {blobs} файлов, {_human(physical)} "
+               f"(экономия на дубликатах: {_human(max(logical - (physical - orphan_bytes), 0))})")
+    click.echo(f"Без ссылок из документов: {orphans} файлов, {_human(orphan_bytes)}")
+    if os.path.isdir(root):
+        disk = shutil.disk_usage(root)
+        click.echo(f"Свободно на разделе: {_human(disk.free)} из {_human(disk.total)}")
+
+
+@storage_cli.command("prune")
+@click.option("--min-age", default=24, show_default=True,
+              help="Не трогать файлы моложе стольких часов (загрузки, ещё не сохранённые в БД).")
+@click.option("--dry-run", is_flag=True, help="Только показать, что будет удалено.")
+def prune_command(min_age, dry_run):
+    """Удалить файлы, на которые не ссылается ни один документ."""
+    root = storage_root()
+    referenced = _referenced()
+    cutoff = time.time() - min_age * 3600
+    removed = freed = 0
+    for file_hash, size, mtime in list(_blobs(root)):
+        if file_hash in referenced or mtime > cutoff:
+            continue
+        if not dry_run:
+            path = os.path.join(root, _relative_path(file_hash))
+            os.unlink(path)
+            try:
+                os.removedirs(os.path.dirname(path))
+            except OSError:
+                pass  # в каталоге остались другие файлы
+        removed += 1
+        freed += size
+    # Остатки прерванных загрузок
+    tmp_dir = os.path.join(root, "tmp")
+    for name in os.listdir(tmp_dir) if os.path.isdir(tmp_dir) else ():
+        path = os.path.join(tmp_dir, name)
+        if os.path.getmtime(path) < cutoff:
+            freed += os.path.getsize(path)
+            if not dry_run:
+                os.unlink(path)
+    verb = "Будет удалено" if dry_run else "Удалено"
+    click.echo(f"{verb}: {removed} файлов, {_human(freed)}")
+
+
+def _human(size):
+    for unit in ("Б", "КиБ", "МиБ", "ГиБ"):
+        if size < 1024 or unit == "ГиБ":
+            return f"{size:.0f} {unit}" if unit == "Б" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def init_storage(app):
+    app.cli.add_command(storage_cli)
@@ -0,0 +1,377 @@
+"""Статический экспорт публичных страниц: ``flask freeze``.
+
+Страницы рендерятся самим приложением (тестовым клиентом, как для анонимного
+посетителя) и пишутся в ``FREEZE_DIR`` так, чтобы nginx отдавал их без
+Python: ``/news/5`` → ``news/5/index.html``, ``/news/?after=…`` →
+``news/index-after=….html``, ``/events/calendar.ics`` — как есть.
+
+Публичная страница — это вьюха с ``@cached``: её теги кэша ответов
+(``news``, ``news:{news_id}``) — это и зависимости экспортированного файла.
+Обход начинается с разделов без параметров и окна календаря и идёт по ссылкам
+на страницы списков (курсоры ``?after=``/``?before=``) и отдельных записей.
+
+Первая сборка рендерит страницы параллельно в нескольких процессах. Дальше
+сборка инкрементальная: после коммита, затронувшего News/Document/Event/
+Deputy/FAQ, задача ``freeze.pages`` перерисовывает только страницы с
+совпадающими тегами, дописывает новые (новая запись, сдвинувшиеся курсоры) и
+удаляет исчезнувшие. Каждый файл записывается атомарно.
+"""
+import html
+import json
+import logging
+import multiprocessing
+import os
+import posixpath
+import re
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import date, timedelta
+from urllib.parse import urlsplit
+
+import click
+from flask import current_app, has_app_context, url_for
+from flask.cli import with_appcontext
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from werkzeug.exceptions import HTTPException
+
+import tasks
+from assets import write_atomic
+from db_engine import FRESH_READ
+from extensions import db
+from response_cache import CACHED_MODELS
+from startup import public_app
+
+log = logging.getLogger(__name__)
+
+MANIFEST_NAME = ".freeze.json"
+# Публичные страницы без @cached: endpoint -> (шаблоны тегов, period)
+EXTRA_PAGES = {"events.feed": (("event",), 86400)}
+_HREF_RE = re.compile(r'href="([^"#]+)')
+_CURSOR_QUERY_RE = re.compile(r"(after|before)=[A-Za-z0-9_-]+")
+
+# Приложение для процессов пула: наследуется при fork()
+_app = None
+
+
+def freeze_dir(app=None):
+    app = app or current_app
+    return app.config["FREEZE_DIR"] or os.path.join(app.instance_path, "frozen")
+
+
+def output_path(url):
+    """Путь файла относительно FREEZE_DIR для URL страницы."""
+    parts = urlsplit(url)
+    path = parts.path.lstrip("/")
+    if path and not path.endswith("/") and posixpath.splitext(path)[1]:
+        return path
+    suffix = f"-{parts.query}" if parts.query else ""
+    return posixpath.join(path, f"index{suffix}.html")
+
+
+def _spec(app, endpoint):
+    """(шаблоны тегов, period) публичной страницы или None."""
+    if endpoint in EXTRA_PAGES:
+        return EXTRA_PAGES[endpoint]
+    view = app.view_functions.get(endpoint)
+    tags = getattr(view, "cache_tags", None)
+    if tags is None:
+        return None
+    return tags, view.cache_period
+
+
+def _match(app, url):
+    """(endpoint, view_args) экспортируемой страницы или None."""
+    parts = urlsplit(url)
+    if parts.scheme or parts.netloc or (parts.query and not _CURSOR_QUERY_RE.fullmatch(parts.query)):
+        return None
+    try:
+        endpoint, args = app.url_map.bind("localhost").match(parts.path, "GET")
+    except HTTPException:
+        return None
+    return (endpoint, args) if _spec(app, endpoint) else None
+
+
+def _followable(app, url):
+    """Как _match, но для ссылок со страниц.
+
+    Из страниц с параметрами в пути берутся только страницы записей (теги
+    вида news:{news_id}): навигация календаря бесконечна, его окно задаётся
+    явно (_seeds).
+    """
+    match = _match(app, url)
+    if match is None:
+        return None
+    endpoint, args = match
+    if args and not any("{" in template for template in _spec(app, endpoint)[0]):
+        return None
+    return match
+
+
+def render(app, url):
+    """Рендерит страницу для анонимного посетителя; возвращает (статус, тело или None, ссылки)."""
+    client = app.test_client(use_cookies=False)
+    # Свой контекст приложения — своя сессия БД: задача может выполняться
+    # прямо из after_commit запроса (TASKS_EAGER), чья сессия уже закрыта
+    with app.app_context():
+        response = client.get(url, base_url=app.config["FREEZE_BASE_URL"], environ_base={FRESH_READ: True})
+    try:
+        # Страница с cookie персональна и в экспорт не годится
+        if response.status_code != 200 or "Set-Cookie" in response.headers:
+            return response.status_code, None, []
+        body = response.get_data()
+    finally:
+        response.close()
+    links = []
+    if response.mimetype == "text/html":
+        links = [html.unescape(href) for href in _HREF_RE.findall(body.decode("utf-8"))]
+    return response.status_code, body, links
+
+
+def _write_if_changed(path, body):
+    try:
+        with open(path, "rb") as f:
+            if f.read() == body:
+                return False
+    except FileNotFoundError:
+        pass
+    write_atomic(path, body)
+    return True
+
+
+def _freeze_page(app, root, url, endpoint, args, timed):
+    """Рендерит и записывает страницу; возвращает (url, запись манифеста или None, ссылки, изменена ли)."""
+    status, body, links = render(app, url)
+    if body is None:
+        log.info("freeze: %s -> %s, not exported", url, status)
+        return url, None, [], False
+    templates, period = _spec(app, endpoint)
+    record = {
+        "file": output_path(url),
+        "tags": sorted({template.format(**args) for template in templates}),
+        "timed": bool(period) or timed,
+    }
+    changed = _write_if_changed(os.path.join(root, record["file"]), body)
+    return url, record, links, changed
+
+
+def _init_process():
+    with _app.app_context():
+        # Пул соединений родителя после fork() использовать нельзя
+        db.engine.dispose(close=False)
+
+
+def _freeze_in_process(root, url, endpoint, args, timed):
+    return _freeze_page(_app, root, url, endpoint, args, timed)
+
+
+def _crawl(app, root, start, skip=(), processes=1):
+    """Рендерит страницы start и всё, на что они ссылаются, кроме skip.
+
+    start — {url: timed}. Возвращает ({url: запись или None}, ссылки на
+    экспортируемые страницы, число изменённых файлов).
+    """
+    global _app
+    pages, linked = {}, set()
+    seen = set(start) | set(skip)
+    changed = 0
+    queue = []
+    for url, timed in start.items():
+        match = _match(app, url)
+        if match is not None:
+            queue.append((url, *match, timed))
+
+    def collect(result):
+        nonlocal changed
+        url, record, links, page_changed = result
+        pages[url] = record
+        changed += page_changed
+        for link in links:
+            match = _followable(app, link)
+            if match is None:
+                continue
+            linked.add(link)
+            if link not in seen:
+                seen.add(link)
+                queue.append((link, *match, False))
+
+    if processes <= 1:
+        while queue:
+            collect(_freeze_page(app, root, *queue.pop()))
+        return pages, linked, changed
+
+    _app = app
+    context = multiprocessing.get_context("fork")
+    with ProcessPoolExecutor(processes, mp_context=context, initializer=_init_process) as executor:
+        pending = set()
+        while queue or pending:
+            while queue:
+                pending.add(executor.submit(_freeze_in_process, root, *queue.pop()))
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                collect(future.result())
+    return pages, linked, changed
+
+
+def _calendar_urls(today, months):
+    """Сетки месяцев и недель на months месяцев назад и вперёд."""
+    urls = []
+    for offset in range(-months, months + 1):
+        year, month = divmod(today.year * 12 + today.month - 1 + offset, 12)
+        urls.append(url_for("events.month", year=year, month=month + 1))
+    day, last = today - timedelta(days=31 * months), today + timedelta(days=31 * months)
+    while day <= last:
+        year, week, _ = day.isocalendar()
+        urls.append(url_for("events.week", year=year, week=week))
+        day += timedelta(days=7)
+    return urls
+
+
+def _seeds(app):
+    """Начальные страницы обхода: {url: timed}."""
+    with app.test_request_context(base_url=app.config["FREEZE_BASE_URL"]):
+        seeds = {
+            url_for(rule.endpoint): False
+            for rule in app.url_map.iter_rules()
+            if "GET" in rule.methods and not rule.arguments and _spec(app, rule.endpoint)
+        }
+        # Сетка календаря выделяет сегодняшний день, а окно сдвигается со временем
+        seeds.update(dict.fromkeys(_calendar_urls(date.today(), app.config["FREEZE_CALENDAR_MONTHS"]), True))
+    return seeds
+
+
+def _load_manifest(root):
+    try:
+        with open(os.path.join(root, MANIFEST_NAME), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _save_manifest(root, manifest):
+    data = json.dumps(manifest, ensure_ascii=False, indent=1, sort_keys=True).encode("utf-8")
+    write_atomic(os.path.join(root, MANIFEST_NAME), data)
+
+
+def _remove(root, manifest, url):
+    record = manifest.pop(url)
+    try:
+        os.unlink(os.path.join(root, record["file"]))
+    except FileNotFoundError:
+        pass
+
+
+def build(app, processes=1):
+    """Полная сборка; возвращает (страниц, изменено файлов, удалено)."""
+    root = freeze_dir(app)
+    previous = _load_manifest(root) or {}
+    pages, _, changed = _crawl(app, root, _seeds(app), processes=processes)
+    manifest = {url: record for url, record in pages.items() if record is not None}
+    removed = 0
+    for url in set(previous) - set(manifest):
+        _remove(root, previous, url)
+        removed += 1
+    _save_manifest(root, manifest)
+    return len(manifest), changed, removed
+
+
+def refresh(app, affected, seeds=None):
+    """Перерисовывает страницы affected и то, что от них появилось; возвращает (изменено, удалено).
+
+    Страницы списков по курсору рендерятся, только если на них есть ссылка
+    из обновлённых страниц: после вставки границы страниц сдвигаются, и
+    старые курсоры просто исчезают из экспорта.
+    """
+    root = freeze_dir(app)
+    manifest = _load_manifest(root)
+    if manifest is None:
+        return 0, 0
+    affected = set(affected) & set(manifest)
+    start = {url: manifest[url]["timed"] for url in affected if "?" not in url}
+    for url, timed in (seeds or {}).items():
+        if url not in manifest:
+            start[url] = timed
+    pages, linked, changed = _crawl(app, root, start, skip=set(manifest) - affected)
+
+    removed = 0
+    for url, record in pages.items():
+        if record is not None:
+            manifest[url] = record
+        elif url in manifest:
+            _remove(root, manifest, url)
+            removed += 1
+    for url in affected:
+        stale_cursor = "?" in url and url not in linked
+        # Окно календаря сдвинулось: старые месяцы снова отдаёт приложение
+        outside_window = seeds is not None and manifest.get(url, {}).get("timed") and "?" not in url \
+            and url not in seeds
+        if url in manifest and (stale_cursor or outside_window):
+            _remove(root, manifest, url)
+            removed += 1
+    _save_manifest(root, manifest)
+    return changed, removed
+
+
+def regenerate(app, tags):
+    """Инкрементальная сборка: страницы, зависящие от изменившихся тегов."""
+    manifest = _load_manifest(freeze_dir(app)) or {}
+    tags = set(tags)
+    return refresh(app, [url for url, record in manifest.items() if tags.intersection(record["tags"])])
+
+
+# --- Инкрементальная сборка после коммита ------------------------------------
+
+def _enabled():
+    # Инкрементальная сборка включается первой полной сборкой (flask freeze)
+    return os.path.exists(os.path.join(freeze_dir(), MANIFEST_NAME))
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session, flush_context):
+    tags = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, CACHED_MODELS):
+            tags.add(obj.__tablename__)
+            tags.add(f"{obj.__tablename__}:{obj.id}")
+    if tags and has_app_context() and _enabled():
+        tasks.on_commit(session, "freeze.pages", {"tags": sorted(tags)})
+
+
+def schedule(tags):
+    """Ставит пересборку страниц с тегами tags (для изменений в обход ORM-сессии)."""
+    if tags and _enabled():
+        tasks.enqueue("freeze.pages", {"tags": sorted(tags)})
+
+
+@tasks.task("freeze.pages", concurrency=1)
+def _freeze_job(connection, payload):
+    # При TASKS_EAGER задача может выполняться в приложении админки, где нет публичных страниц
+    changed, removed = regenerate(public_app(current_app._get_current_object()), payload["tags"])
+    log.info("freeze: %d pages written, %d removed", changed, removed)
+
+
+# --- CLI -----------------------------------------------------------------------
+
+@click.command("freeze")
+@with_appcontext
+@click.option("--processes", "-p", default=os.cpu_count() or 1, show_default=True,
+              help="Процессов для рендеринга при полной сборке.")
+@click.option("--timed", is_flag=True,
+              help="Обновить только страницы, зависящие от текущего времени (главная, календарь).")
+def freeze_command(processes, timed):
+    """Экспортировать публичные страницы в статические файлы."""
+    app = current_app._get_current_object()
+    root = freeze_dir(app)
+    if timed:
+        manifest = _load_manifest(root)
+        if manifest is None:
+            raise click.UsageError("Сначала выполните полную сборку: flask freeze")
+        changed, removed = refresh(app, [url for url, record in manifest.items() if record["timed"]],
+                                   seeds=_seeds(app))
+        click.echo(f"Изменено файлов: {changed}, удалено: {removed}")
+        return
+    pages, changed, removed = build(app, processes=processes)
+    click.echo(f"{root}: страниц {pages}, изменено файлов {changed}, удалено {removed}")
+
+
+def init_freeze(app):
+    app.cli.add_command(freeze_command)
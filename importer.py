@@ -0,0 +1,250 @@
+"""Массовый импорт архива: ``flask import news|documents|events|deputies FILE``.
+
+Файл (CSV с заголовком или JSONL) читается потоково и обрабатывается
+пачками по ``--chunk-size`` строк. Каждая пачка — одна транзакция: по
+естественному ключу (например, title + published_at) определяется, какие
+строки уже есть, остальные вставляются, существующие обновляются
+(executemany на уровне Core, без ORM-объектов). Строки без ключа пропускаются,
+значения по умолчанию (``is_published`` и т. п.) подставляются только при
+вставке. Производные данные — excerpt, полнотекстовый индекс, версии таблиц,
+кэш страниц — обновляются на всю пачку сразу. Память не зависит от размера
+файла.
+"""
+import csv
+import json
+import os
+import time
+from collections import namedtuple
+from datetime import datetime
+from itertools import islice
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import bindparam, select, tuple_
+
+import conditional
+import freeze
+import response_cache
+import search_index
+from extensions import db
+from models import News, Document, Event, Deputy, make_excerpt
+
+ImportSpec = namedtuple("ImportSpec", "model key fields defaults")
+
+SPECS = {
+    "news": ImportSpec(
+        News, ("title", "published_at"),
+        ("title", "body", "published_at", "is_published"),
+        {"is_published": True},
+    ),
+    "documents": ImportSpec(
+        Document, ("title", "published_at"),
+        ("title", "summary", "doc_type", "file_url", "published_at", "is_published"),
+        {"is_published": True},
+    ),
+    "events": ImportSpec(
+        Event, ("title", "start_time"),
+        ("title", "description", "start_time", "end_time", "location", "is_public"),
+        {"is_public": True},
+    ),
+    "deputies": ImportSpec(
+        Deputy, ("full_name",),
+        ("full_name", "faction", "district", "email", "phone", "bio", "photo_url"),
+        {},
+    ),
+}
+
+_DATETIME_FORMATS = ("%d.%m.%Y %H:%M:%S", "%d.%m.%Y %H:%M", "%d.%m.%Y")
+_TRUE = {"1", "true", "yes", "y", "да", "t"}
+_FALSE = {"0", "false", "no", "n", "нет", "f"}
+
+import_cli = AppGroup("import", help="Массовый импорт новостей, документов, событий и депутатов.")
+
+
+class RowError(ValueError):
+    pass
+
+
+def _read_rows(path, fmt):
+    """Генератор словарей из CSV или JSONL; файл не загружается в память целиком."""
+    if fmt == "csv":
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            yield from csv.DictReader(f)
+    else:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+
+def _coerce(column, value):
+    if isinstance(value, str):
+        value = value.strip()
+        if value == "":
+            value = None
+    if value is None:
+        return None
+    python_type = column.type.python_type
+    if python_type is datetime and not isinstance(value, datetime):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            for fmt in _DATETIME_FORMATS:
+                try:
+                    return datetime.strptime(value, fmt)
+                except ValueError:
+                    continue
+        raise RowError(f"{column.name}: не удалось разобрать дату {value!r}")
+    if python_type is bool and not isinstance(value, bool):
+        lowered = str(value).lower()
+        if lowered in _TRUE:
+            return True
+        if lowered in _FALSE:
+            return False
+        raise RowError(f"{column.name}: ожидалось логическое значение, получено {value!r}")
+    return value
+
+
+def _prepare(spec, raw, now):
+    table = spec.model.__table__
+    row = {}
+    for name in spec.fields:
+        column = table.c[name]
+        value = _coerce(column, raw.get(name))
+        # Без ключа строку не сопоставить с уже импортированной: повторный
+        # импорт того же файла создавал бы дубликаты
+        if value is None and name in spec.key:
+            raise RowError(f"{name}: не заполнено поле ключа ({' + '.join(spec.key)})")
+        if value is None and not column.nullable and name not in spec.defaults:
+            raise RowError(f"{name}: обязательное поле не заполнено")
+        row[name] = value
+    source = search_index.BY_MODEL.get(spec.model)
+    if "excerpt" in table.c and source is not None:
+        row["excerpt"] = make_excerpt(row[source.body])
+    row["updated_at"] = now
+    return row
+
+
+def _import_chunk(connection, spec, rows):
+    """Вставляет/обновляет пачку; возвращает (ids вставленных, ids обновлённых)."""
+    table = spec.model.__table__
+    key_columns = [table.c[name] for name in spec.key]
+    default_columns = [table.c[name] for name in spec.defaults]
+
+    # В пределах пачки дубликаты по ключу схлопываются: побеждает последняя строка
+    by_key = {tuple(r[name] for name in spec.key): r for r in rows}
+    keys = list(by_key)
+    if len(key_columns) == 1:
+        condition = key_columns[0].in_([k[0] for k in keys])
+    else:
+        condition = tuple_(*key_columns).in_(keys)
+    n = len(key_columns)
+    existing = {
+        tuple(r[1:n + 1]): (r[0], dict(zip(spec.defaults, r[n + 1:])))
+        for r in connection.execute(select(table.c.id, *key_columns, *default_columns).where(condition))
+    }
+
+    # Значения по умолчанию — только для новых строк: у существующих пустое поле
+    # сохраняет текущее значение (скрытая редактором запись не публикуется заново)
+    inserts, updates = [], []
+    for k, r in by_key.items():
+        row_id, fill = existing.get(k, (None, spec.defaults))
+        for name, value in fill.items():
+            if r[name] is None:
+                r[name] = value
+        if row_id is None:
+            inserts.append(r)
+        else:
+            updates.append(dict(r, _id=row_id))
+
+    inserted_ids = []
+    if inserts:
+        result = connection.execute(
+            table.insert().returning(table.c.id, sort_by_parameter_order=True), inserts)
+        inserted_ids = [row[0] for row in result]
+        for row, row_id in zip(inserts, inserted_ids):
+            row["id"] = row_id
+    if updates:
+        connection.execute(table.update().where(table.c.id == bindparam("_id")), updates)
+        for row in updates:
+            row["id"] = row.pop("_id")
+
+    _update_search_index(connection, spec, inserts + updates)
+    conditional.bump(connection, {table.name})
+    return inserted_ids, [row["id"] for row in updates]
+
+
+def _update_search_index(connection, spec, rows):
+    source = search_index.BY_MODEL.get(spec.model)
+    if source is None:
+        return
+    visible, hidden = [], []
+    for row in rows:
+        if source.flag is None or row[source.flag]:
+            visible.append((row["id"], row[source.title], row[source.body]))
+        else:
+            hidden.append(row["id"])
+    search_index.remove_rows(connection, source, hidden)
+    search_index.index_rows(connection, source, visible)
+
+
+def _run_import(kind, path, fmt, chunk_size):
+    spec = SPECS[kind]
+    fmt = fmt or ("csv" if path.lower().endswith(".csv") else "jsonl")
+    table_name = spec.model.__tablename__
+
+    started = time.perf_counter()
+    total = inserted = updated = skipped = 0
+    rows_iter = enumerate(_read_rows(path, fmt), start=1)
+    while True:
+        batch = list(islice(rows_iter, chunk_size))
+        if not batch:
+            break
+        now = datetime.utcnow()
+        prepared = []
+        for line_no, raw in batch:
+            try:
+                prepared.append(_prepare(spec, raw, now))
+            except RowError as exc:
+                skipped += 1
+                click.echo(f"  строка {line_no}: {exc} — пропущена", err=True)
+        if prepared:
+            with db.engine.begin() as connection:
+                new_ids, changed_ids = _import_chunk(connection, spec, prepared)
+            inserted += len(new_ids)
+            updated += len(changed_ids)
+            row_tags = [f"{table_name}:{i}" for i in changed_ids]
+            response_cache.invalidate([table_name] + row_tags)
+            # Страницы обновлённых записей — по пачке, чтобы не копить id всего файла
+            freeze.schedule(row_tags)
+        total += len(batch)
+        elapsed = time.perf_counter() - started
+        click.echo(f"{kind}: {total} строк (новых {inserted}, обновлено {updated}, пропущено {skipped}), "
+                   f"{total / elapsed:.0f} строк/с")
+    # Списки (и через их ссылки — страницы новых записей) пересобираются один раз
+    # на весь импорт, а не на каждую пачку
+    if inserted or updated:
+        freeze.schedule({table_name})
+    return total, inserted, updated, skipped
+
+
+def _make_command(kind):
+    @import_cli.command(kind, help=f"Импорт из CSV/JSONL (upsert по {' + '.join(SPECS[kind].key)}).")
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--format", "fmt", type=click.Choice(["csv", "jsonl"]),
+                  help="Формат файла; по умолчанию определяется по расширению.")
+    @click.option("--chunk-size", default=1000, show_default=True, help="Строк в одной транзакции.")
+    def command(path, fmt, chunk_size):
+        total, inserted, updated, skipped = _run_import(kind, path, fmt, chunk_size)
+        click.echo(f"Готово: {os.path.basename(path)} — {total} строк, новых {inserted}, "
+                   f"обновлено {updated}, пропущено {skipped}.")
+    return command
+
+
+for _kind in SPECS:
+    _make_command(_kind)
+
+
+def init_import(app):
+    app.cli.add_command(import_cli)
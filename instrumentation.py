@@ -0,0 +1,275 @@
+"""Метрики и диагностика: время запросов и шаблонов, SQL, /metrics, /healthz/db, профилирование.
+
+Метрики хранятся в памяти процесса (у каждого воркера gunicorn — свои) и
+отдаются в текстовом формате Prometheus. SQL-запросы считаются через события
+Engine, медленные пишутся в лог ``sql.slow``. Администратор может прислать
+заголовок ``X-Profile: 1`` — тогда запрос выполняется под cProfile, а дамп
+сохраняется в PROFILE_DIR.
+"""
+import cProfile
+import hmac
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from flask import (abort, before_render_template, current_app, g, has_app_context,
+                   jsonify, request, template_rendered)
+from flask_login import current_user
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+
+from extensions import db
+from user_cache import is_admin_verified
+
+log = logging.getLogger(__name__)
+slow_log = logging.getLogger("sql.slow")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(n, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+        for n, v in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted(self._series.items())
+        for labels, (counts, total, count) in items:
+            for bound, value in zip(self.buckets, counts):
+                lbl = _format_labels(self.labelnames + ("le",), labels + (repr(float(bound)),))
+                lines.append(f"{self.name}_bucket{lbl} {value}")
+            lbl = _format_labels(self.labelnames + ("le",), labels + ("+Inf",))
+            lines.append(f"{self.name}_bucket{lbl} {count}")
+            lbl = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{lbl} {total}")
+            lines.append(f"{self.name}_count{lbl} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Время обработки запроса.", ("endpoint", "method", "status"))
+REQUEST_QUERIES = Histogram(
+    "http_request_sql_queries", "Число SQL-запросов на один HTTP-запрос.", ("endpoint",), COUNT_BUCKETS)
+TEMPLATE_DURATION = Histogram(
+    "template_render_duration_seconds", "Время рендеринга шаблона.", ("template",))
+QUERY_DURATION = Histogram(
+    "db_query_duration_seconds", "Время выполнения SQL-запроса.", ("endpoint",))
+SLOW_QUERIES = Counter(
+    "db_slow_queries_total", "SQL-запросы дольше SLOW_QUERY_MS.", ("endpoint",))
+
+METRICS = (REQUEST_DURATION, REQUEST_QUERIES, TEMPLATE_DURATION, QUERY_DURATION, SLOW_QUERIES)
+
+
+def _endpoint():
+    try:
+        return request.endpoint or "unknown"
+    except RuntimeError:
+        return "cli"
+
+
+# --- SQL ---------------------------------------------------------------------
+
+# Время старта хранится в контексте выполнения, а не в conn.info: запрос,
+# упавший с ошибкой, не оставляет записей на соединении из пула
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context.query_start_time = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "query_start_time", None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    if not has_app_context():
+        return
+    endpoint = _endpoint()
+    QUERY_DURATION.observe(elapsed, endpoint)
+    if "sql_count" in g:
+        g.sql_count += 1
+        g.sql_time += elapsed
+    threshold = current_app.config["SLOW_QUERY_MS"]
+    if threshold and elapsed * 1000 >= threshold:
+        SLOW_QUERIES.inc(endpoint)
+        slow_log.warning("%.1f ms [%s] %s", elapsed * 1000, endpoint, " ".join(statement.split())[:1000])
+
+
+# --- Шаблоны -----------------------------------------------------------------
+
+def _before_render(sender, template, context, **extra):
+    g.setdefault("template_starts", []).append(time.perf_counter())
+
+
+def _after_render(sender, template, context, **extra):
+    starts = g.get("template_starts")
+    if starts:
+        TEMPLATE_DURATION.observe(time.perf_counter() - starts.pop(), template.name or "string")
+
+
+# --- Запросы и профилирование ------------------------------------------------
+
+def _profiling_requested():
+    return (
+        current_app.config["PROFILING_ENABLED"]
+        and request.headers.get("X-Profile") == "1"
+        and current_user.is_authenticated
+        # Роль — по БД, а не по снимку в сессии
+        and is_admin_verified()
+    )
+
+
+def _start_request():
+    g.request_start = time.perf_counter()
+    g.sql_count = 0
+    g.sql_time = 0.0
+    if _profiling_requested():
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+
+def _finish_request(response):
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profiler.disable()
+        directory = current_app.config["PROFILE_DIR"] or os.path.join(current_app.instance_path, "profiles")
+        os.makedirs(directory, exist_ok=True)
+        name = "{}-{}-{}.prof".format(
+            datetime.utcnow().strftime("%Y%m%dT%H%M%S%f"), _endpoint(), os.getpid())
+        profiler.dump_stats(os.path.join(directory, name))
+        response.headers["X-Profile-File"] = name
+
+    start = g.get("request_start")
+    if start is None:
+        return response
+    elapsed = time.perf_counter() - start
+    endpoint = _endpoint()
+    REQUEST_DURATION.observe(elapsed, endpoint, request.method, str(response.status_code))
+    REQUEST_QUERIES.observe(g.sql_count, endpoint)
+    response.headers["Server-Timing"] = 'app;dur={:.1f}, db;dur={:.1f};desc="{} queries"'.format(
+        elapsed * 1000, g.sql_time * 1000, g.sql_count)
+    return response
+
+
+def _stop_profiler(exc):
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profiler.disable()
+
+
+# --- Эндпоинты ---------------------------------------------------------------
+
+def _pool_status(engine):
+    pool = engine.pool
+    status = {"class": type(pool).__name__}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        method = getattr(pool, name, None)
+        if callable(method):
+            status[name] = method()
+    return status
+
+
+def instrument(app):
+    """Время, SQL и шаблоны запросов app — в общие метрики процесса (и для админки)."""
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_stop_profiler)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+
+
+def init_instrumentation(app):
+    if not app.config["METRICS_ENABLED"]:
+        return
+
+    instrument(app)
+
+    token = app.config["METRICS_TOKEN"]
+    if app.config["METRICS_REQUIRE_TOKEN"] and not token:
+        log.warning("METRICS_TOKEN не задан: /metrics недоступен")
+
+    @app.route('/metrics')
+    def metrics():
+        if token or app.config["METRICS_REQUIRE_TOKEN"]:
+            expected = f"Bearer {token}" if token else None
+            if expected is None or not hmac.compare_digest(
+                    request.headers.get("Authorization", "").encode(), expected.encode()):
+                abort(403)
+        lines = []
+        for metric in METRICS:
+            lines.extend(metric.render())
+        # Все движки приложения (основная БД и реплики); админка пользуется ими же
+        pools = {bind or "default": _pool_status(engine) for bind, engine in db.engines.items()}
+        for name in ("size", "checkedout", "overflow"):
+            series = [(bind, status[name]) for bind, status in sorted(pools.items()) if name in status]
+            if series:
+                lines.append(f"# TYPE db_pool_{name} gauge")
+                lines.extend(f'db_pool_{name}{{bind="{bind}"}} {value}' for bind, value in series)
+        body = "\n".join(lines) + "\n"
+        return body, 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+    @app.route('/healthz/db')
+    def healthz_db():
+        start = time.perf_counter()
+        try:
+            db.session.execute(text("SELECT 1"))
+        except Exception:  # noqa: BLE001 — любая ошибка БД означает «не готов»
+            # Текст ошибки (адрес и параметры подключения) — только в лог
+            log.exception("healthz: database unavailable")
+            return jsonify(status="error", database="unavailable"), 503
+        latency_ms = (time.perf_counter() - start) * 1000
+        return jsonify(status="ok", database_latency_ms=round(latency_ms, 2),
+                       pool=_pool_status(db.engine)), 200
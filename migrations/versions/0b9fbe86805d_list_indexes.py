@@ -0,0 +1,44 @@
+"""list indexes
+
+Revision ID: 0b9fbe86805d
+Revises: 9b24fbb0d5bf
+Create Date: 2026-10-18 09:50:21.240997
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b9fbe86805d'
+down_revision = '9b24fbb0d5bf'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('deputy', schema=None) as batch_op:
+        batch_op.create_index('ix_deputy_full_name_id', ['full_name', 'id'], unique=False)
+
+    with op.batch_alter_table('document', schema=None) as batch_op:
+        batch_op.create_index('ix_document_is_published_published_at_id', ['is_published', 'published_at', 'id'], unique=False)
+
+    with op.batch_alter_table('faq', schema=None) as batch_op:
+        batch_op.create_index('ix_faq_is_published_id', ['is_published', 'id'], unique=False)
+
+    with op.batch_alter_table('news', schema=None) as batch_op:
+        batch_op.create_index('ix_news_is_published_published_at_id', ['is_published', 'published_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('news', schema=None) as batch_op:
+        batch_op.drop_index('ix_news_is_published_published_at_id')
+
+    with op.batch_alter_table('faq', schema=None) as batch_op:
+        batch_op.drop_index('ix_faq_is_published_id')
+
+    with op.batch_alter_table('document', schema=None) as batch_op:
+        batch_op.drop_index('ix_document_is_published_published_at_id')
+
+    with op.batch_alter_table('deputy', schema=None) as batch_op:
+        batch_op.drop_index('ix_deputy_full_name_id')
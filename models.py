@@ -1,8 +1,24 @@
+import re
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
 from sqlalchemy.orm import validates
-from extensions import db, login_manager
+from extensions import db
+import passwords
+import recurrence as rrule
+
+EXCERPT_LENGTH = 280
+
+def make_excerpt(text, length=EXCERPT_LENGTH):
+    """Короткий фрагмент текста для списков: без лишних пробелов, обрезан по слову."""
+    if not text:
+        return None
+    text = re.sub(r"\s+", " ", text).strip()
+    if len(text) <= length:
+        return text
+    cut = text[:length - 1]
+    if " " in cut:
+        cut = cut.rsplit(" ", 1)[0]
+    return cut.rstrip(" ,.;:—-") + "…"
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -13,12 +29,17 @@ class User(UserMixin, db.Model):
     role = db.Column(db.String(20), default="user")  # 'user' or 'admin'
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Увеличивается при смене роли, активности или пароля (см. user_cache.py)
+    auth_version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
 
     def set_password(self, password: str):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = passwords.hash_password(password)
 
     def check_password(self, password: str) -> bool:
-        return check_password_hash(self.password_hash, password)
+        return passwords.verify_password(self.password_hash, password)
+
+    def password_needs_rehash(self) -> bool:
+        return passwords.needs_rehash(self.password_hash)
 
     @property
     def is_admin(self) -> bool:
@@ -29,27 +50,48 @@ class User(UserMixin, db.Model):
         assert '@' in address, "Некорректный email"
         return address
 
-@login_manager.user_loader
-def load_user(user_id):
-    return User.query.get(int(user_id))
-
 class News(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     body = db.Column(db.Text, nullable=False)
-    published_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    excerpt = db.Column(db.String(300))
+    # Ключ сортировки списков (pagination.py): NULL выпал бы из страниц после первой
+    published_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
     is_published = db.Column(db.Boolean, default=True)
     created_by_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     created_by = db.relationship('User', backref='news')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+    # Списки: опубликованные, от новых к старым (см. flask db-audit)
+    __table_args__ = (db.Index('ix_news_is_published_published_at_id', 'is_published', 'published_at', 'id'),)
+
+    @validates('body')
+    def validate_body(self, key, body):
+        self.excerpt = make_excerpt(body)
+        return body
 
 class Document(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     summary = db.Column(db.Text)
+    excerpt = db.Column(db.String(300))
     doc_type = db.Column(db.String(50), nullable=False)  # постановление/проект/решение
-    file_url = db.Column(db.String(300))  # относительный путь в /static/uploads или внешний URL
-    published_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    file_url = db.Column(db.String(300))  # внешний URL (для загруженных файлов — пусто)
+    # Загруженный файл: SHA-256 содержимого — имя в хранилище (см. file_storage.py)
+    file_hash = db.Column(db.String(64), index=True)
+    file_name = db.Column(db.String(255))
+    file_size = db.Column(db.BigInteger)
+    file_mime = db.Column(db.String(100))
+    published_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
     is_published = db.Column(db.Boolean, default=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+    __table_args__ = (db.Index('ix_document_is_published_published_at_id', 'is_published', 'published_at', 'id'),)
+
+    @validates('summary')
+    def validate_summary(self, key, summary):
+        self.excerpt = make_excerpt(summary)
+        return summary
 
 class Event(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -59,6 +101,21 @@ class Event(db.Model):
     end_time = db.Column(db.DateTime)
     location = db.Column(db.String(200))
     is_public = db.Column(db.Boolean, default=True)
+    # RRULE для повторяющихся заседаний, например FREQ=WEEKLY;BYDAY=TU (см. recurrence.py)
+    recurrence = db.Column(db.String(200))
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+    # Окно календаря: начавшиеся в нём — по start_time, ещё идущие — по end_time
+    __table_args__ = (db.Index('ix_event_public_start', 'is_public', 'start_time'),
+                      db.Index('ix_event_public_end', 'is_public', 'end_time'))
+
+    @validates('recurrence')
+    def validate_recurrence(self, key, value):
+        value = (value or '').strip().upper().removeprefix('RRULE:')
+        if not value:
+            return None
+        rrule.parse_rule(value)
+        return value
 
 class Deputy(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -68,10 +125,48 @@ class Deputy(db.Model):
     email = db.Column(db.String(120))
     phone = db.Column(db.String(50))
     bio = db.Column(db.Text)
+    excerpt = db.Column(db.String(300))
     photo_url = db.Column(db.String(300))
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+    __table_args__ = (db.Index('ix_deputy_full_name_id', 'full_name', 'id'),)
+
+    @validates('bio')
+    def validate_bio(self, key, bio):
+        self.excerpt = make_excerpt(bio)
+        return bio
 
 class FAQ(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     question = db.Column(db.String(300), nullable=False)
     answer = db.Column(db.Text, nullable=False)
     is_published = db.Column(db.Boolean, default=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+    __table_args__ = (db.Index('ix_faq_is_published_id', 'is_published', 'id'),)
+
+class TableVersion(db.Model):
+    """Счётчик изменений контентной таблицы — основа для ETag/Last-Modified."""
+    table_name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class Job(db.Model):
+    """Задача фоновой очереди (см. tasks.py)."""
+    id = db.Column(db.Integer, primary_key=True)
+    type = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default="{}")  # JSON
+    status = db.Column(db.String(10), nullable=False, default="queued")  # queued/running/done/dead
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = db.Column(db.String(100))
+    locked_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_job_status_run_at', 'status', 'run_at'),
+        db.Index('ix_job_type_status', 'type', 'status'),
+    )
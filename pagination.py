@@ -0,0 +1,146 @@
+"""Keyset-пагинация (по курсору) для публичных списков.
+
+Страница выбирается условием по ключу сортировки последней/первой показанной
+записи, а не через OFFSET, поэтому глубокие страницы стоят столько же, сколько
+первая. COUNT(*) не выполняется: наличие следующей страницы определяется по
+лишней (per_page + 1) записи. ``?at=`` открывает страницу, которая начинается
+с записи курсора, — так на запись можно сослаться из другого раздела.
+"""
+import base64
+import json
+from datetime import datetime
+
+from flask import abort, current_app, request, url_for
+from sqlalchemy import and_, or_
+
+# Параметры запроса, которые читает paginate() (ключ кэша ответов — response_cache.cached)
+PAGE_ARGS = ("after", "before", "at", "per_page")
+
+
+def _per_page(per_page=None, maximum=None):
+    default = current_app.config["PAGE_SIZE"]
+    maximum = maximum or current_app.config["PAGE_SIZE_MAX"]
+    value = request.args.get("per_page", type=int) or per_page or default
+    return max(1, min(value, maximum))
+
+
+def encode_cursor(values):
+    """Курсор из значений ключей сортировки, например encode_cursor([faq.id])."""
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(values, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _coerce(column, value):
+    """Значение курсора того же типа, что и колонка; иначе TypeError/ValueError."""
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    # bool в JSON — подкласс int, но для числового ключа не подходит
+    if not isinstance(value, python_type) or (isinstance(value, bool) and python_type is not bool):
+        raise TypeError(value)
+    return value
+
+
+def _decode(cursor, keys):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw.decode("utf-8"))
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError(cursor)
+        return [_coerce(column, value) for (column, _), value in zip(keys, values)]
+    except (ValueError, TypeError, UnicodeDecodeError, NotImplementedError):
+        abort(400, description="Некорректный курсор страницы")
+
+
+def seek(keys, values, forward, inclusive=False):
+    """Условие «строго после курсора» в порядке сортировки (или перед ним, если forward=False)."""
+    clauses = []
+    for i, ((column, desc), value) in enumerate(zip(keys, values)):
+        equal = [c == v for (c, _), v in zip(keys[:i], values[:i])]
+        after = column < value if desc == forward else column > value
+        clauses.append(and_(*equal, after))
+    if inclusive:
+        clauses.append(and_(*[c == v for (c, _), v in zip(keys, values)]))
+    return or_(*clauses)
+
+
+class KeysetPage:
+    def __init__(self, items, per_page, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def _url(self, **cursor):
+        args = {k: v for k, v in request.args.items() if k not in ("after", "before", "at")}
+        args.update(request.view_args or {})
+        args.update(cursor)
+        return url_for(request.endpoint, **args)
+
+    def next_url(self):
+        return self._url(after=self.next_cursor) if self.has_next else None
+
+    def prev_url(self):
+        return self._url(before=self.prev_cursor) if self.has_prev else None
+
+
+def paginate(query, keys, per_page=None, max_per_page=None):
+    """Возвращает KeysetPage для query по курсорам ?after= / ?before= / ?at=.
+
+    keys — список пар (колонка, desc) в порядке сортировки; колонки должны быть
+    NOT NULL (сравнение с NULL отбросило бы такие строки), последняя — уникальной
+    (как правило, id), иначе записи на границе страниц могут потеряться.
+    У query не должно быть собственного ORDER BY.
+    """
+    def fetch(values, forward, inclusive, limit):
+        selected = query
+        if values is not None:
+            selected = selected.filter(seek(keys, values, forward, inclusive))
+        order = [column.desc() if desc == forward else column.asc() for column, desc in keys]
+        return selected.order_by(*order).limit(limit).all()
+
+    return paginate_with(fetch, keys, lambda item: [getattr(item, column.key) for column, _ in keys],
+                         per_page, max_per_page)
+
+
+def paginate_with(fetch, keys, key_values, per_page=None, max_per_page=None):
+    """Как paginate, но записи выбирает fetch — для выдачи, собранной не одним запросом.
+
+    fetch(values, forward, inclusive, limit) возвращает до limit записей после
+    курсора values (None — с начала) в направлении обхода: при forward=False —
+    ближайшие перед курсором, от него к началу. key_values(item) — значения
+    ключей keys у записи.
+    """
+    per_page = _per_page(per_page, max_per_page)
+    after = request.args.get("after")
+    before = request.args.get("before")
+    at = request.args.get("at")
+    backwards = bool(before) and not (after or at)
+    inclusive = bool(at) and not after
+    cursor = before if backwards else after or at
+
+    values = _decode(cursor, keys) if cursor else None
+    items = list(fetch(values, not backwards, inclusive, per_page + 1))
+
+    has_more = len(items) > per_page
+    items = items[:per_page]
+    if backwards:
+        items.reverse()
+    has_next = True if backwards else has_more
+    has_prev = has_more if backwards else bool(cursor)
+
+    return KeysetPage(
+        items,
+        per_page,
+        next_cursor=encode_cursor(key_values(items[-1])) if items and has_next else None,
+        prev_cursor=encode_cursor(key_values(items[0])) if items and has_prev else None,
+    )
@@ -0,0 +1,111 @@
+"""Хэширование паролей с общим для всех воркеров ограничением.
+
+scrypt специально медленный; если серия входов считает его сразу во всех
+воркерах gunicorn, обычные страницы ждут. Поэтому одновременно KDF считают
+не больше ``PASSWORD_HASH_SLOTS`` запросов на весь сервер: слот — файловая
+блокировка (flock) в ``PASSWORD_HASH_LOCK_DIR``, общая для процессов и
+освобождаемая ядром, даже если воркер упал. Кто не получил слот за
+``PASSWORD_HASH_WAIT`` секунд, получает ``HashingBusy``, и вьюха отвечает 503.
+
+С синхронными воркерами запрос, занявший слот, занимает и воркер, поэтому
+слотов должно быть меньше, чем воркеров: остальные всегда свободны для
+страниц. hashlib.scrypt отпускает GIL, так что с потоковыми воркерами
+(``--threads``) соседние потоки во время хэширования тоже не стоят.
+
+Параметры (``PASSWORD_HASH_METHOD``) задаются в конфиге; хэши, посчитанные
+со старыми параметрами, пересчитываются при следующем успешном входе.
+"""
+import os
+import threading
+import time
+
+from flask import current_app, has_app_context
+from werkzeug.security import check_password_hash, generate_password_hash
+
+try:
+    import fcntl
+except ImportError:  # Windows: ограничение только внутри процесса
+    fcntl = None
+
+DEFAULT_METHOD = "scrypt:32768:8:1"
+_POLL_INTERVAL = 0.05
+
+
+class HashingBusy(Exception):
+    """Все слоты хэширования заняты — запрос нужно отклонить, а не ждать."""
+
+
+_lock = threading.Lock()
+_local_slots = {}
+
+
+def _config(name, default):
+    if has_app_context():
+        return current_app.config.get(name, default)
+    return default
+
+
+def _slot_paths(count):
+    directory = current_app.config["PASSWORD_HASH_LOCK_DIR"] or os.path.join(current_app.instance_path, "hash_slots")
+    os.makedirs(directory, exist_ok=True)
+    return [os.path.join(directory, f"slot-{i}.lock") for i in range(count)]
+
+
+def _try_lock(path):
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    return fd
+
+
+def _acquire(count, wait):
+    """Занимает слот; возвращает функцию освобождения."""
+    deadline = time.monotonic() + wait
+    if fcntl is None:
+        with _lock:
+            semaphore = _local_slots.setdefault(count, threading.BoundedSemaphore(count))
+        if not semaphore.acquire(timeout=wait):
+            raise HashingBusy()
+        return semaphore.release
+    paths = _slot_paths(count)
+    while True:
+        for path in paths:
+            fd = _try_lock(path)
+            if fd is not None:
+                # Закрытие дескриптора снимает flock
+                return lambda: os.close(fd)
+        if time.monotonic() >= deadline:
+            raise HashingBusy()
+        time.sleep(_POLL_INTERVAL)
+
+
+def _run(fn, *args):
+    slots = _config("PASSWORD_HASH_SLOTS", 0)
+    if not slots:
+        return fn(*args)
+    release = _acquire(slots, _config("PASSWORD_HASH_WAIT", 1))
+    try:
+        return fn(*args)
+    finally:
+        release()
+
+
+def current_method():
+    return _config("PASSWORD_HASH_METHOD", DEFAULT_METHOD)
+
+
+def hash_password(password):
+    return _run(generate_password_hash, password, current_method())
+
+
+def verify_password(password_hash, password):
+    return _run(check_password_hash, password_hash, password)
+
+
+def needs_rehash(password_hash):
+    """True, если хэш посчитан не теми параметрами, что заданы сейчас."""
+    method = password_hash.split("$", 1)[0]
+    return method != current_method()
@@ -0,0 +1,125 @@
+"""Правила повторения событий — подмножество RRULE из RFC 5545.
+
+Поддерживается ``FREQ=DAILY|WEEKLY|MONTHLY``, ``INTERVAL``, ``COUNT``,
+``UNTIL`` и ``BYDAY`` (только для недельных правил), например
+``FREQ=WEEKLY;INTERVAL=2;BYDAY=TU,TH;UNTIL=20271231``. Серия хранится одной
+строкой, вхождения вычисляются только для запрошенного окна: к его началу
+``expand`` переходит арифметически, не перебирая прошлые повторы.
+"""
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY")
+WEEKDAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+
+Rule = namedtuple("Rule", "freq interval count until byday")
+
+
+def _parse_until(value):
+    value = value.rstrip("Z")
+    try:
+        if "T" in value:
+            return datetime.strptime(value, "%Y%m%dT%H%M%S")
+        # Дата без времени — включительно до конца дня
+        return datetime.strptime(value, "%Y%m%d") + timedelta(days=1, microseconds=-1)
+    except ValueError:
+        raise ValueError(f"UNTIL: ожидалась дата вида 20271231, получено {value!r}")
+
+
+def _positive_int(name, value):
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise ValueError(f"{name}: ожидалось положительное целое, получено {value!r}")
+    return number
+
+
+def parse_rule(text):
+    """Разбирает RRULE; при ошибке выбрасывает ValueError с понятным сообщением."""
+    parts = {}
+    for item in text.strip().upper().removeprefix("RRULE:").split(";"):
+        if not item:
+            continue
+        name, sep, value = item.partition("=")
+        if not sep:
+            raise ValueError(f"некорректная часть правила: {item!r}")
+        parts[name] = value
+
+    freq = parts.pop("FREQ", None)
+    if freq not in FREQUENCIES:
+        raise ValueError(f"FREQ: поддерживаются {', '.join(FREQUENCIES)}")
+    interval = _positive_int("INTERVAL", parts.pop("INTERVAL", "1"))
+    count = _positive_int("COUNT", parts.pop("COUNT")) if "COUNT" in parts else None
+    until = _parse_until(parts.pop("UNTIL")) if "UNTIL" in parts else None
+    if count and until:
+        raise ValueError("COUNT и UNTIL нельзя указывать одновременно")
+    byday = None
+    if "BYDAY" in parts:
+        if freq != "WEEKLY":
+            raise ValueError("BYDAY поддерживается только для FREQ=WEEKLY")
+        days = parts.pop("BYDAY").split(",")
+        if not days or any(day not in WEEKDAYS for day in days):
+            raise ValueError(f"BYDAY: ожидались дни {','.join(WEEKDAYS)}")
+        byday = tuple(sorted({WEEKDAYS.index(day) for day in days}))
+    if parts:
+        raise ValueError(f"не поддерживается: {', '.join(sorted(parts))}")
+    return Rule(freq, interval, count, until, byday)
+
+
+def _add_months(dt, months):
+    """Тот же день через months месяцев или None, если такого дня нет (31 февраля)."""
+    month_index = dt.month - 1 + months
+    try:
+        return dt.replace(year=dt.year + month_index // 12, month=month_index % 12 + 1)
+    except ValueError:
+        return None
+
+
+def _period(dtstart, rule, k):
+    """Кандидаты k-го периода серии в порядке возрастания."""
+    if rule.freq == "DAILY":
+        return [dtstart + timedelta(days=k * rule.interval)]
+    if rule.freq == "WEEKLY":
+        monday = dtstart - timedelta(days=dtstart.weekday())
+        week = monday + timedelta(weeks=k * rule.interval)
+        days = rule.byday or (dtstart.weekday(),)
+        return [week + timedelta(days=day) for day in days]
+    occurrence = _add_months(dtstart, k * rule.interval)
+    return [occurrence] if occurrence is not None else []
+
+
+def _skip_to(dtstart, rule, window_start):
+    """Номер периода, с которого начинать, и число вхождений до него."""
+    days = (window_start - dtstart).days
+    if days <= 0 or rule.freq == "MONTHLY":
+        return 0, 0
+    if rule.freq == "DAILY":
+        k = days // rule.interval
+        return k, k
+    k = (days + dtstart.weekday()) // (7 * rule.interval)
+    if k == 0:
+        return 0, 0
+    first = sum(1 for occurrence in _period(dtstart, rule, 0) if occurrence >= dtstart)
+    return k, first + (k - 1) * len(rule.byday or (dtstart.weekday(),))
+
+
+def expand(dtstart, rule, window_start, window_end):
+    """Начала вхождений серии, попадающие в [window_start, window_end)."""
+    k, seen = _skip_to(dtstart, rule, window_start)
+    while True:
+        candidates = _period(dtstart, rule, k)
+        for occurrence in candidates:
+            if occurrence < dtstart:
+                continue
+            if occurrence >= window_end or (rule.until and occurrence > rule.until):
+                return
+            seen += 1
+            if rule.count and seen > rule.count:
+                return
+            if occurrence >= window_start:
+                yield occurrence
+        if not candidates and _add_months(dtstart.replace(day=1), k * rule.interval) >= window_end:
+            return
+        k += 1
@@ -0,0 +1,270 @@
+"""Кэш готовых ответов для анонимных посетителей.
+
+Хранилище — отдельный SQLite-файл, поэтому кэш общий для всех воркеров
+gunicorn. Каждая запись помечена тегами зависимостей: списки зависят от всей
+таблицы (``news``), детальные страницы — от конкретной строки (``news:42``).
+После коммита, затронувшего строки News/Document/Event/Deputy/FAQ, удаляются
+только записи с соответствующими тегами. Размер кэша ограничен, при
+переполнении вытесняются давно не читавшиеся записи (LRU).
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from functools import wraps
+from urllib.parse import urlencode
+
+from flask import current_app, has_app_context, make_response, request, session
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from db_engine import FRESH_READ
+from models import News, Document, Event, Deputy, FAQ
+
+log = logging.getLogger(__name__)
+
+CACHED_MODELS = (News, Document, Event, Deputy, FAQ)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    status INTEGER NOT NULL,
+    content_type TEXT NOT NULL,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_entries_accessed ON entries (accessed);
+CREATE TABLE IF NOT EXISTS tags (
+    tag TEXT NOT NULL,
+    key TEXT NOT NULL REFERENCES entries (key) ON DELETE CASCADE,
+    PRIMARY KEY (tag, key)
+);
+CREATE INDEX IF NOT EXISTS ix_tags_key ON tags (key);
+"""
+
+# Время последнего чтения обновляется не чаще раза в столько секунд,
+# чтобы чтения из кэша почти не превращались в записи.
+_TOUCH_INTERVAL = 30
+
+
+class ResponseCache:
+    def __init__(self, path, max_bytes, max_entry_bytes, ttl):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.ttl = ttl
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        # Соединение на поток и на процесс: после fork() старое использовать нельзя
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT status, content_type, body, created, accessed FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        status, content_type, body, created, accessed = row
+        now = time.time()
+        if self.ttl and now - created > self.ttl:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            return None
+        if now - accessed > _TOUCH_INTERVAL:
+            conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+        return status, content_type, body
+
+    def set(self, key, status, content_type, body, tags):
+        size = len(body)
+        if size > self.max_entry_bytes:
+            return
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            conn.execute(
+                "INSERT INTO entries (key, status, content_type, body, size, created, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, status, content_type, body, size, now, now),
+            )
+            conn.executemany("INSERT OR IGNORE INTO tags (tag, key) VALUES (?, ?)",
+                             [(tag, key) for tag in tags])
+            self._evict(conn)
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Освобождаем с запасом до 90% лимита, чтобы не вытеснять на каждой записи
+        excess = total - int(self.max_bytes * 0.9)
+        victims = []
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed"):
+            victims.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+
+    def invalidate(self, tags):
+        tags = list(tags)
+        if not tags:
+            return
+        conn = self._connect()
+        placeholders = ",".join("?" * len(tags))
+        conn.execute(
+            f"DELETE FROM entries WHERE key IN (SELECT key FROM tags WHERE tag IN ({placeholders}))",
+            tags,
+        )
+
+    def clear(self):
+        self._connect().execute("DELETE FROM entries")
+
+
+def _get_cache():
+    if not has_app_context():
+        return None
+    return current_app.extensions.get("response_cache")
+
+
+def _cacheable_request():
+    return (
+        request.method == "GET"
+        and not current_user.is_authenticated
+        and "_flashes" not in session
+        and not request.environ.get(FRESH_READ)
+    )
+
+
+def _cache_key(query_args):
+    """Endpoint, аргументы маршрута и только те параметры запроса, которые читает вьюха."""
+    params = sorted((request.view_args or {}).items())
+    params += [(name, request.args[name]) for name in sorted(query_args) if name in request.args]
+    return f"{request.endpoint}?{urlencode(params)}"
+
+
+def cached(*tag_templates, period=None, args=()):
+    """Кэширует ответ вьюхи для анонимных посетителей.
+
+    Теги — шаблоны с подстановкой аргументов маршрута, например
+    ``@cached("news:{news_id}")``; изменение строки News с этим id
+    (или любой строки таблицы для тега ``news``) удалит запись.
+    С period (секунды) запись живёт не дольше одного такого интервала.
+    args — параметры строки запроса, от которых зависит ответ (например,
+    pagination.PAGE_ARGS); остальные в ключ не входят, и запрос с ними
+    не создаёт новых записей, а только читает существующие.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*view_args, **kwargs):
+            cache = _get_cache()
+            if cache is None or not _cacheable_request():
+                return view(*view_args, **kwargs)
+
+            key = _cache_key(args)
+            if period:
+                key = f"{key}@{int(time.time() // period)}"
+            try:
+                hit = cache.get(key)
+            except sqlite3.Error:
+                log.exception("response cache read failed")
+                hit = None
+            if hit is not None:
+                status, content_type, body = hit
+                response = make_response(body, status)
+                response.content_type = content_type
+                response.headers["X-Cache"] = "HIT"
+                return response
+
+            response = make_response(view(*view_args, **kwargs))
+            # С посторонними параметрами ответ не сохраняется: иначе случайные
+            # ?x=... вытесняли бы настоящие страницы, а ссылки пагинации в
+            # сохранённой странице несли бы чужие параметры
+            if response.status_code == 200 and not response.direct_passthrough \
+                    and "Set-Cookie" not in response.headers and set(request.args) <= set(args):
+                tags = [t.format(**kwargs) for t in tag_templates]
+                try:
+                    cache.set(key, response.status_code, response.content_type,
+                              response.get_data(), tags)
+                except sqlite3.Error:
+                    log.exception("response cache write failed")
+            response.headers["X-Cache"] = "MISS"
+            return response
+        # Зависимости страницы нужны и статическому экспорту (freeze.py)
+        wrapper.cache_tags = tag_templates
+        wrapper.cache_period = period
+        return wrapper
+    return decorator
+
+
+# --- Инвалидация -------------------------------------------------------------
+
+def _changed_tags(session):
+    return session.info.setdefault("response_cache_tags", set())
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session, flush_context):
+    tags = None
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, CACHED_MODELS):
+            if tags is None:
+                tags = _changed_tags(session)
+            table = obj.__tablename__
+            tags.add(table)
+            tags.add(f"{table}:{obj.id}")
+
+
+def invalidate(tags):
+    """Удаляет записи с указанными тегами (для изменений в обход ORM-сессии)."""
+    cache = _get_cache()
+    if not tags or cache is None:
+        return
+    try:
+        cache.invalidate(tags)
+    except sqlite3.Error:
+        # Запись в БД уже закоммичена; устаревшая страница доживёт до TTL
+        log.exception("response cache invalidation failed")
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate(session):
+    invalidate(session.info.pop("response_cache_tags", None))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session):
+    session.info.pop("response_cache_tags", None)
+
+
+def init_cache(app):
+    if not app.config["RESPONSE_CACHE_ENABLED"]:
+        return
+    path = app.config["RESPONSE_CACHE_PATH"] or os.path.join(app.instance_path, "response_cache.sqlite")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    app.extensions["response_cache"] = ResponseCache(
+        path,
+        max_bytes=app.config["RESPONSE_CACHE_MAX_BYTES"],
+        max_entry_bytes=app.config["RESPONSE_CACHE_MAX_ENTRY_BYTES"],
+        ttl=app.config["RESPONSE_CACHE_TTL"],
+    )
+
+    @app.cli.command("cache-clear")
+    def cache_clear():
+        """Очистить кэш ответов."""
+        app.extensions["response_cache"].clear()
@@ -0,0 +1,395 @@
+"""Полнотекстовый индекс для /search.
+
+Один общий индекс на все разделы (новости, документы, депутаты, FAQ), поэтому
+релевантность считается сквозным образом. В SQLite это виртуальная таблица FTS5,
+в PostgreSQL — обычная таблица с tsvector-колонкой и GIN-индексом.
+
+Изменённые записи переиндексируются фоновой задачей ``search.index``, которая
+ставится в очередь после коммита (см. tasks.py); когда она выполнена, версия
+``search_index`` увеличивается, и ETag страницы поиска меняется.
+``flask search-reindex`` пересобирает индекс с нуля.
+"""
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+import click
+from sqlalchemy import DDL, event, select, text
+from sqlalchemy.orm import Session, defer
+
+import conditional
+import tasks
+from extensions import db
+from models import News, Document, Deputy, FAQ
+
+TABLE = "search_index"
+
+Source = namedtuple("Source", "kind code model title body flag")
+
+SOURCES = (
+    Source("news", 1, News, "title", "body", "is_published"),
+    Source("document", 2, Document, "title", "summary", "is_published"),
+    Source("deputy", 3, Deputy, "full_name", "bio", None),
+    Source("faq", 4, FAQ, "question", "answer", "is_published"),
+)
+BY_KIND = {s.kind: s for s in SOURCES}
+BY_MODEL = {s.model: s for s in SOURCES}
+
+JOB_BATCH = 500  # id в одной задаче переиндексации
+
+_KIND_BITS = 3  # rowid = ref_id << 3 | code — прямое удаление по rowid в FTS5
+
+# --- DDL ---------------------------------------------------------------------
+
+_SQLITE_DDL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+    "kind UNINDEXED, ref_id UNINDEXED, title, body, "
+    "tokenize = 'unicode61 remove_diacritics 2')"
+)
+
+_PG_DDL = (
+    f"CREATE TABLE IF NOT EXISTS {TABLE} ("
+    "kind VARCHAR(20) NOT NULL, "
+    "ref_id INTEGER NOT NULL, "
+    "title TEXT, "
+    "body TEXT, "
+    "tsv TSVECTOR GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('russian', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(body, '')), 'B')) STORED, "
+    "PRIMARY KEY (kind, ref_id))"
+)
+_PG_INDEX_DDL = f"CREATE INDEX IF NOT EXISTS ix_{TABLE}_tsv ON {TABLE} USING GIN (tsv)"
+
+event.listen(db.metadata, "after_create", DDL(_SQLITE_DDL).execute_if(dialect="sqlite"))
+event.listen(db.metadata, "after_create", DDL(_PG_DDL).execute_if(dialect="postgresql"))
+event.listen(db.metadata, "after_create", DDL(_PG_INDEX_DDL).execute_if(dialect="postgresql"))
+event.listen(db.metadata, "before_drop", DDL(f"DROP TABLE IF EXISTS {TABLE}"))
+
+
+def _dialect(bind):
+    name = bind.dialect.name
+    return name if name in ("sqlite", "postgresql") else None
+
+
+def create_table(connection):
+    dialect = _dialect(connection)
+    if dialect == "sqlite":
+        connection.execute(text(_SQLITE_DDL))
+    elif dialect == "postgresql":
+        connection.execute(text(_PG_DDL))
+        connection.execute(text(_PG_INDEX_DDL))
+
+
+# --- Нормализация и стемминг -------------------------------------------------
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_CYRILLIC_RE = re.compile(r"[а-я]")
+
+_VOWELS = "аеиоуыэюя"
+
+_PERFECTIVE_GERUND = (("в", "вши", "вшись"), ("ив", "ивши", "ившись", "ыв", "ывши", "ывшись"))
+_ADJECTIVE = ("ее", "ие", "ые", "ое", "ими", "ыми", "ей", "ий", "ый", "ой", "ем", "им", "ым",
+              "ом", "его", "ого", "ему", "ому", "их", "ых", "ую", "юю", "ая", "яя", "ою", "ею")
+_PARTICIPLE = (("ем", "нн", "вш", "ющ", "щ"), ("ивш", "ывш", "ующ"))
+_REFLEXIVE = ("ся", "сь")
+_VERB = (("ла", "на", "ете", "йте", "ли", "й", "л", "ем", "н", "ло", "но", "ет", "ют", "ны",
+          "ть", "ешь", "нно"),
+         ("ила", "ыла", "ена", "ейте", "уйте", "ите", "или", "ыли", "ей", "уй", "ил", "ыл", "им",
+          "ым", "ен", "ило", "ыло", "ено", "ят", "ует", "уют", "ит", "ыт", "ены", "ить", "ыть",
+          "ишь", "ую", "ю"))
+_NOUN = ("а", "ев", "ов", "ие", "ье", "е", "иями", "ями", "ами", "еи", "ии", "и", "ией", "ей",
+         "ой", "ий", "й", "иям", "ям", "ием", "ем", "ам", "ом", "о", "у", "ах", "иях", "ях", "ы",
+         "ь", "ию", "ью", "ю", "ия", "ья", "я")
+_SUPERLATIVE = ("ейше", "ейш")
+_DERIVATIONAL = ("ость", "ост")
+
+
+def _by_length(suffixes):
+    return tuple(sorted(suffixes, key=len, reverse=True))
+
+
+# Списки суффиксов заранее упорядочены от длинных к коротким: ищется самое длинное совпадение
+_PERFECTIVE_GERUND = tuple(_by_length(g) for g in _PERFECTIVE_GERUND)
+_ADJECTIVE = _by_length(_ADJECTIVE)
+_PARTICIPLE = tuple(_by_length(g) for g in _PARTICIPLE)
+_VERB = tuple(_by_length(g) for g in _VERB)
+_NOUN = _by_length(_NOUN)
+_SUPERLATIVE = _by_length(_SUPERLATIVE)
+
+
+def _strip(word, suffixes):
+    """Отрезает самый длинный подходящий суффикс; None — если совпадений нет."""
+    if not word.endswith(suffixes):
+        return None
+    for suffix in suffixes:
+        if word.endswith(suffix):
+            return word[:-len(suffix)]
+    return None
+
+
+def _strip_grouped(word, groups):
+    first, second = groups
+    # Суффиксы первой группы допустимы только после «а»/«я»;
+    # из обеих групп берётся самое длинное совпадение.
+    best = None
+    if word.endswith(first):
+        for suffix in first:
+            if word.endswith(suffix) and word[:-len(suffix)].endswith(("а", "я")):
+                best = suffix
+                break
+    if word.endswith(second):
+        for suffix in second:
+            if word.endswith(suffix):
+                if best is None or len(suffix) > len(best):
+                    best = suffix
+                break
+    return word[:-len(best)] if best else None
+
+
+def _regions(word):
+    rv = r1 = r2 = len(word)
+    for i, ch in enumerate(word):
+        if ch in _VOWELS:
+            rv = i + 1
+            break
+    for i in range(1, len(word)):
+        if word[i - 1] in _VOWELS and word[i] not in _VOWELS:
+            r1 = i + 1
+            break
+    for i in range(r1 + 1, len(word)):
+        if word[i - 1] in _VOWELS and word[i] not in _VOWELS:
+            r2 = i + 1
+            break
+    return rv, r1, r2
+
+
+@lru_cache(maxsize=100_000)
+def stem_ru(word):
+    """Стеммер Snowball для русского языка (Porter, 2002)."""
+    rv, _, r2 = _regions(word)
+    head, tail = word[:rv], word[rv:]
+
+    # Шаг 1
+    stripped = _strip_grouped(tail, _PERFECTIVE_GERUND)
+    if stripped is None:
+        reflexive = _strip(tail, _REFLEXIVE)
+        if reflexive is not None:
+            tail = reflexive
+        stripped = _strip(tail, _ADJECTIVE)
+        if stripped is not None:
+            participle = _strip_grouped(stripped, _PARTICIPLE)
+            if participle is not None:
+                stripped = participle
+        else:
+            stripped = _strip_grouped(tail, _VERB)
+            if stripped is None:
+                stripped = _strip(tail, _NOUN)
+    if stripped is not None:
+        tail = stripped
+
+    # Шаг 2
+    if tail.endswith("и"):
+        tail = tail[:-1]
+
+    # Шаг 3: словообразовательный суффикс в R2
+    r2_in_tail = max(r2 - rv, 0)
+    for suffix in _DERIVATIONAL:
+        if tail.endswith(suffix) and len(tail) - len(suffix) >= r2_in_tail:
+            tail = tail[:-len(suffix)]
+            break
+
+    # Шаг 4
+    if tail.endswith("нн"):
+        tail = tail[:-1]
+    else:
+        stripped = _strip(tail, _SUPERLATIVE)
+        if stripped is not None:
+            tail = stripped[:-1] if stripped.endswith("нн") else stripped
+        elif tail.endswith("ь"):
+            tail = tail[:-1]
+
+    return head + tail
+
+
+def tokenize(value):
+    value = (value or "").lower().replace("ё", "е")
+    return _WORD_RE.findall(value)
+
+
+def normalize(value):
+    """Текст в виде, в котором он хранится в FTS5: токены через пробел, русские — по основам."""
+    return " ".join(stem_ru(t) if _CYRILLIC_RE.search(t) else t for t in tokenize(value))
+
+
+# --- Запись в индекс ---------------------------------------------------------
+
+def _rowid(source, ref_id):
+    return (ref_id << _KIND_BITS) | source.code
+
+
+def index_rows(connection, source, rows):
+    """rows — итерируемое из (id, title, body); записи заменяются целиком."""
+    dialect = _dialect(connection)
+    if dialect is None:
+        return
+    rows = list(rows)
+    if not rows:
+        return
+    if dialect == "sqlite":
+        connection.execute(
+            text(f"DELETE FROM {TABLE} WHERE rowid = :rowid"),
+            [{"rowid": _rowid(source, r[0])} for r in rows],
+        )
+        connection.execute(
+            text(f"INSERT INTO {TABLE} (rowid, kind, ref_id, title, body) "
+                 "VALUES (:rowid, :kind, :ref_id, :title, :body)"),
+            [{"rowid": _rowid(source, ref_id), "kind": source.kind, "ref_id": ref_id,
+              "title": normalize(title), "body": normalize(body)}
+             for ref_id, title, body in rows],
+        )
+    else:
+        connection.execute(
+            text(f"INSERT INTO {TABLE} (kind, ref_id, title, body) "
+                 "VALUES (:kind, :ref_id, :title, :body) "
+                 "ON CONFLICT (kind, ref_id) DO UPDATE "
+                 "SET title = EXCLUDED.title, body = EXCLUDED.body"),
+            [{"kind": source.kind, "ref_id": ref_id, "title": title or "", "body": body or ""}
+             for ref_id, title, body in rows],
+        )
+
+
+def remove_rows(connection, source, ids):
+    dialect = _dialect(connection)
+    ids = list(ids)
+    if dialect is None or not ids:
+        return
+    if dialect == "sqlite":
+        connection.execute(
+            text(f"DELETE FROM {TABLE} WHERE rowid = :rowid"),
+            [{"rowid": _rowid(source, i)} for i in ids],
+        )
+    else:
+        connection.execute(
+            text(f"DELETE FROM {TABLE} WHERE kind = :kind AND ref_id = :ref_id"),
+            [{"kind": source.kind, "ref_id": i} for i in ids],
+        )
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session, flush_context):
+    changed = {}
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        source = BY_MODEL.get(type(obj))
+        if source is not None:
+            changed.setdefault(source.kind, set()).add(obj.id)
+    for kind, ids in changed.items():
+        ids = sorted(ids)
+        for i in range(0, len(ids), JOB_BATCH):
+            tasks.on_commit(session, "search.index", {"kind": kind, "ids": ids[i:i + JOB_BATCH]})
+
+
+@tasks.task("search.index", concurrency=1)
+def _index_job(connection, payload):
+    """Переиндексирует строки по id: видимые — заново, скрытые и удалённые — из индекса."""
+    source = BY_KIND[payload["kind"]]
+    table = source.model.__table__
+    columns = [table.c.id, table.c[source.title], table.c[source.body]]
+    if source.flag is not None:
+        columns.append(table.c[source.flag])
+    visible = []
+    for row in connection.execute(select(*columns).where(table.c.id.in_(payload["ids"]))):
+        if source.flag is None or row[3]:
+            visible.append(tuple(row[:3]))
+    hidden = set(payload["ids"]) - {row[0] for row in visible}
+    remove_rows(connection, source, hidden)
+    index_rows(connection, source, visible)
+    conditional.bump(connection, {TABLE})
+
+
+def rebuild(connection, batch_size=1000):
+    """Пересобирает индекс с нуля; возвращает число проиндексированных записей по разделам."""
+    create_table(connection)
+    connection.execute(text(f"DELETE FROM {TABLE}"))
+    counts = {}
+    for source in SOURCES:
+        model = source.model
+        stmt = select(model.id, getattr(model, source.title), getattr(model, source.body))
+        if source.flag:
+            stmt = stmt.where(getattr(model, source.flag).is_(True))
+        result = connection.execute(stmt.order_by(model.id),
+                                    execution_options={"yield_per": batch_size})
+        total = 0
+        for batch in result.partitions():
+            index_rows(connection, source, batch)
+            total += len(batch)
+        counts[source.kind] = total
+    return counts
+
+
+# --- Поиск -------------------------------------------------------------------
+
+Hit = namedtuple("Hit", "kind ref_id rank")
+
+
+def _match_expression(q):
+    terms = [normalize(t) for t in tokenize(q)]
+    # Каждая основа — отдельная фраза в кавычках с префиксным поиском, чтобы
+    # пользовательский ввод не интерпретировался как синтаксис FTS5.
+    return " AND ".join(f'"{t}"*' for t in terms if t)
+
+
+def search(q, limit, offset=0):
+    """Возвращает список Hit, отсортированный по релевантности."""
+    connection = db.session.connection()
+    dialect = _dialect(connection)
+    if dialect == "sqlite":
+        expression = _match_expression(q)
+        if not expression:
+            return []
+        # bm25: заголовок весит больше текста; у UNINDEXED-колонок вес 0
+        rows = connection.execute(
+            text(f"SELECT kind, ref_id, bm25({TABLE}, 0, 0, 10.0, 1.0) AS rank "
+                 f"FROM {TABLE} WHERE {TABLE} MATCH :expr "
+                 "ORDER BY rank LIMIT :limit OFFSET :offset"),
+            {"expr": expression, "limit": limit, "offset": offset},
+        )
+    elif dialect == "postgresql":
+        rows = connection.execute(
+            text("SELECT kind, ref_id, ts_rank(tsv, query) AS rank "
+                 f"FROM {TABLE}, plainto_tsquery('russian', :q) AS query "
+                 "WHERE tsv @@ query "
+                 "ORDER BY rank DESC LIMIT :limit OFFSET :offset"),
+            {"q": q, "limit": limit, "offset": offset},
+        )
+    else:
+        return []
+    return [Hit(kind, int(ref_id), rank) for kind, ref_id, rank in rows]
+
+
+def load_hits(hits):
+    """Подгружает объекты моделей для Hit одним запросом на раздел, сохраняя порядок."""
+    ids_by_kind = {}
+    for hit in hits:
+        ids_by_kind.setdefault(hit.kind, []).append(hit.ref_id)
+    objects = {}
+    for kind, ids in ids_by_kind.items():
+        source = BY_KIND[kind]
+        model = source.model
+        # Полные тексты в выдаче не нужны — показывается сохранённый excerpt
+        query = model.query.options(defer(getattr(model, source.body))).filter(model.id.in_(ids))
+        for obj in query:
+            objects[(kind, obj.id)] = obj
+    return [(hit.kind, objects[(hit.kind, hit.ref_id)])
+            for hit in hits if (hit.kind, hit.ref_id) in objects]
+
+
+def init_search(app):
+    @app.cli.command("search-reindex")
+    @click.option("--batch-size", default=1000, show_default=True)
+    def search_reindex(batch_size):
+        """Пересобрать полнотекстовый индекс поиска."""
+        with db.engine.begin() as connection:
+            counts = rebuild(connection, batch_size=batch_size)
+            conditional.bump(connection, {TABLE})
+        for kind, total in counts.items():
+            click.echo(f"{kind}: {total}")
@@ -1,11 +1,56 @@
+import threading
+import time
+from collections import deque
 from functools import wraps
 from flask import abort
-from flask_login import current_user
+from user_cache import is_admin_verified
 
 def admin_required(f):
     @wraps(f)
     def wrapper(*args, **kwargs):
-        if not current_user.is_authenticated or not current_user.is_admin:
+        if not is_admin_verified():
             abort(403)
         return f(*args, **kwargs)
     return wrapper
+
+class RateLimiter:
+    """Скользящее окно попыток по ключу (IP, email). Счётчики свои у каждого воркера."""
+
+    MAX_KEYS = 100_000
+
+    def __init__(self):
+        self._hits = {}
+        self._lock = threading.Lock()
+
+    def _recent(self, key, window, now):
+        hits = self._hits.get(key)
+        if hits is None:
+            return None
+        while hits and hits[0] <= now - window:
+            hits.popleft()
+        return hits
+
+    def exceeded(self, key, limit, window):
+        with self._lock:
+            hits = self._recent(key, window, time.monotonic())
+            return hits is not None and len(hits) >= limit
+
+    def hit(self, key, window):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._hits) >= self.MAX_KEYS:
+                self._prune(window, now)
+            hits = self._recent(key, window, now)
+            if hits is None:
+                hits = self._hits[key] = deque()
+            hits.append(now)
+
+    def reset(self, key):
+        with self._lock:
+            self._hits.pop(key, None)
+
+    def _prune(self, window, now):
+        for key in [k for k, v in self._hits.items() if not v or v[-1] <= now - window]:
+            del self._hits[key]
+
+login_limiter = RateLimiter()
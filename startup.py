@@ -0,0 +1,190 @@
+"""Быстрый старт воркера: отложенная админка, кэш байт-кода Jinja, прогрев для ``--preload``.
+
+- Flask-Admin (импорт ``flask_admin.contrib.sqla`` и полсотни правил URL)
+  при ``ADMIN_LAZY`` не входит в основное приложение: запросы к ``/admin``
+  обслуживает маленькое приложение только с админкой (``admin.create_admin_app``),
+  созданное при первом таком запросе. Конфиг, движки БД, кэш ответов и
+  метрики у него общие с основным, сессия и вход — тоже.
+- Скомпилированные шаблоны кэшируются на диске (``JINJA_CACHE_DIR``) и общие
+  для всех воркеров и перезапусков; при изменении шаблона запись не подходит
+  по контрольной сумме и перекомпилируется.
+- С ``STARTUP_PREWARM`` фабрика заранее компилирует шаблоны, настраивает
+  мапперы SQLAlchemy и создаёт приложение админки, а затем замораживает
+  объекты для сборщика мусора: при ``gunicorn --preload`` воркеры получают
+  всё это от мастера copy-on-write.
+- Время каждой фазы фабрики пишется в лог и выводится ``flask startup``.
+"""
+import gc
+import os
+import threading
+import time
+from collections.abc import MutableMapping
+
+import click
+from flask import Blueprint, abort, current_app
+from flask.cli import with_appcontext
+from jinja2 import FileSystemBytecodeCache
+from sqlalchemy.orm import configure_mappers
+
+from extensions import db
+
+ADMIN_PREFIX = "/admin"
+# Шаблоны Flask-Admin для других версий Bootstrap приложению не нужны
+UNUSED_TEMPLATES = ("bootstrap2/", "bootstrap3/")
+
+
+class StartupTimer:
+    """Время фаз фабрики приложения: mark(name) закрывает фазу, начатую предыдущей меткой."""
+
+    def __init__(self, imports=None):
+        self.imports = imports  # импорт модулей — общий для всех приложений процесса
+        self.started = self.last = time.perf_counter()
+        self.phases = []
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.phases.append((name, now - self.last))
+        self.last = now
+
+    @property
+    def total(self):
+        return self.last - self.started
+
+    def summary(self):
+        phases = ", ".join(f"{name} {seconds * 1000:.0f}" for name, seconds in self.phases)
+        imports = f"; импорт модулей {self.imports * 1000:.0f} мс" if self.imports is not None else ""
+        return f"старт приложения {self.total * 1000:.0f} мс ({phases}){imports}"
+
+
+# --- Кэш байт-кода шаблонов ----------------------------------------------------
+
+def init_bytecode_cache(app):
+    """Вызывается до первого обращения к app.jinja_env: окружение создаётся один раз."""
+    if not app.config["JINJA_BYTECODE_CACHE"]:
+        return
+    directory = app.config["JINJA_CACHE_DIR"] or os.path.join(app.instance_path, "jinja_cache")
+    os.makedirs(directory, exist_ok=True)
+    app.jinja_options = {**app.jinja_options, "bytecode_cache": FileSystemBytecodeCache(directory)}
+
+
+# --- Отложенная админка --------------------------------------------------------
+
+# Только для url_for('admin.index') в шаблонах: сами запросы к /admin сюда не доходят
+_admin_stub = Blueprint("admin", __name__)
+
+
+@_admin_stub.route(f"{ADMIN_PREFIX}/", endpoint="index")
+def _admin_index():
+    abort(404)
+
+
+class LazyAdmin:
+    """WSGI-обёртка: /admin — в приложение с Flask-Admin, созданное при первом запросе."""
+
+    def __init__(self, parent):
+        self.parent = parent
+        self.wsgi_app = parent.wsgi_app
+        self.app = None
+        self.lock = threading.Lock()
+
+    def get(self):
+        if self.app is None:
+            with self.lock:
+                if self.app is None:
+                    from admin import create_admin_app  # импорт Flask-Admin заметно удлиняет старт
+                    self.app = create_admin_app(self.parent)
+        return self.app
+
+    def __call__(self, environ, start_response):
+        path = environ.get("PATH_INFO", "")
+        if path == ADMIN_PREFIX or path.startswith(ADMIN_PREFIX + "/"):
+            return self.get().wsgi_app(environ, start_response)
+        return self.wsgi_app(environ, start_response)
+
+
+def _engine_registry():
+    """Движки Flask-SQLAlchemy по приложениям.
+
+    Публичного способа отдать движки одного приложения другому нет, поэтому
+    используется закрытый ``SQLAlchemy._app_engines``; версия Flask-SQLAlchemy
+    закреплена в requirements.txt. Если атрибут пропал, лучше упасть при старте,
+    чем при первом запросе к /admin.
+    """
+    registry = getattr(db, "_app_engines", None)
+    if not isinstance(registry, MutableMapping):
+        raise RuntimeError("ADMIN_LAZY: эта версия Flask-SQLAlchemy не поддерживается "
+                           "(нет SQLAlchemy._app_engines); задайте ADMIN_LAZY=0 "
+                           "или установите версию из requirements.txt")
+    return registry
+
+
+def share_engines(app, parent):
+    """app пользуется движками (и пулами соединений) parent, а не создаёт свои."""
+    registry = _engine_registry()
+    if parent not in registry:
+        raise RuntimeError("share_engines: db.init_app(parent) ещё не вызван")
+    registry[app] = registry[parent]
+
+
+def init_lazy_admin(app):
+    _engine_registry()
+    app.register_blueprint(_admin_stub)
+    app.wsgi_app = app.extensions["lazy_admin"] = LazyAdmin(app)
+
+
+def admin_app(app):
+    """Приложение, которое обслуживает /admin: само app или отложенный экземпляр."""
+    lazy = app.extensions.get("lazy_admin")
+    return lazy.get() if lazy is not None else app
+
+
+def public_app(app):
+    """Приложение с публичными страницами: для приложения админки — основное."""
+    return app.extensions.get("admin_parent", app)
+
+
+# --- Прогрев для --preload -----------------------------------------------------
+
+def prewarm(app):
+    """Компилирует шаблоны и мапперы до fork(); возвращает число шаблонов."""
+    configure_mappers()
+    lazy = app.extensions.get("lazy_admin")
+    if lazy is not None:
+        # В мастере админка строится один раз и достаётся воркерам готовой
+        lazy.get()
+    env = app.jinja_env
+    names = [name for name in env.list_templates(extensions=("html",))
+             if not name.startswith(UNUSED_TEMPLATES)]
+    for name in names:
+        env.get_template(name)
+    with app.app_context():
+        # Соединения, открытые при старте, не должны достаться воркерам после fork()
+        for engine in app.extensions["sqlalchemy"].engines.values():
+            engine.dispose()
+    # Уже созданные объекты сборщик мусора больше не обходит и не пишет в их
+    # страницы памяти — они остаются общими с мастером
+    gc.freeze()
+    return len(names)
+
+
+@click.command("startup")
+@with_appcontext
+@click.option("--admin", is_flag=True, help="Создать и приложение админки (при ADMIN_LAZY).")
+def startup_command(admin):
+    """Показать время старта приложения по фазам."""
+    apps = [current_app._get_current_object()]
+    if admin and "lazy_admin" in apps[0].extensions:
+        apps.append(admin_app(apps[0]))
+    for app in apps:
+        timer = app.extensions["startup"]
+        click.echo(f"{app.name}{' (админка)' if app is not apps[0] else ''}:")
+        if timer.imports is not None:
+            click.echo(f"  {'импорт модулей':<16} {timer.imports * 1000:7.1f} мс")
+        for name, seconds in timer.phases:
+            click.echo(f"  {name:<16} {seconds * 1000:7.1f} мс")
+        click.echo(f"  {'итого':<16} {timer.total * 1000:7.1f} мс")
+
+
+def init_startup(app, timer):
+    app.extensions["startup"] = timer
+    app.cli.add_command(startup_command)
@@ -0,0 +1,58 @@
+// Подсказки в поиске навбара: /search/suggest по мере ввода
+(function () {
+  var input = document.querySelector('[data-suggest-url]');
+  if (!input) return;
+
+  var KINDS = {deputy: 'Депутат', news: 'Новость', document: 'Документ', faq: 'FAQ'};
+  var menu = document.createElement('div');
+  menu.className = 'dropdown-menu';
+  menu.style.top = '100%';
+  input.parentNode.classList.add('position-relative');
+  input.parentNode.appendChild(menu);
+
+  var timer = null;
+  var controller = null;
+
+  function hide() {
+    menu.classList.remove('show');
+  }
+
+  function render(items) {
+    menu.replaceChildren();
+    items.forEach(function (item) {
+      var link = document.createElement('a');
+      link.className = 'dropdown-item text-truncate';
+      link.href = item.url;
+      var kind = document.createElement('small');
+      kind.className = 'text-muted me-2';
+      kind.textContent = KINDS[item.kind] || item.kind;
+      link.append(kind, item.title);
+      menu.appendChild(link);
+    });
+    menu.classList.toggle('show', items.length > 0);
+  }
+
+  input.addEventListener('input', function () {
+    clearTimeout(timer);
+    var q = input.value.trim();
+    if (q.length < 2) {
+      hide();
+      return;
+    }
+    timer = setTimeout(function () {
+      if (controller) controller.abort();
+      controller = new AbortController();
+      fetch(input.dataset.suggestUrl + '?q=' + encodeURIComponent(q), {signal: controller.signal})
+        .then(function (response) { return response.ok ? response.json() : {items: []}; })
+        .then(function (data) { render(data.items); })
+        .catch(function () {});
+    }, 150);
+  });
+  input.addEventListener('keydown', function (event) {
+    if (event.key === 'Escape') hide();
+  });
+  input.addEventListener('blur', function () {
+    // Клик по подсказке должен успеть сработать
+    setTimeout(hide, 200);
+  });
+})();
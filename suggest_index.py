@@ -0,0 +1,294 @@
+"""Подсказки поиска по мере ввода (``/search/suggest``) из индекса в памяти.
+
+Для каждого раздела (депутаты, новости, документы, FAQ) — отсортированный
+список ключей, префикс ищется через bisect без обращения к БД. Ключ —
+заголовок, начиная с каждого из первых ``KEY_WORDS`` слов (``петр иванов``
+находится и по «пет», и по «ива»), после casefold и замены «ё» на «е»; номер
+записи дописан в конец ключа после служебного символа. Ключ и ссылка лежат в
+одной строке, поэтому читателям не нужны блокировки, а список строк
+компактнее списка кортежей. Общее число ключей ограничено ``SUGGEST_MAX_KEYS``:
+новости и документы при нехватке берутся от самых свежих.
+
+Индекс строится в фоне при первом запросе к воркеру. Изменения, закоммиченные
+в этом процессе, применяются сразу (события сессии); правки других воркеров,
+импорт и datagen замечаются по ``table_version`` не реже раза в
+``SUGGEST_SYNC_SECONDS``, и изменившийся раздел перестраивается в фоне.
+"""
+import bisect
+import logging
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+
+from flask import current_app
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models import TableVersion
+from search_index import BY_KIND, BY_MODEL
+
+log = logging.getLogger(__name__)
+
+KEY_WORDS = 6
+KEY_LENGTH = 48  # более длинный запрос дочищается проверкой заголовка
+SCAN_LIMIT = 64  # ключей, просматриваемых в разделе на один запрос
+MIN_QUERY = 2
+# Порядок разделов: при сборке (депутаты и FAQ небольшие и нужны всегда) и в выдаче
+KINDS = ("deputy", "news", "document", "faq")
+BUILD_ORDER = ("deputy", "faq", "news", "document")
+# Что оставлять при нехватке бюджета: самые свежие записи
+RANK_COLUMNS = {"news": "published_at", "document": "published_at"}
+
+# Ключ от начала заголовка и от следующих слов: первые выше в выдаче.
+# Оба символа меньше пробела, поэтому «иван» + HEAD сортируется перед «иван петров».
+HEAD, WORD = "\x01", "\x02"
+_WORD_RE = re.compile(r"\w+")
+
+Item = namedtuple("Item", "kind ref_id title rank")
+
+
+def fold(value):
+    """Нормализация для сравнения: casefold, «ё» → «е», слова через один пробел."""
+    return " ".join(_WORD_RE.findall((value or "").casefold().replace("ё", "е")))
+
+
+def _keys(ref_id, title):
+    words = fold(title).split(" ")
+    keys = set()
+    for i in range(min(len(words), KEY_WORDS)):
+        if words[i]:
+            keys.add(" ".join(words[i:])[:KEY_LENGTH] + (HEAD if i == 0 else WORD) + str(ref_id))
+    return keys
+
+
+class _Section:
+    """Ключи одного раздела. Пишут под lock индекса, читают без блокировок."""
+
+    def __init__(self, kind, items):
+        self.kind = kind
+        self.items = {item.ref_id: item for item in items}
+        self.keys = sorted(key for item in items for key in _keys(item.ref_id, item.title))
+
+    def put(self, item):
+        self.remove(item.ref_id)
+        self.items[item.ref_id] = item
+        for key in _keys(item.ref_id, item.title):
+            bisect.insort(self.keys, key)
+
+    def remove(self, ref_id):
+        item = self.items.pop(ref_id, None)
+        if item is None:
+            return
+        for key in _keys(ref_id, item.title):
+            i = bisect.bisect_left(self.keys, key)
+            if i < len(self.keys) and self.keys[i] == key:
+                del self.keys[i]
+
+    def scan(self, probe):
+        """{ref_id: совпадение с начала заголовка} для ключей с префиксом probe."""
+        keys = self.keys
+        found = {}
+        i = bisect.bisect_left(keys, probe)
+        end = min(i + SCAN_LIMIT, len(keys))
+        while i < end:
+            key = keys[i]
+            if not key.startswith(probe):
+                break
+            cut = len(key.rstrip("0123456789")) - 1
+            ref_id = int(key[cut + 1:])
+            found[ref_id] = found.get(ref_id, False) or key[cut] == HEAD
+            i += 1
+        return found
+
+
+class SuggestIndex:
+    def __init__(self):
+        self.pid = os.getpid()
+        self.sections = {}
+        self.versions = {}
+        self.lock = threading.Lock()
+        self.refreshing = False
+        self.started = False
+        self.checked_at = time.monotonic()
+
+    def size(self):
+        return sum(len(section.keys) for section in self.sections.values())
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    global _index
+    with _index_lock:
+        # После fork() блокировки и фоновые потоки родителя недействительны
+        if _index is None or _index.pid != os.getpid():
+            _index = SuggestIndex()
+        return _index
+
+
+# --- Сборка -------------------------------------------------------------------
+
+def _table(kind):
+    return BY_KIND[kind].model.__tablename__
+
+
+def _versions(connection):
+    t = TableVersion.__table__
+    tables = [_table(kind) for kind in KINDS]
+    return dict(connection.execute(select(t.c.table_name, t.c.version).where(t.c.table_name.in_(tables))).all())
+
+
+def _load(connection, kind, max_keys):
+    """Видимые записи раздела, пока их ключи помещаются в max_keys."""
+    source = BY_KIND[kind]
+    model = source.model
+    rank = getattr(model, RANK_COLUMNS[kind]) if kind in RANK_COLUMNS else None
+    stmt = select(model.id, getattr(model, source.title), rank if rank is not None else model.id)
+    if source.flag:
+        stmt = stmt.where(getattr(model, source.flag).is_(True))
+    if rank is not None:
+        stmt = stmt.order_by(rank.desc(), model.id.desc())
+    items, total = [], 0
+    result = connection.execute(stmt, execution_options={"yield_per": 1000})
+    try:
+        for ref_id, title, rank_value in result:
+            total += len(_keys(ref_id, title))
+            if total > max_keys:
+                break
+            items.append(Item(kind, ref_id, title, rank_value.timestamp() if rank is not None and rank_value else 0))
+    finally:
+        result.close()
+    return items
+
+
+def build(app, kinds=BUILD_ORDER):
+    """Собирает (или пересобирает) разделы kinds; вызывается в фоновом потоке."""
+    index = get_index()
+    budget = app.config["SUGGEST_MAX_KEYS"]
+    started = time.perf_counter()
+    with app.app_context(), db.engine.connect() as connection:
+        # Версии читаются до данных: правка между ними вызовет ещё одну пересборку
+        versions = _versions(connection)
+        for kind in kinds:
+            others = sum(len(s.keys) for k, s in index.sections.items() if k != kind)
+            section = _Section(kind, _load(connection, kind, max(budget - others, 0)))
+            with index.lock:
+                index.sections[kind] = section
+                index.versions[_table(kind)] = versions.get(_table(kind), 0)
+    log.info("suggest index: %s rebuilt in %.3fs, %d keys",
+             ", ".join(kinds), time.perf_counter() - started, index.size())
+
+
+def _build_in_background(app, kinds):
+    index = get_index()
+    with index.lock:
+        if index.refreshing:
+            return
+        index.refreshing = True
+
+    def run():
+        try:
+            build(app, kinds)
+        except Exception:
+            log.exception("suggest index build failed")
+        finally:
+            index.refreshing = False
+
+    threading.Thread(target=run, name="suggest-index", daemon=True).start()
+
+
+def warm():
+    """before_request: первый запрос воркера запускает сборку индекса в фоне."""
+    index = get_index()
+    if not index.started:
+        index.started = True
+        _build_in_background(current_app._get_current_object(), BUILD_ORDER)
+
+
+def _sync(index):
+    """Раз в SUGGEST_SYNC_SECONDS сверяет версии таблиц и пересобирает изменившиеся разделы."""
+    now = time.monotonic()
+    if now - index.checked_at < current_app.config["SUGGEST_SYNC_SECONDS"] or index.refreshing:
+        return
+    index.checked_at = now
+    versions = _versions(db.session.connection())
+    stale = [kind for kind in BUILD_ORDER
+             if kind in index.sections and versions.get(_table(kind), 0) != index.versions.get(_table(kind))]
+    if stale:
+        _build_in_background(current_app._get_current_object(), stale)
+
+
+# --- Поиск --------------------------------------------------------------------
+
+def suggest(q, limit):
+    """Записи, в заголовке которых есть слово (фраза), начинающееся с q."""
+    index = get_index()
+    _sync(index)
+    q = fold(q)
+    if len(q) < MIN_QUERY:
+        return []
+    probe = q[:KEY_LENGTH]
+    found = []
+    for order, kind in enumerate(KINDS):
+        section = index.sections.get(kind)
+        if section is None:
+            continue
+        for ref_id, head in section.scan(probe).items():
+            item = section.items.get(ref_id)
+            if item is None:
+                continue  # ключ удаляется параллельно
+            if len(q) > KEY_LENGTH and f" {q}" not in f" {fold(item.title)}":
+                continue
+            found.append((not head, order, -item.rank, item.title, item))
+    found.sort(key=lambda entry: entry[:4])
+    return [entry[-1] for entry in found[:limit]]
+
+
+# --- Изменения из этого процесса -----------------------------------------------
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session, flush_context):
+    changes = None
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        source = BY_MODEL.get(type(obj))
+        if source is None:
+            continue
+        if changes is None:
+            changes = session.info.setdefault("suggest_changes", {})
+        # Значения берутся сейчас: после коммита объекты истекают, а SQL уже нельзя
+        visible = obj not in session.deleted and (source.flag is None or bool(getattr(obj, source.flag)))
+        rank_column = RANK_COLUMNS.get(source.kind)
+        rank = getattr(obj, rank_column) if rank_column else None
+        changes[(source.kind, obj.id)] = Item(
+            source.kind, obj.id, getattr(obj, source.title), rank.timestamp() if rank else 0) if visible else None
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_changes(session):
+    changes = session.info.pop("suggest_changes", None)
+    index = _index
+    if not changes or index is None or index.pid != os.getpid() or not index.sections:
+        return
+    with index.lock:
+        for (kind, ref_id), item in changes.items():
+            section = index.sections.get(kind)
+            if section is None:
+                continue
+            if item is None:
+                section.remove(ref_id)
+            else:
+                section.put(item)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session):
+    session.info.pop("suggest_changes", None)
+
+
+def init_suggest(app):
+    app.before_request(warm)
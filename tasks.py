@@ -0,0 +1,362 @@
+"""Фоновая очередь задач: побочные эффекты записи выполняются после коммита.
+
+Задачи ставятся из обработчиков ``after_commit`` (``on_commit``), поэтому для
+отменённой транзакции они не появляются. Очередь — таблица ``job`` в
+основной БД или в отдельной БД (``TASK_QUEUE_URI``, например локальный файл
+SQLite). Воркеры запускаются командой ``flask worker``; задача захватывается
+атомарным ``UPDATE … WHERE status = 'queued'``, при ошибке повторяется с
+экспоненциальной задержкой, а после ``max_attempts`` неудач переходит в
+статус ``dead``. Для каждого типа задан предел одновременно выполняемых
+задач — общий для всех воркеров: захваты идут по одному (в SQLite — под
+блокировкой записи, в PostgreSQL — под advisory-блокировкой), иначе при READ
+COMMITTED два воркера увидели бы одно и то же число выполняемых. Задача,
+воркер которой умер, возвращается в очередь по истечении
+``TASK_LEASE_SECONDS``. Ошибки самой очереди (БД недоступна) воркер
+логирует и повторяет с нарастающей паузой.
+
+При ``TASKS_EAGER`` задачи выполняются сразу после коммита в том же процессе
+(для разработки без воркера); упавшая задача всё равно попадает в очередь.
+"""
+import json
+import logging
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup, with_appcontext
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models import Job
+
+log = logging.getLogger(__name__)
+
+TaskType = namedtuple("TaskType", "name handler concurrency max_attempts")
+# Ключ pg_advisory_xact_lock, под которым воркеры захватывают задачи
+_CLAIM_LOCK_KEY = 0x6A6F62
+# Предел паузы воркера при недоступной очереди, секунды
+_ERROR_BACKOFF_MAX = 60
+REGISTRY = {}
+
+jobs_cli = AppGroup("jobs", help="Фоновая очередь задач.")
+
+_job = Job.__table__
+
+
+def task(name, concurrency=1, max_attempts=5):
+    """Регистрирует обработчик ``handler(connection, payload)`` для задач типа name.
+
+    connection — соединение с основной БД внутри транзакции: если обработчик
+    упал, его изменения откатываются, а задача повторяется.
+    """
+    def decorator(handler):
+        REGISTRY[name] = TaskType(name, handler, concurrency, max_attempts)
+        return handler
+    return decorator
+
+
+def _queue_engine():
+    return current_app.extensions.get("task_queue_engine") or db.engine
+
+
+def _job_row(name, payload, delay=0, attempts=0):
+    now = datetime.utcnow()
+    return {
+        "type": name,
+        "payload": json.dumps(payload or {}, ensure_ascii=False, sort_keys=True),
+        "status": "queued",
+        "attempts": attempts,
+        "max_attempts": REGISTRY[name].max_attempts,
+        "run_at": now + timedelta(seconds=delay),
+        "created_at": now,
+    }
+
+
+def enqueue(name, payload=None, delay=0):
+    """Ставит задачу в очередь немедленно, в отдельной транзакции."""
+    if name not in REGISTRY:
+        raise KeyError(f"неизвестный тип задачи: {name}")
+    with _queue_engine().begin() as connection:
+        connection.execute(_job.insert(), [_job_row(name, payload, delay)])
+
+
+def _run_eager(jobs):
+    failed = []
+    for name, payload in jobs:
+        try:
+            with db.engine.begin() as connection:
+                REGISTRY[name].handler(connection, payload)
+        except Exception:
+            log.exception("task %s failed, queued for retry", name)
+            failed.append(_job_row(name, payload, delay=_backoff(1), attempts=1))
+    if failed:
+        with _queue_engine().begin() as connection:
+            connection.execute(_job.insert(), failed)
+
+
+# --- Постановка после коммита ------------------------------------------------
+
+def on_commit(session, name, payload):
+    """Поставит задачу, когда транзакция сессии будет успешно закоммичена."""
+    pending = session.info.setdefault("pending_jobs", {})
+    pending[(name, json.dumps(payload, ensure_ascii=False, sort_keys=True))] = payload
+
+
+@event.listens_for(Session, "after_commit")
+def _enqueue_pending(session):
+    pending = session.info.pop("pending_jobs", None)
+    if not pending:
+        return
+    jobs = [(name, payload) for (name, _), payload in pending.items()]
+    try:
+        if current_app.config["TASKS_EAGER"]:
+            _run_eager(jobs)
+            return
+        with _queue_engine().begin() as connection:
+            connection.execute(_job.insert(), [_job_row(name, payload) for name, payload in jobs])
+    except Exception:
+        # Данные уже закоммичены: ошибка очереди не должна превращаться в 500
+        log.exception("failed to enqueue %d jobs", len(jobs))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop("pending_jobs", None)
+
+
+# --- Воркер -------------------------------------------------------------------
+
+def _backoff(attempts):
+    base = current_app.config["TASK_BACKOFF_BASE"]
+    delay = min(base * 2 ** (attempts - 1), current_app.config["TASK_BACKOFF_MAX"])
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _concurrency(types):
+    limits = {name: REGISTRY[name].concurrency for name in types}
+    for item in current_app.config["TASK_CONCURRENCY"].split(","):
+        name, sep, value = item.partition("=")
+        if sep and name.strip() in limits:
+            limits[name.strip()] = int(value)
+    return limits
+
+
+class Worker:
+    def __init__(self, types, poll_interval, lease_seconds):
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self.limits = _concurrency(types)
+        self.poll_interval = poll_interval
+        self.lease = timedelta(seconds=lease_seconds)
+        self.stopping = False
+        self._next_maintenance = 0
+
+    def stop(self, *args):
+        self.stopping = True
+
+    def _sleep(self, seconds):
+        # Короткими шагами, чтобы SIGTERM не ждал конца длинной паузы
+        deadline = time.monotonic() + seconds
+        while not self.stopping and time.monotonic() < deadline:
+            time.sleep(min(1.0, deadline - time.monotonic()))
+
+    def run(self, burst=False):
+        """Цикл обработки; burst — выйти, когда подходящих задач не останется."""
+        processed = errors = 0
+        while not self.stopping:
+            try:
+                if time.monotonic() >= self._next_maintenance:
+                    self._maintenance()
+                job = self._claim()
+                if job is not None:
+                    self._execute(job)
+            except Exception:
+                # Очередь недоступна (перезапуск БД, сеть): ждём и пробуем снова.
+                # Задача, статус которой не удалось записать, вернётся по lease
+                errors += 1
+                delay = min(self.poll_interval * 2 ** errors, _ERROR_BACKOFF_MAX)
+                log.exception("worker %s: queue error, retrying in %.0fs", self.name, delay)
+                self._sleep(delay)
+                continue
+            errors = 0
+            if job is None:
+                if burst:
+                    break
+                time.sleep(self.poll_interval)
+                continue
+            processed += 1
+        return processed
+
+    def _claim(self):
+        now = datetime.utcnow()
+        with _queue_engine().begin() as connection:
+            if connection.dialect.name == "postgresql":
+                # Подсчёт выполняемых и UPDATE должны видеть захваты других
+                # воркеров; блокировка снимается при коммите этой транзакции
+                connection.execute(select(func.pg_advisory_xact_lock(_CLAIM_LOCK_KEY)))
+            running = dict(connection.execute(
+                select(_job.c.type, func.count())
+                .where(_job.c.status == "running", _job.c.type.in_(self.limits))
+                .group_by(_job.c.type)).all())
+            allowed = [name for name, limit in self.limits.items() if running.get(name, 0) < limit]
+            if not allowed:
+                return None
+            candidate = connection.execute(
+                select(_job.c.id, _job.c.type)
+                .where(_job.c.status == "queued", _job.c.run_at <= now, _job.c.type.in_(allowed))
+                .order_by(_job.c.run_at, _job.c.id)
+                .limit(1)).first()
+            if candidate is None:
+                return None
+            # Проверка предела повторяется в самом UPDATE: между SELECT и UPDATE
+            # задачу того же типа мог захватить другой воркер
+            other = _job.alias()
+            running_now = (select(func.count()).select_from(other)
+                           .where(other.c.type == candidate.type, other.c.status == "running")
+                           .scalar_subquery())
+            claimed = connection.execute(
+                _job.update()
+                .where(_job.c.id == candidate.id, _job.c.status == "queued",
+                       running_now < self.limits[candidate.type])
+                .values(status="running", locked_by=self.name, locked_at=now,
+                        attempts=_job.c.attempts + 1))
+            if claimed.rowcount != 1:
+                return None
+            return connection.execute(select(_job).where(_job.c.id == candidate.id)).first()
+
+    def _execute(self, job):
+        spec = REGISTRY[job.type]
+        started = time.perf_counter()
+        try:
+            with db.engine.begin() as connection:
+                spec.handler(connection, json.loads(job.payload))
+        except Exception as exc:
+            log.exception("job %s (%s) failed, attempt %d/%d", job.id, job.type, job.attempts, job.max_attempts)
+            self._fail(job, f"{type(exc).__name__}: {exc}")
+            return
+        self._finish(job, status="done", finished_at=datetime.utcnow(), last_error=None)
+        log.info("job %s (%s) done in %.3fs", job.id, job.type, time.perf_counter() - started)
+
+    def _finish(self, job, **values):
+        with _queue_engine().begin() as connection:
+            connection.execute(
+                _job.update()
+                .where(_job.c.id == job.id, _job.c.locked_by == self.name, _job.c.status == "running")
+                .values(locked_by=None, locked_at=None, **values))
+
+    def _fail(self, job, error):
+        if job.attempts >= job.max_attempts:
+            self._finish(job, status="dead", finished_at=datetime.utcnow(), last_error=error)
+        else:
+            run_at = datetime.utcnow() + timedelta(seconds=_backoff(job.attempts))
+            self._finish(job, status="queued", run_at=run_at, last_error=error)
+
+    def _maintenance(self):
+        """Возвращает в очередь задачи умерших воркеров и удаляет старые выполненные."""
+        now = datetime.utcnow()
+        expired = (_job.c.status == "running") & (_job.c.locked_at < now - self.lease)
+        with _queue_engine().begin() as connection:
+            connection.execute(
+                _job.update().where(expired, _job.c.attempts >= _job.c.max_attempts)
+                .values(status="dead", locked_by=None, locked_at=None, finished_at=now,
+                        last_error="lease expired"))
+            connection.execute(
+                _job.update().where(expired)
+                .values(status="queued", run_at=now, locked_by=None, locked_at=None,
+                        last_error="lease expired"))
+            retention = timedelta(hours=current_app.config["TASK_DONE_RETENTION_HOURS"])
+            connection.execute(_job.delete().where(_job.c.status == "done", _job.c.finished_at < now - retention))
+        self._next_maintenance = time.monotonic() + 60
+
+
+def _worker_main(app, types, poll_interval, lease_seconds, burst):
+    with app.app_context():
+        # Пул соединений родителя после fork() использовать нельзя
+        db.engine.dispose(close=False)
+        queue_engine = app.extensions.get("task_queue_engine")
+        if queue_engine is not None:
+            queue_engine.dispose(close=False)
+        worker = Worker(types, poll_interval, lease_seconds)
+        signal.signal(signal.SIGTERM, worker.stop)
+        signal.signal(signal.SIGINT, worker.stop)
+        log.info("worker %s started: %s", worker.name, ", ".join(sorted(worker.limits)))
+        worker.run(burst=burst)
+
+
+@click.command("worker")
+@click.option("--processes", "-p", default=1, show_default=True, help="Число процессов-воркеров.")
+@click.option("--type", "types", multiple=True, help="Обрабатывать только эти типы задач.")
+@click.option("--poll", default=1.0, show_default=True, help="Пауза при пустой очереди, секунды.")
+@click.option("--burst", is_flag=True, help="Выйти, когда очередь опустеет.")
+@with_appcontext
+def worker_command(processes, types, poll, burst):
+    """Запустить обработчики фоновой очереди."""
+    app = current_app._get_current_object()
+    types = types or tuple(REGISTRY)
+    unknown = set(types) - set(REGISTRY)
+    if unknown:
+        raise click.BadParameter(f"неизвестные типы: {', '.join(sorted(unknown))}", param_hint="--type")
+    lease = app.config["TASK_LEASE_SECONDS"]
+    if processes <= 1:
+        _worker_main(app, types, poll, lease, burst)
+        return
+    context = multiprocessing.get_context("fork")
+    children = [context.Process(target=_worker_main, args=(app, types, poll, lease, burst))
+                for _ in range(processes)]
+    for child in children:
+        child.start()
+
+    def forward(signum, frame):
+        for child in children:
+            if child.is_alive():
+                os.kill(child.pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    for child in children:
+        child.join()
+
+
+@jobs_cli.command("stats")
+def stats_command():
+    """Число задач по типам и статусам."""
+    with _queue_engine().connect() as connection:
+        rows = connection.execute(
+            select(_job.c.type, _job.c.status, func.count(), func.min(_job.c.run_at))
+            .group_by(_job.c.type, _job.c.status).order_by(_job.c.type, _job.c.status)).all()
+    if not rows:
+        click.echo("Очередь пуста.")
+    for name, status, count, oldest in rows:
+        suffix = f", старейшая с {oldest:%d.%m.%Y %H:%M:%S}" if status == "queued" else ""
+        click.echo(f"{name:<24} {status:<8} {count}{suffix}")
+
+
+@jobs_cli.command("retry")
+@click.option("--type", "name", help="Только задачи этого типа.")
+def retry_command(name):
+    """Вернуть задачи из статуса dead в очередь."""
+    condition = _job.c.status == "dead"
+    if name:
+        condition &= _job.c.type == name
+    with _queue_engine().begin() as connection:
+        result = connection.execute(
+            _job.update().where(condition)
+            .values(status="queued", attempts=0, run_at=datetime.utcnow(), finished_at=None))
+    click.echo(f"Возвращено в очередь: {result.rowcount}")
+
+
+def init_tasks(app):
+    uri = app.config["TASK_QUEUE_URI"]
+    if uri:
+        engine = create_engine(uri)
+        _job.create(engine, checkfirst=True)
+        app.extensions["task_queue_engine"] = engine
+    app.cli.add_command(worker_command)
+    app.cli.add_command(jobs_cli)
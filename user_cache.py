@@ -0,0 +1,204 @@
+"""Загрузка текущего пользователя без запроса к БД на каждой странице.
+
+``load_user`` сначала смотрит в LRU-кэш процесса, затем в снимок
+``id/name/email/role/is_active`` в подписанной сессии; в БД идёт, только если
+оба устарели (старше ``USER_CACHE_TTL``). У ``User`` есть счётчик
+``auth_version``: смена роли, флага активности или пароля (в том числе из
+админки) увеличивает его, а после коммита запись в кэше процесса удаляется и
+снимки с прежней версией отвергаются. Срок жизни снимка отсчитывается от
+момента чтения из БД (``at``) и при обращениях не продлевается, поэтому другие
+воркеры, CLI и импорт узнают об изменении не позже чем через TTL. Права
+администратора всё равно проверяются по БД (``is_admin_verified``) — один раз
+за запрос.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, g, session
+from flask_login import UserMixin, current_user, user_logged_out
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from extensions import db, login_manager
+from models import User
+
+SESSION_KEY = "_user_snapshot"
+TRACKED_ATTRS = ("role", "is_active", "password_hash")
+
+
+class CachedUser(UserMixin):
+    """Снимок пользователя для шаблонов и проверок доступа; не ORM-объект."""
+
+    def __init__(self, snapshot):
+        self.id = snapshot["id"]
+        self.name = snapshot["name"]
+        self.email = snapshot["email"]
+        self.role = snapshot["role"]
+        self.auth_version = snapshot["v"]
+        self._active = snapshot["active"]
+
+    @property
+    def is_active(self):
+        return self._active
+
+    @property
+    def is_admin(self):
+        return self.role == "admin"
+
+
+class TTLCache:
+    """LRU ограниченного размера с временем жизни записей; потокобезопасный."""
+
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_users = TTLCache(size=1024, ttl=60)
+# Последние известные версии изменённых в этом процессе пользователей:
+# снимок из сессии с меньшей версией не принимается
+_versions = TTLCache(size=1024, ttl=60)
+
+
+def _snapshot(user):
+    return {
+        "id": user.id,
+        "name": user.name,
+        "email": user.email,
+        "role": user.role,
+        "active": bool(user.is_active),
+        "v": user.auth_version or 0,
+        "at": time.time(),
+    }
+
+
+def _fresh(snapshot):
+    """Снимок моложе TTL — считая от чтения из БД, а не от последнего обращения."""
+    return time.time() - snapshot.get("at", 0) <= current_app.config["USER_CACHE_TTL"]
+
+
+def _session_snapshot(user_id):
+    if not current_app.config["USER_SESSION_SNAPSHOT"]:
+        return None
+    snapshot = session.get(SESSION_KEY)
+    if not snapshot or snapshot.get("id") != user_id:
+        return None
+    if not _fresh(snapshot):
+        return None
+    if snapshot.get("v", 0) < (_versions.get(user_id) or 0):
+        return None
+    return snapshot
+
+
+@login_manager.user_loader
+def load_user(user_id):
+    user_id = int(user_id)
+    snapshot = _users.get(user_id)
+    if snapshot is None or not _fresh(snapshot):
+        # Снимок из сессии в кэш процесса не кладётся: он продлил бы себе жизнь
+        snapshot = _session_snapshot(user_id)
+    if snapshot is None:
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        snapshot = _snapshot(user)
+        if current_app.config["USER_SESSION_SNAPSHOT"]:
+            session[SESSION_KEY] = snapshot
+        _users.set(user_id, snapshot)
+    if not snapshot["active"]:
+        return None
+    return CachedUser(snapshot)
+
+
+def is_admin_verified():
+    """Проверка роли администратора по БД — для админки и защищённых действий.
+
+    Результат запоминается в g: Flask-Admin спрашивает is_accessible для
+    каждого пункта меню, а запрос к БД нужен один на HTTP-запрос.
+    """
+    if not current_user.is_authenticated or not current_user.is_admin:
+        return False
+    verified = g.get("admin_verified")
+    if verified is not None and verified[0] == current_user.id:
+        return verified[1]
+    user = db.session.get(User, current_user.id)
+    result = user is not None and user.is_active and user.is_admin
+    g.admin_verified = (current_user.id, result)
+    return result
+
+
+def forget(user_id):
+    _users.pop(user_id)
+
+
+# --- Версия пользователя -----------------------------------------------------
+
+def _changed(state, name):
+    # Присвоение того же значения в history.added не попадает
+    return bool(state.attrs[name].history.added)
+
+
+@event.listens_for(Session, "before_flush")
+def _bump_versions(session, flush_context, instances):
+    for obj in session.dirty:
+        if not isinstance(obj, User):
+            continue
+        state = inspect(obj)
+        if any(_changed(state, name) for name in TRACKED_ATTRS):
+            obj.auth_version = (obj.auth_version or 0) + 1
+            session.info.setdefault("user_versions", {})[obj.id] = obj.auth_version
+
+
+@event.listens_for(Session, "after_commit")
+def _evict_changed(session):
+    for user_id, version in session.info.pop("user_versions", {}).items():
+        _users.pop(user_id)
+        _versions.set(user_id, version)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed(session):
+    session.info.pop("user_versions", None)
+
+
+def _clear_snapshot(app, user, **extra):
+    session.pop(SESSION_KEY, None)
+    if user is not None and user.is_authenticated:
+        forget(user.id)
+
+
+def init_user_cache(app):
+    for cache in (_users, _versions):
+        cache.size = app.config["USER_CACHE_SIZE"]
+        cache.ttl = app.config["USER_CACHE_TTL"]
+    user_logged_out.connect(_clear_snapshot, app)